@@ -1,6 +1,6 @@
 
 import logging
-from typing import List
+from typing import Dict, List, Optional
 
 from stixorm.module.definitions.property_definitions import get_libraries
 from stixorm.module.typedb_lib.factories.definition_factory import get_definition_factory_instance, DomainDefinition
@@ -109,9 +109,9 @@ def authorised_mappings(import_type: ImportType=default_import_type):
                 #logger.debug("--------- reln--------------")
                 for i, key in enumerate(keys):
                     if domain.contains_mapping(matches[i]):
-                        logger.debug(f'\nAuth Loading: domain->{dom[j]}, name->{name}, key->{key}, match->{matches[i]}')
+                        logger.debug('\nAuth Loading: domain->%s, name->%s, key->%s, match->%s', dom[j], name, key, matches[i])
                         value_list = [x[conds[i]] for x in domain.get_mapping(matches[i])]
-                        logger.debug(f'value list -> {value_list}')
+                        logger.debug('value list -> %s', value_list)
                         auth["tql_types"][key].extend(value_list)
             elif name == "tql_types":
                 #logger.debug("---------- tql_types -------------")
@@ -120,7 +120,7 @@ def authorised_mappings(import_type: ImportType=default_import_type):
                         #logger.debug(f'Auth Loading: domain->{dom[j]}, name->{name}, key->{keys[i]}, match->{matches[i]}, cond->{conds[i]}')
                         value_list_type = [x["type"] for x in domain.get_mapping(matches[i]) if x["object"] == conds[i]]
                         value_list_typeql = [x["typeql"] for x in domain.get_mapping(matches[i]) if x["object"] == conds[i]]
-                        logger.debug(f' value_list_type -> {value_list_type}\n\n value_list_typeql -> {value_list_typeql}')
+                        logger.debug(' value_list_type -> %s\n\n value_list_typeql -> %s', value_list_type, value_list_typeql)
                         auth["tql_types"][key].extend(value_list_typeql)
                         auth["types"][key].extend(value_list_type)
 
@@ -158,8 +158,65 @@ def authorised_mappings(import_type: ImportType=default_import_type):
                 pass
 
 
+    # index the name lists and the records, so every lookup is constant time
+    for section in ["reln_name", "tql_types", "types"]:
+        for key, value_list in auth[section].items():
+            auth[section][key] = frozenset(value_list)
+    auth["index"] = {}
+    for section in ["reln", "conv"]:
+        auth["index"][section] = index_records(auth[section])
+    # the conversion group of each stix type, the first of sdo, sro and sco that contains it
+    auth["type_group"] = {}
+    for group in ["sdo", "sro", "sco"]:
+        for stix_type in auth["types"][group]:
+            auth["type_group"].setdefault(stix_type, group)
+
     # finally add the import type to the auth object
     auth.update(ImportTypeFactory.convert_to_dict(import_type))
 
     return auth
 
+
+
+
+INDEXED_FIELDS = ["rel", "stix", "typeql", "name", "relation", "type"]
+
+
+def index_records(records_by_group: Dict[str, List[dict]]) -> Dict[str, Dict[str, Dict[str, List[dict]]]]:
+    """ index the records of each group by the value of each of their key fields
+
+    Args:
+        records_by_group (): the lists of records, keyed by group, e.g. auth["reln"]
+
+    Returns:
+        index: the records in their original order, keyed by group, then field, then field value
+    """
+    index = {}
+    for group, records in records_by_group.items():
+        by_field = index.setdefault(group, {})
+        for record in records:
+            for field in INDEXED_FIELDS:
+                value = record.get(field)
+                if isinstance(value, str):
+                    by_field.setdefault(field, {}).setdefault(value, []).append(record)
+    return index
+
+
+def find_record(auth, section: str, group: str, field: str, value: str, last: bool = False) -> Optional[dict]:
+    """ find the record with a given field value, as a scan of auth[section][group] would
+
+    Args:
+        auth (): the authorised mappings
+        section (): the indexed section, either "reln" or "conv"
+        group (): the group of records, e.g. "embedded_relations" or "sdo"
+        field (): the field to match, e.g. "rel" or "typeql"
+        value (): the value of the field
+        last (): if True return the last matching record, otherwise the first
+
+    Returns:
+        record: the matching record, or None if there is no match
+    """
+    records = auth["index"][section][group].get(field, {}).get(value)
+    if not records:
+        return None
+    return records[-1] if last else records[0]
@@ -18,16 +18,21 @@
 # specific language governing permissions and limitations
 # under the License.
 #
+import hashlib
 import os
 from typing import Dict
 from typedb.driver import *
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from typedb.api.connection.session import SessionType
 from typedb.api.connection.transaction import TransactionType
 from typedb.driver import TypeDB
 
+from stixorm.module.typedb_lib.connection import get_connection
+from stixorm.module.typedb_lib.known_ids import get_known_ids
+from stixorm.module.typedb_lib.object_cache import invalidate_objects
+
 logger = logging.getLogger(__name__)
 
 
@@ -56,79 +61,175 @@ tlp_ids = ["marking-definition--613f2e26-407d-48c7-9eca-b8e91df99dc9",
                    "marking-definition--f88d31f6-486f-44da-b317-01333bde0b82",
                    "marking-definition--5e57c739-391a-4eb3-b6be-7d15ca92d5ed"]
 
-def setup_database(stix_connection: Dict[str, str], clear: bool):
-    url = stix_connection["uri"] + ":" + stix_connection["port"]
-    with TypeDB.core_driver(url) as driver:
-        logger.debug(f'Database Clearing is [{clear}]')
-        if driver.databases.contains(stix_connection["database"]):
-            if clear:
-                driver.databases.get(stix_connection["database"]).delete()
-                driver.databases.create(stix_connection["database"])
-            else:
-                return
-                # raise ValueError(f"Database '{database}' already exists")
-        else:
+# the fingerprints of the schema files a database was loaded with, one "file-name:sha256" value per file, owned by
+# an entity so that the orphan attribute sweep leaves them alone
+SCHEMA_FINGERPRINT_DEFINE = 'define schema-fingerprint sub attribute, value string;\n' \
+                            'stixorm-schema sub entity, owns schema-fingerprint;'
+SCHEMA_FINGERPRINT_QUERY = 'match $s isa stixorm-schema, has schema-fingerprint $f; get $f;'
+
+
+def setup_database(stix_connection: Dict[str, str], clear: bool) -> bool:
+    """ Make sure the database exists, deleting and creating it again if it is to be cleared
+
+    Args:
+        stix_connection (): the connection dict
+        clear (): if True, an existing database is deleted first
+
+    Returns:
+        created: True if the database was created empty, False if an existing one was kept
+    """
+    connection = get_connection(stix_connection["uri"], stix_connection["port"])
+    driver = connection.driver
+    logger.debug('Database Clearing is [%s]', clear)
+    if driver.databases.contains(stix_connection["database"]):
+        if clear:
+            connection.close_sessions(stix_connection["database"])
+            get_known_ids(stix_connection["uri"], stix_connection["port"], stix_connection["database"]).clear()
+            invalidate_objects(stix_connection["uri"], stix_connection["port"], stix_connection["database"])
+            driver.databases.get(stix_connection["database"]).delete()
             driver.databases.create(stix_connection["database"])
+        else:
+            return False
+            # raise ValueError(f"Database '{database}' already exists")
+    else:
+        driver.databases.create(stix_connection["database"])
+
+    logger.debug('.......................... clear complete')
+    return True
 
-        logger.debug('.......................... clear complete')
+
+def schema_fingerprints(schema_paths: List[str]) -> Dict[str, str]:
+    """ The content hash of each of a set of schema files
+
+    Args:
+        schema_paths (): the paths of the .tql files
+
+    Returns:
+        fingerprints: the sha256 hex digest of each file's contents, by file name
+    """
+    fingerprints = {}
+    for schema_path in schema_paths:
+        with open(schema_path, "rb") as schema_file:
+            fingerprints[os.path.basename(schema_path)] = hashlib.sha256(schema_file.read()).hexdigest()
+    return fingerprints
+
+
+def get_schema_fingerprints(stix_connection: Dict[str, str]) -> Optional[Dict[str, str]]:
+    """ Read the fingerprints of the schema files the database was loaded with
+
+    Args:
+        stix_connection (): the connection dict
+
+    Returns:
+        fingerprints: the fingerprint of each file by file name, or None if the database has none, e.g. it was
+            loaded before fingerprints
+    """
+    connection = get_connection(stix_connection["uri"], stix_connection["port"])
+    try:
+        with connection.data_session(stix_connection["database"]) as session:
+            with session.transaction(TransactionType.READ) as read_transaction:
+                answers = [answer.get("f").get_value() for answer in read_transaction.query.get(SCHEMA_FINGERPRINT_QUERY)]
+    except Exception as e:
+        # the fingerprint types are not in the schema yet
+        logger.debug(e)
+        return None
+    if len(answers) == 0:
+        return None
+    return dict(answer.rsplit(":", 1) for answer in answers if ":" in answer)
+
+
+def load_schemas(stix_connection: Dict[str, str], schema_paths: List[str], fingerprints: Dict[str, str]):
+    """ Define a set of schema files in one schema transaction, then insert any missing TLP markings and record
+    the fingerprints of the loaded files in one data transaction
+
+    Args:
+        stix_connection (): the connection dict
+        schema_paths (): the paths of the .tql files, in the order they are defined
+        fingerprints (): every fingerprint the database now holds, by file name, those of earlier loads included
+    """
+    connection = get_connection(stix_connection["uri"], stix_connection["port"])
+    schemas = []
+    for schema_path in schema_paths:
+        assert os.path.exists(schema_path), "File path needs to exist"
+        with open(schema_path, "r") as schema_file:
+            schemas.append(schema_file.read())
+    schemas.append(SCHEMA_FINGERPRINT_DEFINE)
+
+    with connection.schema_session(stix_connection["database"]) as session:
+        with session.transaction(TransactionType.WRITE) as write_transaction:
+            # all the defines are sent before any is resolved
+            define_futures = [write_transaction.query.define(schema) for schema in schemas]
+            for schema_path, define_future in zip(schema_paths + ["fingerprint"], define_futures):
+                define_future.resolve()
+                logger.debug('Defined %s', schema_path)
+            write_transaction.commit()
+    logger.info('Committed %s schema files in one transaction', len(schema_paths))
+
+    with connection.data_session(stix_connection["database"]) as session:
+        with session.transaction(TransactionType.WRITE) as write_transaction:
+            for tlp_id, mark_list in zip(tlp_ids, initial_markings):
+                found = write_transaction.query.get('match $mark has stix-id "' + tlp_id + '"; get $mark;')
+                if next(iter(found), None) is None:
+                    list(write_transaction.query.insert(" insert " + "".join(mark_list)))
+            write_transaction.query.delete('match $s isa stixorm-schema; delete $s isa stixorm-schema;').resolve()
+            write_transaction.query.delete('match $f isa schema-fingerprint; delete $f isa schema-fingerprint;').resolve()
+            list(write_transaction.query.insert('insert $s isa stixorm-schema' + ''.join(
+                ', has schema-fingerprint "' + name + ':' + digest + '"' for name, digest in fingerprints.items()) + ';'))
+            write_transaction.commit()
 
 
 def load_schema(stix_connection: Dict[str, str], rel_path=None, schema_type: str = "schema"):
-    logger.debug(f'{stix_connection}')
+    logger.debug('%s', stix_connection)
     logger.debug(rel_path)
     logger.debug(schema_type)
     assert rel_path is not None, "Need a path to history a schema"
     assert os.path.exists(rel_path), "File path needs to exist"
 
-    url = stix_connection["uri"] + ":" + stix_connection["port"]
-    with TypeDB.core_driver(url) as driver:
-        # Stage 1: Create the schema
-        with driver.session(stix_connection["database"], SessionType.SCHEMA) as session:
-            # Load schema from file
-            with open(rel_path, "r") as schema_file:
-                schema = schema_file.read()
-            logger.debug('.....')
-            logger.debug(f'Inserting {schema_type} ...')
-            logger.debug('.....')
-            with session.transaction(TransactionType.WRITE) as write_transaction:
-                write_transaction.query.define(schema)
-                write_transaction.commit()
-            logger.debug('.....')
-            logger.debug('Successfully committed schema!')
-            logger.debug('.....')
-            session.close()
+    connection = get_connection(stix_connection["uri"], stix_connection["port"])
+    # Stage 1: Create the schema
+    with connection.schema_session(stix_connection["database"]) as session:
+        # Load schema from file
+        with open(rel_path, "r") as schema_file:
+            schema = schema_file.read()
+        logger.debug('.....')
+        logger.debug('Inserting %s ...', schema_type)
+        logger.debug('.....')
+        with session.transaction(TransactionType.WRITE) as write_transaction:
+            write_transaction.query.define(schema)
+            write_transaction.commit()
+        logger.debug('.....')
+        logger.debug('Successfully committed schema!')
+        logger.debug('.....')
 
 
 def load_markings(stix_connection: Dict[str, str]):
     type_ql_list = []
-    logger.info(f"========================== Database initialisation ============================")
+    logger.info("========================== Database initialisation ============================")
     for mark_list in initial_markings:
         type_ql = " insert "
         for line in mark_list:
             type_ql += line
         type_ql_list.append(type_ql)
     load_typeql_data(type_ql_list, stix_connection)
-    logger.info(f"===============================================================================\n\n")
+    logger.info("===============================================================================\n\n")
     return_list = tlp_ids
     return return_list
 
 
 def load_typeql_data(data_list, stix_connection: Dict[str, str]):
-    url = stix_connection["uri"] + ":" + stix_connection["port"]
-    with TypeDB.core_driver(url) as driver:
-        # Stage 1: Create the schema
-        with driver.session(stix_connection["database"], SessionType.DATA) as session:
-            with session.transaction(TransactionType.WRITE) as write_transaction:
-                logger.info(f'Loading TQL objects')
-                for data in data_list:
-                    logger.info(f'\n\n{data}\n\n')
-                    insert_iterator = write_transaction.query.insert(data)
+    connection = get_connection(stix_connection["uri"], stix_connection["port"])
+    with connection.data_session(stix_connection["database"]) as session:
+        with session.transaction(TransactionType.WRITE) as write_transaction:
+            logger.info('Loading TQL objects')
+            for data in data_list:
+                logger.info('\n\n%s\n\n', data)
+                insert_iterator = write_transaction.query.insert(data)
 
-                    logger.info(f'insert_iterator response ->\n{insert_iterator}')
-                    for result in insert_iterator:
-                        logger.info(f'typedb response ->\n{result}')
+                logger.info('insert_iterator response ->\n%s', insert_iterator)
+                for result in insert_iterator:
+                    logger.info('typedb response ->\n%s', result)
 
-                write_transaction.commit()
+            write_transaction.commit()
 
 
 
@@ -203,7 +304,7 @@ def sort_layers(layers,
             indexes.insert(0, loc_id)
         #logger.debug(f'layers -> {layers}\nindexes -> {indexes}\nmset -> {mset}')
         logger.debug(
-            f"################################## end of  sort_layers {add_or_del} ####################################################")
+            "################################## end of  sort_layers %s ####################################################", add_or_del)
         return layers, indexes, list(mset), cyclical
     # 6. There are no dependencies but id is in missing, delete from missing,follow the tree and reorder
     if not dep_list_items and id_in_missing:
@@ -211,11 +312,11 @@ def sort_layers(layers,
         mset.remove(loc_id)
         tree, circular = follow_the_tree(layers, dep_obj)
         cyclical = cyclical + circular
-        logger.debug(f' tree -> {tree}')
+        logger.debug(' tree -> %s', tree)
         layers, indexes = reorder(layers, indexes, tree, dep_obj, add_or_del)
         #logger.debug(f'layers -> {layers}\nindexes -> {indexes}\nmset -> {mset}')
         logger.debug(
-            f"################################## end of  sort_layers {add_or_del} ####################################################")
+            "################################## end of  sort_layers %s ####################################################", add_or_del)
         return layers, indexes, list(mset), cyclical
     # 7 There are dependencies, object is not in missing, insert at front
     if dep_list_items and not id_in_missing:
@@ -228,19 +329,19 @@ def sort_layers(layers,
             indexes.append(loc_id)
         #logger.debug(f'layers -> {layers}\nindexes -> {indexes}\nmset -> {mset}')
         logger.debug(
-            f"################################## end of  sort_layers {add_or_del} ####################################################")
+            "################################## end of  sort_layers %s ####################################################", add_or_del)
         return layers, indexes, list(mset), cyclical
     # 8 There are dependencies, object is in missing , delete from missing,follow the tree and reorder
     if dep_list_items and id_in_missing:
-        logger.debug(f'### delete from missing,follow the tree and reorder')
+        logger.debug('### delete from missing,follow the tree and reorder')
         mset.remove(loc_id)
         tree, circular = follow_the_tree(layers, dep_obj)
         cyclical = cyclical + circular
-        logger.debug(f' tree -> {tree}')
+        logger.debug(' tree -> %s', tree)
         layers, indexes = reorder(layers, indexes, tree, dep_obj, add_or_del)
         #logger.debug(f'layers -> {layers}\nindexes -> {indexes}\nmset -> {mset}')
         logger.debug(
-            f"################################## end of  sort_layers {add_or_del} ####################################################")
+            "################################## end of  sort_layers %s ####################################################", add_or_del)
         return layers, indexes, list(mset), cyclical
 
     logger.debug("theres a massive problem")
@@ -330,14 +431,14 @@ def follow_the_tree(layers, dep_obj):
     loc_dep = dep_obj['dep_list']
     found = True
     found, ret_indexes, ret_ids, circular = find_id(loc_ids, loc_dep, layers)
-    logger.debug(f'### Following First Level Tree, found {found},index {ret_indexes}, loc_id {ret_ids}')
+    logger.debug('### Following First Level Tree, found %s,index %s, loc_id %s', found, ret_indexes, ret_ids)
     if found:
         tree = tree + ret_indexes
         loc_ids = ret_ids
         cyclical = circular
     while found:
         found, ret_indexes, ret_ids, circular = find_id(loc_ids, loc_dep, layers)
-        logger.debug(f'### Following Tree, found {found},index {ret_indexes}, loc_id {ret_ids}')
+        logger.debug('### Following Tree, found %s,index %s, loc_id %s', found, ret_indexes, ret_ids)
         if found:
             tree = tree + ret_indexes
             loc_ids = ret_ids
@@ -2,7 +2,7 @@ import re
 from typing import List
 import copy
 
-from stixorm.module.authorise import authorised_mappings
+from stixorm.module.authorise import authorised_mappings, find_record
 
 from stixorm.module.orm.import_objects import sdo_to_data, sro_to_data, sco_to_data
 from stixorm.module.orm.import_utilities import split_on_activity_type, val_tql
@@ -46,8 +46,8 @@ def delete_stix_object(stix_object,
     elif stix_object.type == 'marking-definition':
         del_match, del_tql = delete_marking(stix_object, dep_match, dep_insert, indep_ql, core_ql, import_type)
     else:
-        logger.error(f'object type not supported in delete stix object: {stix_object.type}')
-        logger.error(f' import type {dep_match + dep_insert + indep_ql + core_ql}')
+        logger.error('object type not supported in delete stix object: %s', stix_object.type)
+        logger.error(' import type %s', dep_match + dep_insert + indep_ql + core_ql)
         del_match = del_tql = ""
 
     return del_match, del_tql
@@ -178,7 +178,7 @@ def delete_sub_reln(rel, obj, obj_var, i, import_type):
         match = delete = ''
 
     else:
-        logger.error(f'relation type not known, rel -> {rel}')
+        logger.error('relation type not known, rel -> %s', rel)
         match = delete = ""
 
     return match, delete
@@ -203,14 +203,13 @@ def del_hashes(rel_name, rel_object, obj_var, i):
 def del_key_value_store(rel_name, rel_object, obj_var, i, import_type):
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
-    for config in auth["reln"]["key_value_relations"]:
-        if config["name"] == rel_name:
-            rel_typeql = config["typeql"]
-            role_owner = config["owner"]
-            role_pointed = config["pointed_to"]
-            d_key = config["key"]
-            d_value = config["value"]
-            break
+    config = find_record(auth, "reln", "key_value_relations", "name", rel_name)
+    if config is not None:
+        rel_typeql = config["typeql"]
+        role_owner = config["owner"]
+        role_pointed = config["pointed_to"]
+        d_key = config["key"]
+        d_value = config["value"]
 
     key_var = '$' + d_key + str(i)
     val_var = ' $' + d_value + str(i)
@@ -230,15 +229,14 @@ def del_key_value_store(rel_name, rel_object, obj_var, i, import_type):
 def del_list_of_object(rel_name, prop_value_list, parent_var, i, import_type):
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
-    logger.debug(f'rl name -> {rel_name}')
-    for config in auth["reln"]["list_of_objects"]:
-        if config["name"] == rel_name:
-            rel_typeql = config["typeql"]
-            role_owner = config["owner"]
-            role_pointed = config["pointed_to"]
-            typeql_obj = config["object"]
-            obj_props_tql = copy.deepcopy(auth["sub_objects"][typeql_obj])
-            break
+    logger.debug('rl name -> %s', rel_name)
+    config = find_record(auth, "reln", "list_of_objects", "name", rel_name)
+    if config is not None:
+        rel_typeql = config["typeql"]
+        role_owner = config["owner"]
+        role_pointed = config["pointed_to"]
+        typeql_obj = config["object"]
+        obj_props_tql = copy.deepcopy(auth["sub_objects"][typeql_obj])
     lod_list = []
     match = delete = ''
     for j, dict_instance in enumerate(prop_value_list):
@@ -276,11 +274,10 @@ def del_list_of_object(rel_name, prop_value_list, parent_var, i, import_type):
 def del_embedded_relation(rel_name, rel_object, obj_var, i, import_type):
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
-    for ex in auth["reln"]["embedded_relations"]:
-      if ex["rel"] == rel_name:
-        owner = ex["owner"]
-        relation = ex["typeql"]
-        break
+    ex = find_record(auth, "reln", "embedded_relations", "rel", rel_name)
+    if ex is not None:
+      owner = ex["owner"]
+      relation = ex["typeql"]
     loc_var = '$' + relation + str(i)
     match = loc_var + ' (' + owner + ':' + obj_var + ') isa ' + relation + ';\n'
     delete = loc_var + ' isa ' + relation + ';\n'
@@ -293,45 +290,43 @@ def del_load_object(prop_name, prop_dict, parent_var, i, import_type):
     #logger.debug('------------------- history object ------------------------------')
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
-    logger.debug(f'prop dict {prop_dict}')
-    for prop_type in auth["reln"]["extension_relations"]:
-        if prop_name == prop_type["stix"]:
-            tot_prop_list = [tot for tot in prop_dict.keys()]
-            obj_name = prop_type["object"]
-            obj_tql = copy.deepcopy(auth["sub_objects"][obj_name])
-            obj_var = '$' + obj_name
-            reln = prop_type["relation"]
-            rel_var = '$' + reln
-            rel_owner = prop_type["owner"]
-            rel_pointed_to = prop_type["pointed-to"]
-
-            match = obj_var + ' isa ' + prop_type["object"] + ';\n'
-            #match += obj_var + ' has $d' + str(i) + ';\n'
-            #match += 'not { ' + obj_var + ' isa thing; $lobj' + str(i) + ' isa thing, has $d' + str(i) + '; not {'
-            #match += obj_var + ' is $lobj' + str(i) + ';}; };\n\n'
-
-            match += rel_var + ' (' + rel_owner + ':' + parent_var
-            match += ', ' + rel_pointed_to + ':' + obj_var + ')'
-            match += ' isa ' + reln + ';\n'
-
-            # Split them into properties and relations
-            properties, relations = split_on_activity_type(prop_dict, obj_tql)
-            delete = ''
-
-            # add each of the relations to the match and insert statements
-            for rel in relations:
-                # split off for relation processing
-                match2, delete2= delete_sub_reln(rel, prop_dict, obj_var, i+1, import_type)
-                # then add it back together
-                match = match + match2
-                delete = delete + "\n" + delete2
-
-            # finally, connect the local object to the parent object
-            #delete = '$d' + str(i) + ' isa attribute;\n'
-            delete += rel_var + ' isa ' + reln + ';\n'
-            delete += obj_var + ' isa ' + prop_type["object"] + ';\n'
-
-            break
+    logger.debug('prop dict %s', prop_dict)
+    prop_type = find_record(auth, "reln", "extension_relations", "stix", prop_name)
+    if prop_type is not None:
+        tot_prop_list = [tot for tot in prop_dict.keys()]
+        obj_name = prop_type["object"]
+        obj_tql = copy.deepcopy(auth["sub_objects"][obj_name])
+        obj_var = '$' + obj_name
+        reln = prop_type["relation"]
+        rel_var = '$' + reln
+        rel_owner = prop_type["owner"]
+        rel_pointed_to = prop_type["pointed-to"]
+
+        match = obj_var + ' isa ' + prop_type["object"] + ';\n'
+        #match += obj_var + ' has $d' + str(i) + ';\n'
+        #match += 'not { ' + obj_var + ' isa thing; $lobj' + str(i) + ' isa thing, has $d' + str(i) + '; not {'
+        #match += obj_var + ' is $lobj' + str(i) + ';}; };\n\n'
+
+        match += rel_var + ' (' + rel_owner + ':' + parent_var
+        match += ', ' + rel_pointed_to + ':' + obj_var + ')'
+        match += ' isa ' + reln + ';\n'
+
+        # Split them into properties and relations
+        properties, relations = split_on_activity_type(prop_dict, obj_tql)
+        delete = ''
+
+        # add each of the relations to the match and insert statements
+        for rel in relations:
+            # split off for relation processing
+            match2, delete2= delete_sub_reln(rel, prop_dict, obj_var, i+1, import_type)
+            # then add it back together
+            match = match + match2
+            delete = delete + "\n" + delete2
+
+        # finally, connect the local object to the parent object
+        #delete = '$d' + str(i) + ' isa attribute;\n'
+        delete += rel_var + ' isa ' + reln + ';\n'
+        delete += obj_var + ' isa ' + prop_type["object"] + ';\n'
 
     return match, delete
 
@@ -344,167 +339,9 @@ def del_extensions(prop_name, prop_dict, parent_var, i, import_type):
     # for each key in the dict (extension type)
     # logger.debug('--------------------- extensions ----------------------------')
     for ext_type in prop_dict:
-        for ext_type_ql in auth["reln"]["extension_relations"]:
-            if ext_type == ext_type_ql["stix"]:
-                match2, delete2 = del_load_object(ext_type, prop_dict[ext_type], parent_var, i, import_type)
-                match = match + match2
-                delete = delete + delete2
-                break
+        ext_type_ql = find_record(auth, "reln", "extension_relations", "stix", ext_type)
+        if ext_type_ql is not None:
+            match2, delete2 = del_load_object(ext_type, prop_dict[ext_type], parent_var, i, import_type)
+            match = match + match2
+            delete = delete + delete2
     return match, delete
-
-
-def add_delete_layers(layers, dep_obj, indexes, missing):
-    logger.debug("################################### enter add_layers ###############################################")
-    logger.debug(f'\nlayers -> {layers}')
-    logger.debug(f'\ndep_obj -> {dep_obj}')
-    logger.debug(f'indexes -> {indexes}')
-    logger.debug(f'missing -> {missing}')
-    logger.debug("-------------------------------  ------------------------------------------------")
-    # Stage 1 - Initialise Variables
-    # 1. Setup key variables
-    loc_id = dep_obj['id']
-    loc_list = dep_obj["dep_list"]
-    locset = set(loc_list)
-    mset = set(missing)
-    iset = set(indexes)
-    intset = locset.intersection(iset)
-    diffset = locset.difference(intset)
-    # Stage 2 - Analyse Choices
-    # 2. check whether the object has dependencies in its dep_list
-    if not loc_list:
-        dep_list_items = False
-        logger.debug('### There are no dependencies')
-    else:
-        dep_list_items = True
-        logger.debug('### There are some dependencies')
-    # 3. check whether the object id is in the missing list
-    if loc_id in mset:
-        id_in_missing = True
-        logger.debug('### Current is the missing dependency of an existing record')
-    else:
-        id_in_missing = False
-        logger.debug('### Current is not a missing dependency of an existing record')
-    # 4. check whether any id in the object dependency list is not already loaded
-    if not diffset:
-        dep_id_not_loaded = False
-        logger.debug('### No dependencies need to be added to missing')
-    else:
-        dep_id_not_loaded = True
-        mset = mset | diffset
-        logger.debug('### Missing - Some dependencies need to be added to missing')
-
-    # Stage 3 - Execute Choices
-    # 5. No dependencies and not in missing, append only
-    if not dep_list_items and not id_in_missing:
-        logger.debug('### Append object and return')
-        layers.append(dep_obj)
-        indexes.append(loc_id)
-        logger.debug(f'layers -> {layers}')
-        logger.debug(f'indexes -> {indexes}')
-        logger.debug(f'mset -> {mset}')
-        logger.debug("################################## end of  add_layers ####################################################")
-        return layers, indexes, list(mset)
-    # 6. There are no dependencies but id is in missing, delete from missing,follow the tree and reorder
-    if not dep_list_items and id_in_missing:
-        logger.debug('### delete from missing,follow the tree and reorder')
-        mset.remove(loc_id)
-        tree = follow_the_tree(layers, dep_obj)
-        logger.debug(f' tree -> {tree}')
-        layers, indexes = reorder(layers, indexes, tree, dep_obj)
-        logger.debug(f'layers -> {layers}')
-        logger.debug(f'indexes -> {indexes}')
-        logger.debug(f'mset -> {mset}')
-        logger.debug("################################## end of  add_layers ####################################################")
-        return layers, indexes, list(mset)
-    # 7 There are dependencies, object is not in missing, insert at front
-    if dep_list_items and not id_in_missing:
-        logger.debug('### Add current to the front of the record')
-        layers.insert(0, dep_obj)
-        indexes.insert(0, loc_id)
-        logger.debug(f'layers -> {layers}')
-        logger.debug(f'indexes -> {indexes}')
-        logger.debug(f'mset -> {mset}')
-        logger.debug("################################## end of  add_layers ####################################################")
-        return layers, indexes, list(mset)
-    # 8 There are dependencies, object is in missing , delete from missing,follow the tree and reorder
-    if dep_list_items and id_in_missing:
-        logger.debug('### delete from missing,follow the tree and reorder')
-        mset.remove(loc_id)
-        tree = follow_the_tree(layers, dep_obj)
-        logger.debug(f' tree -> {tree}')
-        layers, indexes = reorder(layers, indexes, tree, dep_obj)
-        logger.debug(f'layers -> {layers}')
-        logger.debug(f'indexes -> {indexes}')
-        logger.debug(f'mset -> {mset}')
-        logger.debug("################################## end of  add_layers ####################################################")
-        return layers, indexes, list(mset)
-
-    logger.debug("theres a massive problem")
-    return layers, indexes, list(mset)
-
-
-def reorder(layers, indexes, tree, dep_obj):
-    front_layers = []
-    front_indexes = []
-    tree = list(set(tree))
-    logger.debug("%%%%%%%%%%%%%%% reorder 1 %%%%%%%%%%%%%%%%%%")
-    logger.debug(f'\n orig indexes -> {indexes}')
-    logger.debug(f"\n orig layers, {layers}")
-    logger.debug(f"\n dep_obj , {dep_obj}")
-    logger.debug("%%%%%%%%%%%%%%% reorder 2 %%%%%%%%%%dep_obj%%%%%%%%")
-    # 1. Copy elements from layers and indexes so they are in the order we want them
-    for t in reversed(tree):
-        front_layers.append(layers[t])
-        front_indexes.append(indexes[t])
-    # 2. Now order the tree in reverse numeric order, biggest first
-    tree.sort(reverse=True)
-    # 3. Now delete the elements from layers and indexes
-    for t in tree:
-        layers.pop(t)
-        indexes.pop(t)
-    # 4. Add the dep_obj to the new lists
-    front_indexes.append(dep_obj['id'])
-    front_layers.append(dep_obj)
-    # 5. Assemble the final lists
-    logger.debug(f'\nfront_indexes -> {front_indexes}')
-    logger.debug(f"\nfront_layers, {front_layers}")
-    logger.debug(f"\n old layers, {layers}")
-    logger.debug(f'\nold indexes -> {indexes}')
-    logger.debug("-------------------------------------------------------------------------------------")
-    layers = front_layers + layers
-    indexes = front_indexes + indexes
-    #logger.debug(f"\nlayers, {layers}")
-    #logger.debug(f'\nindexes -> {indexes}')
-    logger.debug("%%%%%%%%%%%%%%% end reorder %%%%%%%%%%%%%%%%%%")
-    return layers, indexes
-
-
-def follow_the_tree(layers, dep_obj):
-    tree = []
-    loc_id = dep_obj['id']
-    loc_ids = [loc_id]
-    found = True
-    while found:
-        found, ret_indexes, ret_ids = find_id(loc_ids, layers)
-        logger.debug(f'### Following Tree, found {found},index {ret_indexes}, loc_id {ret_ids}')
-        if found:
-            tree = tree + ret_indexes
-            loc_ids = ret_ids
-    return tree
-
-
-def find_id(loc_ids, layers) -> [bool, List[int], List[str]]:
-    found = False
-    indexes = []
-    ids = []
-    for loc_id in loc_ids:
-        for index, lay in enumerate(layers):
-            if loc_id in lay['dep_list']:
-                found = True
-                indexes.append(index)
-                ids.append(lay['id'])
-
-    return found, indexes, ids
-
-
-
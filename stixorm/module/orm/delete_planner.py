@@ -0,0 +1,174 @@
+import itertools
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+from stixorm.module.orm.import_utilities import val_tql
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+###################################################################################################
+#
+#    Delete Planner, the order a set of Stix objects can be deleted in
+#
+###################################################################################################
+
+# --------------------------------------------------------------------------------------------------------
+#  Overview:
+#     Each object's dep_list holds the stix-ids it references. An object must be deleted before the objects
+#     it references, so the reverse dependency graph of the delete set is built in one pass, and the objects
+#     are emitted in topological order, each once nobody left in the set references it. Objects that are
+#     referenced from outside the set cannot be deleted without leaving dangling references, and neither can
+#     the objects they in turn reference, so they are reported and left out of the order.
+# --------------------------------------------------------------------------------------------------------
+
+
+@dataclass
+class DeletePlan:
+    """ The deletion order of a set of objects
+
+    Attributes:
+        order: the dep_objs to delete, every object comes before the objects it references
+        blocked: the stix-ids that cannot be deleted, with the stix-ids of the objects still referencing them
+        cyclical: the stix-ids that reference each other in a cycle, they are at the end of the order
+    """
+    order: List[dict] = field(default_factory=list)
+    blocked: Dict[str, List[str]] = field(default_factory=dict)
+    cyclical: List[str] = field(default_factory=list)
+
+
+def plan_deletes(dep_objs: Iterable[dict],
+                 referrers: Optional[Dict[str, Iterable[str]]] = None) -> DeletePlan:
+    """ order the deletes of a set of objects, dependents before their dependencies, in linear time
+
+    Args:
+        dep_objs (): the dep_obj of each object to delete, with its "id" and "dep_list"
+        referrers (): the stix-ids of the objects in the database referencing each stix-id, default None
+            means nothing outside the delete set is known to reference them
+
+    Returns:
+        plan: the DeletePlan
+    """
+    objects: Dict[str, dict] = {}
+    for dep_obj in dep_objs:
+        objects.setdefault(dep_obj["id"], dep_obj)
+    # 1. the references within the delete set, and the number of objects in the set referencing each one
+    references: Dict[str, List[str]] = {}
+    referenced_by = dict.fromkeys(objects, 0)
+    for stix_id, dep_obj in objects.items():
+        deps = [dep for dep in dict.fromkeys(dep_obj["dep_list"]) if dep in objects and dep != stix_id]
+        references[stix_id] = deps
+        for dep in deps:
+            referenced_by[dep] += 1
+
+    plan = DeletePlan()
+    # 2. the objects referenced from outside the set are blocked, and so is everything a blocked object references
+    blocked: Dict[str, Set[str]] = {}
+    pending = deque()
+    for stix_id, refs in (referrers or {}).items():
+        external = [ref for ref in refs if ref not in objects]
+        if stix_id in objects and len(external) > 0:
+            blocked[stix_id] = set(external)
+            pending.append(stix_id)
+    while pending:
+        stix_id = pending.popleft()
+        for dep in references[stix_id]:
+            if dep not in blocked:
+                blocked[dep] = set()
+                pending.append(dep)
+            blocked[dep].add(stix_id)
+    for stix_id in objects:
+        if stix_id in blocked:
+            plan.blocked[stix_id] = sorted(blocked[stix_id])
+    if len(plan.blocked) > 0:
+        logger.warning('%s objects are still referenced and will not be deleted', len(plan.blocked))
+
+    # 3. emit each object once nothing left in the set references it
+    ready = deque(stix_id for stix_id, count in referenced_by.items() if count == 0 and stix_id not in blocked)
+    while ready:
+        stix_id = ready.popleft()
+        plan.order.append(objects[stix_id])
+        for dep in references[stix_id]:
+            referenced_by[dep] -= 1
+            if referenced_by[dep] == 0 and dep not in blocked:
+                ready.append(dep)
+
+    # 4. whatever is left references itself through a cycle, deleting any member breaks it
+    if len(plan.order) + len(plan.blocked) < len(objects):
+        emitted = {dep_obj["id"] for dep_obj in plan.order}
+        for stix_id, dep_obj in objects.items():
+            if stix_id not in emitted and stix_id not in blocked:
+                plan.cyclical.append(stix_id)
+                plan.order.append(dep_obj)
+        logger.warning('%s objects reference each other in a cycle', len(plan.cyclical))
+    return plan
+
+
+def build_referrers_query(stix_ids: List[str]) -> str:
+    """ build the query for the objects referencing any of a list of objects
+
+    A referrer is either a relation with a stix-id that the object plays a role in, such as a relationship
+    or sighting, or the stix object on the other side of an embedded reference. When that side is a sub
+    object without a stix-id, such as the mime-part holding a body_raw_ref, the referrer is the stix object
+    that owns the sub object. The role the object plays is returned as $pointed, so the caller can keep only
+    the roles that point at it.
+
+    Args:
+        stix_ids (): the stix-ids of the referenced objects
+
+    Returns:
+        query: the TypeQL get query, its answers hold the referenced stix-id in $id and the referrer in $ref
+    """
+    if len(stix_ids) == 1:
+        ids = ' $id ' + val_tql(stix_ids[0]) + ';\n'
+    else:
+        ids = ' ' + ' or '.join('{$id ' + val_tql(stix_id) + ';}' for stix_id in stix_ids) + ';\n'
+    match = 'match $obj has stix-id $id;\n' + ids
+    match += ' $rel ($pointed: $obj) isa relation;\n'
+    match += ' {$rel has stix-id $ref;} or\n'
+    match += ' {$rel ($referrer); $referrer has stix-id $ref; not {$rel has stix-id $rel-id;};} or\n'
+    match += ' {$rel ($referrer); not {$referrer has stix-id $referrer-id;}; not {$rel has stix-id $rel-id;};\n'
+    match += '  $own (pointed-to: $referrer, owner: $owner) isa embedded; $owner has stix-id $ref;};\n'
+    return match + 'get $id, $ref, $pointed;'
+
+
+def referrer_queries(stix_ids: Iterable[str], batch_size: int = 50) -> Iterator[Tuple[str, str]]:
+    """ the referrer queries of a list of objects, a batch of stix-ids at a time
+
+    Args:
+        stix_ids (): the stix-ids of the referenced objects
+        batch_size (): the number of stix-ids in each query
+
+    Returns:
+        queries: an iterator of (key, query) pairs, as taken by match_queries
+    """
+    stix_ids = iter(stix_ids)
+    batch = list(itertools.islice(stix_ids, batch_size))
+    while len(batch) > 0:
+        yield batch[0], build_referrers_query(batch)
+        batch = list(itertools.islice(stix_ids, batch_size))
+
+
+def referrers_from_answers(query: str, answer_iterator, r_tx, link_roles: FrozenSet[str]) -> List[Tuple[str, str]]:
+    """ read the answers of a referrer query
+
+    Args:
+        query (): the referrer query
+        answer_iterator (): its answers
+        r_tx (): the read transaction
+        link_roles (): the role names that point at, or link, an object
+
+    Returns:
+        referrers: the (stix-id, referrer stix-id) pairs
+    """
+    referrers = []
+    for answer in answer_iterator:
+        if answer.get("pointed").get_label().name not in link_roles:
+            continue
+        stix_id = answer.get("id").get_value()
+        ref = answer.get("ref").get_value()
+        if ref != stix_id:
+            referrers.append((stix_id, ref))
+    return referrers
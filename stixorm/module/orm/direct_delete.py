@@ -0,0 +1,329 @@
+import itertools
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from stixorm.module.authorise import find_record
+from stixorm.module.orm.filter_query import values_to_tql
+from stixorm.module.parsing.conversion_decisions import get_conversion_plan
+from stixorm.module.typedb_lib.factories.auth_factory import get_auth_factory_instance
+from stixorm.module.typedb_lib.factories.definition_factory import get_definition_factory_instance
+from stixorm.module.typedb_lib.factories.import_type_factory import ImportType
+from stixorm.module.typedb_lib.model.definitions import DefinitionName
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+###################################################################################################
+#
+#    Direct Delete, the delete queries of stix-ids, from the mapping plans of their types
+#
+###################################################################################################
+
+# --------------------------------------------------------------------------------------------------------
+#  Overview:
+#     The relations and sub objects an object can own are known from the conversion plans of its stix type,
+#     so the object does not need to be exported to find out which of them it has. Each level of the owned
+#     tree is deleted by a pattern delete that matches whichever of the possible relations are present,
+#     deepest level first, and then the object is deleted with the attributes only it owns. The attributes
+#     of the objects and their sub objects are read before the delete, so the ones left without an owner
+#     afterwards can be deleted by iid, without scanning every attribute in the database.
+# --------------------------------------------------------------------------------------------------------
+
+# the properties that are roles of the object itself, or plain attributes, rather than owned relations
+SKIPPED_RELATIONS = ("sighting_of_ref", "observed_data_refs", "where_sighted_refs",
+                     "source_ref", "target_ref", "definition", "definition_type")
+HASH_RELATIONS = ("hashes", "file_header_hashes", "playbook_hashes")
+# the deepest nesting of sub objects followed, e.g. file, ntfs-ext, alternate-data-stream, hashes
+MAX_DEPTH = 3
+
+
+@dataclass(frozen=True)
+class DeleteLink:
+    """ A relation an object, or one of its sub objects, owns
+
+    Attributes:
+        relation: the typeql relation
+        owner: the role the owner plays
+        pointed: the role the sub object plays, or None for a reference to another Stix object
+        sub_object: the typeql type of the sub object deleted with the relation, or None
+        children: the links the sub object owns in turn
+    """
+    relation: str
+    owner: str
+    pointed: Optional[str] = None
+    sub_object: Optional[str] = None
+    children: Tuple["DeleteLink", ...] = ()
+
+
+# delete links keyed by the import type key and the stix type
+_links_by_type: Dict[Tuple[str, str], Tuple[DeleteLink, ...]] = {}
+# delete clauses keyed by the import type key and the stix types
+_clauses_by_types: Dict[Tuple[str, Tuple[str, ...]], Tuple[str, ...]] = {}
+
+
+def get_delete_links(stix_type: str, import_type: ImportType) -> Tuple[DeleteLink, ...]:
+    """ compile the relations an object of a stix type can own, from the conversion plans of the type
+
+    Args:
+        stix_type (): the stix type, e.g. "indicator"
+        import_type (): the import type, whose definitions give the relations
+
+    Returns:
+        links: the DeleteLinks
+    """
+    key = (import_type.get_key(), stix_type)
+    links = _links_by_type.get(key)
+    if links is None:
+        auth_factory = get_auth_factory_instance()
+        auth = auth_factory.get_auth_for_import(import_type)
+        links = tuple(dict.fromkeys(link
+                                    for rel in get_type_relations(stix_type, auth)
+                                    for link in relation_to_links(rel, auth, 1)))
+        _links_by_type[key] = links
+    return links
+
+
+def get_type_relations(stix_type: str, auth) -> List[str]:
+    """ the relation properties of every conversion plan of a stix type
+
+    Args:
+        stix_type (): the stix type
+        auth (): the authorised mappings
+
+    Returns:
+        relations: the stix property names, in a stable order
+    """
+    relations: Dict[str, None] = {}
+    for group in ("sdo", "sro", "sco", "meta"):
+        for record in auth["conv"][group]:
+            if record["type"] != stix_type:
+                continue
+            try:
+                plan = get_conversion_plan(record["protocol"], record["typeql"], group)
+            except KeyError:
+                logger.debug('no conversion plan for %s in %s', record["typeql"], record["protocol"])
+                continue
+            relations.update(dict.fromkeys(sorted(plan.relations)))
+    if len(relations) == 0:
+        # a custom object, only the base relations are known
+        stix_model = get_definition_factory_instance().lookup_definition(DefinitionName.STIX_21)
+        for base in ("base_sdo", "base_sro", "base_sco"):
+            relations.update(dict.fromkeys(sorted(k for k, v in stix_model.get_base(base).items() if v == "")))
+    return list(relations)
+
+
+def relation_to_links(rel: str, auth, depth: int) -> List[DeleteLink]:
+    """ the DeleteLinks of one relation property, mirroring delete_sub_reln
+
+    Args:
+        rel (): the stix property name
+        auth (): the authorised mappings
+        depth (): the nesting depth of the owner
+
+    Returns:
+        links: the DeleteLinks, empty if the property is not an owned relation
+    """
+    if depth > MAX_DEPTH or rel in SKIPPED_RELATIONS:
+        return []
+    if rel == "granular_markings":
+        return [DeleteLink("granular-marking", "object")]
+    if rel in HASH_RELATIONS:
+        return [DeleteLink("hashes", "hash-owner", "hash-actual", "hash")]
+    if rel in auth["reln_name"]["key_value_relations"]:
+        config = find_record(auth, "reln", "key_value_relations", "name", rel)
+        return [DeleteLink(config["typeql"], config["owner"], config["pointed_to"], config["key"])]
+    if rel in auth["reln_name"]["list_of_objects"]:
+        config = find_record(auth, "reln", "list_of_objects", "name", rel)
+        return [DeleteLink(config["typeql"], config["owner"], config["pointed_to"], config["object"],
+                           sub_object_links(config["object"], auth, depth))]
+    if rel in auth["reln_name"]["embedded_relations"]:
+        config = find_record(auth, "reln", "embedded_relations", "rel", rel)
+        return [DeleteLink(config["typeql"], config["owner"])]
+    if rel == "extensions":
+        return [extension_to_link(config, auth, depth) for config in top_level_extensions(auth)]
+    config = find_record(auth, "reln", "extension_relations", "stix", rel)
+    if config is not None:
+        return [extension_to_link(config, auth, depth)]
+    logger.debug('relation type not known for delete, rel -> %s', rel)
+    return []
+
+
+def extension_to_link(config, auth, depth: int) -> DeleteLink:
+    return DeleteLink(config["relation"], config["owner"], config["pointed-to"], config["object"],
+                      sub_object_links(config["object"], auth, depth))
+
+
+def sub_object_links(sub_object: str, auth, depth: int) -> Tuple[DeleteLink, ...]:
+    """ the DeleteLinks a sub object owns
+
+    Args:
+        sub_object (): the typeql type of the sub object
+        auth (): the authorised mappings
+        depth (): the nesting depth of the sub object's owner
+
+    Returns:
+        links: the DeleteLinks
+    """
+    fields = auth["sub_objects"].get(sub_object, {})
+    return tuple(dict.fromkeys(link
+                               for rel, tql in fields.items() if tql == ""
+                               for link in relation_to_links(rel, auth, depth + 1)))
+
+
+def top_level_extensions(auth) -> List[dict]:
+    """ the extension relations of the extensions property, whose keys are hyphenated extension names or
+        extension-definition ids, rather than the field of an object or sub object
+
+    Args:
+        auth (): the authorised mappings
+
+    Returns:
+        configs: the extension relation records
+    """
+    nested: Set[str] = set()
+    for fields in auth["sub_objects"].values():
+        nested.update(rel for rel, tql in fields.items() if tql == "")
+    return [config for config in auth["reln"]["extension_relations"]
+            if "-" in config["stix"] and config["stix"] not in nested]
+
+
+def build_delete_queries(stix_ids: List[str], import_type: ImportType) -> List[str]:
+    """ build the queries that delete objects, with their relations and sub objects, without reading them first
+
+    Args:
+        stix_ids (): the stix-ids of the objects
+        import_type (): the import type, whose definitions give the relations
+
+    Returns:
+        queries: the TypeQL delete queries, to be run in order in one write transaction
+    """
+    stix_types = tuple(sorted({stix_id.split("--")[0] for stix_id in stix_ids}))
+    match = 'match $obj has stix-id $stix-id;\n' + values_to_tql('$stix-id {value};\n', 'in', list(stix_ids))
+    queries = [match + clause for clause in get_delete_clauses(stix_types, import_type)]
+
+    obj_match = match + '$obj has $a;\n'
+    obj_match += 'not { $obj isa thing; $p2 isa thing, has $a; not {$obj is $p2;}; };\n'
+    queries.append(obj_match + 'delete $obj isa thing; $a isa attribute; $stix-id isa stix-id;')
+    return queries
+
+
+def build_attribute_queries(stix_ids: List[str], import_type: ImportType) -> List[str]:
+    """ build the queries for the attributes owned by objects and their sub objects, which may be orphaned by
+        deleting them
+
+    Args:
+        stix_ids (): the stix-ids of the objects
+        import_type (): the import type, whose definitions give the relations
+
+    Returns:
+        queries: the TypeQL get queries, their answers hold the attribute in $a
+    """
+    stix_types = tuple(sorted({stix_id.split("--")[0] for stix_id in stix_ids}))
+    match = 'match $obj has stix-id $stix-id;\n' + values_to_tql('$stix-id {value};\n', 'in', list(stix_ids))
+    queries = [match + '$obj has $a;\nget $a;']
+    links = dict.fromkeys(link for stix_type in stix_types for link in get_delete_links(stix_type, import_type))
+    sub_paths = []
+    pending = [(link,) for link in links]
+    while len(pending) > 0:
+        sub_paths.extend(path for path in pending if path[-1].sub_object is not None)
+        pending = [path + (child,) for path in pending for child in path[-1].children]
+    if len(sub_paths) > 0:
+        queries.append(match + paths_to_tql(sub_paths) + '$s has $a;\nget $a;')
+    return queries
+
+
+def attribute_queries(stix_ids: Iterable[str], import_type: ImportType,
+                      batch_size: int = 50) -> Iterator[Tuple[str, str]]:
+    """ the attribute queries of a list of objects, a batch of stix-ids at a time
+
+    Args:
+        stix_ids (): the stix-ids of the objects
+        import_type (): the import type
+        batch_size (): the number of stix-ids in each query
+
+    Returns:
+        queries: an iterator of (key, query) pairs, as taken by match_queries
+    """
+    stix_ids = iter(stix_ids)
+    batch = list(itertools.islice(stix_ids, batch_size))
+    while len(batch) > 0:
+        for query in build_attribute_queries(batch, import_type):
+            yield batch[0], query
+        batch = list(itertools.islice(stix_ids, batch_size))
+
+
+def attribute_iids_from_answers(query: str, answer_iterator, r_tx) -> List[str]:
+    """ read the attribute iids answered by an attribute query
+
+    Args:
+        query (): the attribute query
+        answer_iterator (): its answers
+        r_tx (): the read transaction
+
+    Returns:
+        iids: the attribute iids
+    """
+    return [answer.get("a").get_iid() for answer in answer_iterator]
+
+
+def get_delete_clauses(stix_types: Tuple[str, ...], import_type: ImportType) -> Tuple[str, ...]:
+    """ compile the match and delete clauses of the owned relations of some stix types, deepest level first
+
+    Args:
+        stix_types (): the stix types
+        import_type (): the import type, whose definitions give the relations
+
+    Returns:
+        clauses: the clauses on $obj, each is the rest of a delete query
+    """
+    key = (import_type.get_key(), stix_types)
+    clauses = _clauses_by_types.get(key)
+    if clauses is None:
+        links = dict.fromkeys(link for stix_type in stix_types for link in get_delete_links(stix_type, import_type))
+        levels: List[List[Tuple[DeleteLink, ...]]] = []
+        pending = [(link,) for link in links]
+        while len(pending) > 0:
+            levels.append(pending)
+            pending = [path + (child,) for path in pending for child in path[-1].children]
+        clauses = []
+        for paths in reversed(levels):
+            sub_paths = [path for path in paths if path[-1].sub_object is not None]
+            ref_paths = [path for path in paths if path[-1].sub_object is None]
+            if len(sub_paths) > 0:
+                clauses.append(paths_to_tql(sub_paths) + 'delete $r isa relation; $s isa entity;')
+            if len(ref_paths) > 0:
+                clauses.append(paths_to_tql(ref_paths) + 'delete $r isa relation;')
+        clauses = tuple(clauses)
+        _clauses_by_types[key] = clauses
+    return clauses
+
+
+def paths_to_tql(paths: List[Tuple[DeleteLink, ...]]) -> str:
+    """ match any one of a list of paths from $obj, each ending in the relation $r and its sub object $s
+
+    Args:
+        paths (): the paths of DeleteLinks
+
+    Returns:
+        clause: the typeql match clause
+    """
+    branches = []
+    for i, path in enumerate(paths):
+        owner_var = '$obj'
+        branch = ''
+        for j, link in enumerate(path):
+            last = j == len(path) - 1
+            rel_var = '$r' if last else '$r' + str(i) + '_' + str(j)
+            sub_var = '$s' if last else '$s' + str(i) + '_' + str(j)
+            players = link.owner + ':' + owner_var
+            if link.sub_object is not None:
+                players += ', ' + link.pointed + ':' + sub_var
+            branch += rel_var + ' (' + players + ') isa ' + link.relation + '; '
+            if link.sub_object is not None:
+                branch += sub_var + ' isa ' + link.sub_object + '; '
+            owner_var = sub_var
+        branches.append('{' + branch.strip() + '}')
+    if len(branches) == 1:
+        return ' ' + branches[0][1:-1] + '\n'
+    return ' ' + ' or\n '.join(branches) + ';\n'
@@ -0,0 +1,77 @@
+import copy
+import itertools
+import json
+import logging
+import pathlib
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Union
+
+logger = logging.getLogger(__name__)
+
+
+class ExportCapture(ABC):
+    """Receives the intermediate forms of an export, for troubleshooting the TypeQL to STIX mapping
+
+    Export does not capture anything unless a capture is passed to it. The stages are "res",
+    the intermediate form read from the answers, and "stix", the final STIX dict.
+    """
+    @abstractmethod
+    def capture(self, stage: str, data):
+        """Receive one capture
+
+        Args:
+            stage (): the stage name, "res" or "stix"
+            data (): the data of the stage
+        """
+
+
+class MemoryCapture(ExportCapture):
+    """Keeps the most recent captures in memory
+
+    Args:
+        max_entries (): the size of the ring buffer, the oldest captures are dropped first
+    """
+    def __init__(self, max_entries: int = 100):
+        self.entries = deque(maxlen=max_entries)
+
+    def capture(self, stage: str, data):
+        self.entries.append((stage, copy.deepcopy(data)))
+
+    def latest(self, stage: str):
+        """Get the most recent capture of a stage
+
+        Args:
+            stage (): the stage name
+
+        Returns:
+            data: the captured data, or None if the stage has not been captured
+        """
+        for entry_stage, data in reversed(self.entries):
+            if entry_stage == stage:
+                return data
+        return None
+
+
+class DirectoryCapture(ExportCapture):
+    """Writes each capture to its own numbered json file in a directory, so concurrent exports never share a file
+
+    Args:
+        directory (): the directory to write to, it is created if it does not exist
+    """
+    def __init__(self, directory: Union[str, pathlib.Path]):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def capture(self, stage: str, data):
+        with self._lock:
+            number = next(self._counter)
+        path = self.directory.joinpath(f"{number:06d}-{stage}.json")
+        try:
+            with open(path, "w") as outfile:
+                json.dump(data, outfile, default=str)
+        except (OSError, TypeError) as e:
+            logger.warning('Could not capture export stage %s to %s: %s', stage, path, e)
@@ -1,12 +1,11 @@
-import json
-import pathlib
 import traceback
-from typing import List
+from typing import List, Optional
 import copy
 
-from stixorm.module.authorise import authorised_mappings
+from stixorm.module.authorise import authorised_mappings, find_record
 from stixorm.module.parsing.conversion_decisions import stix_dict_to_tql
 from stixorm.module.orm.export_utilities import convert_ans_to_res
+from stixorm.module.orm.export_capture import ExportCapture
 import logging
 
 from stixorm.module.typedb_lib.factories.auth_factory import get_auth_factory_instance
@@ -30,7 +29,7 @@ logger = logging.getLogger(__name__)
 # --------------------------------------------------------------------------------------------------------
 
 
-def convert_ans_to_stix(query, answer_iterator, r_tx, import_type: ImportType):
+def convert_ans_to_stix(query, answer_iterator, r_tx, import_type: ImportType, capture: Optional[ExportCapture] = None):
     """
         High level function to convert the typedb_lib return into a Stix object.
         Firstly, drive the grpc to make an intermediate format, then convert that to a Stix dict
@@ -38,25 +37,20 @@ def convert_ans_to_stix(query, answer_iterator, r_tx, import_type: ImportType):
         answer_iterator (): the returned iterator from the typedb_lib query
         r_tx (): the transaction
         import_type (): the type of import STIX21 or ATT&CK
+        capture (): if set, receives the intermediate form and the stix dict, for troubleshooting
 
     Returns:
         stix_dict {}: a dict containing the stix object
     """
     res = convert_ans_to_res(answer_iterator, r_tx, import_type)
-    path = pathlib.Path(__file__).parent.joinpath("export_test.json")
-    with open(str(path), 'w') as outfile:
-       json.dump(res, outfile)
-    logger.debug(f'got res, now for stix')
+    if capture is not None:
+        capture.capture("res", res)
+    logger.debug('got res, now for stix')
     stix_dict = convert_res_to_stix(res, import_type)
-    logger.debug((f'got stix now for object'))
-    logger.debug("=========================================")
-    path2 = pathlib.Path(__file__).parent.joinpath("export_test2.json")
-    with open(str(path2), 'w') as outfile:
-       json.dump(stix_dict, outfile)
-    json_object = json.dumps(stix_dict, indent=4)
-    logger.debug(json_object)
-    logger.debug("=========================================")
-    return json_object
+    if capture is not None:
+        capture.capture("stix", stix_dict)
+    logger.debug('got stix now for object')
+    return stix_dict
 
 
 # --------------------------------------------------------------------------------------------------------
@@ -89,10 +83,10 @@ def convert_res_to_stix(res: List[dict], import_type: ImportType):
         elif obj_type in auth["tql_types"]["meta"] or obj_type == "statement-marking":
             stix_dict = make_meta(obj, import_type)
         else:
-            logger.error(f'Unknown object type: {obj}')
+            logger.error('Unknown object type: %s', obj)
 
-    logger.debug(f'\n\n')
-    logger.debug(f'stix dict -> {stix_dict}\n')
+    logger.debug('\n\n')
+    logger.debug('stix dict -> %s\n', stix_dict)
     return stix_dict
 
 
@@ -113,9 +107,9 @@ def make_sdo(res, import_type: ImportType):
         # 2.A) get the typeql properties and relations
         sdo_tql_name = res["T_name"]
         sdo_type = ""
-        for model in auth["conv"]["sdo"]:
-            if model["typeql"] == sdo_tql_name:
-                sdo_type = model["type"]
+        model = find_record(auth, "conv", "sdo", "typeql", sdo_tql_name, last=True)
+        if model is not None:
+            sdo_type = model["type"]
         props = res["has"]
         relns = res["relns"]
         stix_props = {}
@@ -171,7 +165,7 @@ def make_sro(res, import_type: ImportType):
         for has in props:
             if has["typeql"] == "relationship-type":
                 sro_sub_rel = has["value"]
-                logger.debug(f'found relationship type -> {sro_sub_rel}\n')
+                logger.debug('found relationship type -> %s\n', sro_sub_rel)
                 break
     elif sro_tql_name in auth["tql_types"]["relations_sro_roles"]:
         sro_sub_rel = sro_tql_name
@@ -188,7 +182,7 @@ def make_sro(res, import_type: ImportType):
 
     obj_tql, sro_tql_name, is_list, protocol = stix_dict_to_tql(stix_props)
 
-    logger.debug(f'make sro obj_tql ->{obj_tql}\n sro tql name ->{sro_tql_name}')
+    logger.debug('make sro obj_tql ->%s\n sro tql name ->%s', obj_tql, sro_tql_name)
     # 2.A) get the typeql properties and relations
     props = res["has"]
     relns = res["relns"]
@@ -196,11 +190,10 @@ def make_sro(res, import_type: ImportType):
     # 2.) setup the match statements first, depending on whether the object is a sighting or a relationship
     # A. If it is a Relationship then find the source and target roles for the relation, and match them in
     if sro_tql_name in auth["reln_name"]["standard_relations"]:
-        for stix_rel in auth["reln"]["standard_relations"]:
-            if stix_rel["stix"] == sro_tql_name:
-                source_role = stix_rel["source"]
-                target_role = stix_rel["target"]
-                break
+        stix_rel = find_record(auth, "reln", "standard_relations", "stix", sro_tql_name)
+        if stix_rel is not None:
+            source_role = stix_rel["source"]
+            target_role = stix_rel["target"]
 
         for edge in edges:
             players = edge["player"]
@@ -214,7 +207,7 @@ def make_sro(res, import_type: ImportType):
                     stix_dict["target_ref"] = p["stix_id"]
                     break
             else:
-                logger.error(f'edge role {edge["role"]} not supported')
+                logger.error('edge role %s not supported', edge['role'])
                 return ''
 
     # B. If it is a Sighting then match the object to the sighting
@@ -241,11 +234,11 @@ def make_sro(res, import_type: ImportType):
                         stix_dict["observed_data_refs"] = []
                         stix_dict["observed_data_refs"].append(p["stix_id"])
             else:
-                logger.error(f'edge role {edge["role"]} not supported')
+                logger.error('edge role %s not supported', edge['role'])
                 return ''
 
     else:
-        logger.error(f'relationship type {sro_tql_name} not supported')
+        logger.error('relationship type %s not supported', sro_tql_name)
         return ''
 
     # 3.A) add the properties onto the the object
@@ -428,7 +421,7 @@ def make_relations(relns, obj_tql, stix_dict, is_list, obj_name, import_type: Im
             stix_dict = make_hashes(reln, reln_name, stix_dict)
 
         else:
-            logger.error(f'Error, relation name is {reln_name}')
+            logger.error('Error, relation name is %s', reln_name)
             break
 
     return stix_dict
@@ -450,11 +443,11 @@ def make_embedded_relations(reln, reln_name, stix_dict, is_list: bool, obj_name,
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
     stix_object_type = obj_name
-    for embedded_r in auth["reln"]["embedded_relations"]:
-        if reln_name == embedded_r["typeql"]:
-            role_pointed = embedded_r["pointed-to"]
-            stix_name = embedded_r["rel"]
-            role_owner = embedded_r["owner"]
+    embedded_r = find_record(auth, "reln", "embedded_relations", "typeql", reln_name, last=True)
+    if embedded_r is not None:
+        role_pointed = embedded_r["pointed-to"]
+        stix_name = embedded_r["rel"]
+        role_owner = embedded_r["owner"]
 
     point = []
     own = []
@@ -464,7 +457,7 @@ def make_embedded_relations(reln, reln_name, stix_dict, is_list: bool, obj_name,
         elif role["role"] == role_owner:
             own.append(role)
         else:
-            logger.error(f'unsupported role in embedded relation {role["role"]}')
+            logger.error('unsupported role in embedded relation %s', role['role'])
 
     #collect players in point
     pointed = {}
@@ -521,14 +514,13 @@ def make_key_value_relations(reln, reln_name, stix_dict, is_list, obj_type, impo
     """
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
-    for kv_obj in auth["reln"]["key_value_relations"]:
-        if reln_name == kv_obj["typeql"]:
-            role_pointed = kv_obj["pointed_to"]
-            reln_owner = kv_obj["owner"]
-            key_name = kv_obj["key"]
-            val_name = kv_obj["value"]
-            stix_field_name = kv_obj["name"]
-            break
+    kv_obj = find_record(auth, "reln", "key_value_relations", "typeql", reln_name)
+    if kv_obj is not None:
+        role_pointed = kv_obj["pointed_to"]
+        reln_owner = kv_obj["owner"]
+        key_name = kv_obj["key"]
+        val_name = kv_obj["value"]
+        stix_field_name = kv_obj["name"]
 
     roles = reln["roles"]
     dict_of_kv = {}
@@ -596,14 +588,13 @@ def make_object(reln, reln_name, stix_dict, is_list, obj_type, import_type: Impo
     logger.debug("make object visited")
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
-    for ext_obj in auth["reln"]["extension_relations"]:
-        if reln_name == ext_obj["relation"]:
-            role_pointed = ext_obj["pointed-to"]
-            role_owner = ext_obj["owner"]
-            ext_object = ext_obj["object"]
-            stix_ext_name = ext_obj["stix"]
-            obj_is_list = copy.deepcopy(auth["is_lists"]["sub"][ext_object])
-            break
+    ext_obj = find_record(auth, "reln", "extension_relations", "relation", reln_name)
+    if ext_obj is not None:
+        role_pointed = ext_obj["pointed-to"]
+        role_owner = ext_obj["owner"]
+        ext_object = ext_obj["object"]
+        stix_ext_name = ext_obj["stix"]
+        obj_is_list = copy.deepcopy(auth["is_lists"]["sub"][ext_object])
 
     if ext_object in auth["sub_objects"]:
         obj_props_tql = copy.deepcopy(auth["sub_objects"][ext_object])
@@ -666,17 +657,16 @@ def make_list_of_objects(reln, reln_name, stix_dict, is_list, obj_type, import_t
     """
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
-    for l_obj in auth["reln"]["list_of_objects"]:
-        if reln_name == l_obj["typeql"]:
-            role_pointed = l_obj["pointed_to"]
-            reln_object = l_obj["object"]
-            stix_field_name = l_obj["name"]
-            obj_is_list = copy.deepcopy(auth["is_lists"]["sub"][reln_object])
-            logger.debug("obj_is_list: {}".format(obj_is_list))
-            logger.debug("reln_object: {}".format(reln_object))
-            logger.debug("stix_field_name: {}".format(stix_field_name))
-            logger.debug("role_pointed: {}".format(role_pointed))
-            break
+    l_obj = find_record(auth, "reln", "list_of_objects", "typeql", reln_name)
+    if l_obj is not None:
+        role_pointed = l_obj["pointed_to"]
+        reln_object = l_obj["object"]
+        stix_field_name = l_obj["name"]
+        obj_is_list = copy.deepcopy(auth["is_lists"]["sub"][reln_object])
+        logger.debug("obj_is_list: %s", obj_is_list)
+        logger.debug("reln_object: %s", reln_object)
+        logger.debug("stix_field_name: %s", stix_field_name)
+        logger.debug("role_pointed: %s", role_pointed)
 
     if reln_object in auth["sub_objects"]:
         obj_props_tql = copy.deepcopy(auth["sub_objects"][reln_object])
@@ -714,22 +704,21 @@ def make_list_of_objects(reln, reln_name, stix_dict, is_list, obj_type, import_t
                         player[prop_stix_name] = prop_value
                 # now look to see if there are relations
                 obj_relns = [k for k, v in obj_props_tql.items() if v == ""]
-                logger.debug(f'sub relns -> {sub_relns}')
+                logger.debug('sub relns -> %s', sub_relns)
                 for sub_reln in sub_relns:
-                    logger.debug(f'\n\nsub reln -> {sub_reln}')
+                    logger.debug('\n\nsub reln -> %s', sub_reln)
                     # if the relation is embedded
                     if sub_reln["T_name"] in auth["tql_types"]["embedded_relations"]:
-                        for inst in auth["reln"]["embedded_relations"]:
-                            if inst["typeql"] == sub_reln["T_name"]:
-                                obj_reln_name = inst["typeql"]
-                                obj_owner = inst["owner"]
-                                obj_pointed = inst["pointed-to"]
-                                obj_stix_name = inst["rel"]
-                                logger.debug(f'obj_reln_name -> {obj_reln_name}')
-                                logger.debug(f'obj_owner -> {obj_owner}')
-                                logger.debug(f'obj_pointed -> {obj_pointed}')
-                                logger.debug(f'obj_stix_name -> {obj_stix_name}')
-                                break
+                        inst = find_record(auth, "reln", "embedded_relations", "typeql", sub_reln["T_name"])
+                        if inst is not None:
+                            obj_reln_name = inst["typeql"]
+                            obj_owner = inst["owner"]
+                            obj_pointed = inst["pointed-to"]
+                            obj_stix_name = inst["rel"]
+                            logger.debug('obj_reln_name -> %s', obj_reln_name)
+                            logger.debug('obj_owner -> %s', obj_owner)
+                            logger.debug('obj_pointed -> %s', obj_pointed)
+                            logger.debug('obj_stix_name -> %s', obj_stix_name)
 
                         local_roles = sub_reln["roles"]
                         for l_r in local_roles:
@@ -756,7 +745,7 @@ def make_list_of_objects(reln, reln_name, stix_dict, is_list, obj_type, import_t
                                                     player[obj_stix_name] = answer
 
                     else:
-                        logger.debug(f'unsupported relation for list of objects {sub_reln}')
+                        logger.debug('unsupported relation for list of objects %s', sub_reln)
                         #logger.info(f'embedded --> {stix_models["embedded_relations_typeql"]}')
 
                 list_of_objects.append(player)
@@ -858,7 +847,7 @@ def make_hashes(reln, reln_name, stix_dict):
                 hashes[hash_type] = hash_value
 
         else:
-            logger.error(f" make hashes relation not implemented {r['role']}")
+            logger.error(" make hashes relation not implemented %s", r['role'])
 
     stix_dict[stix_label] = hashes
     return stix_dict
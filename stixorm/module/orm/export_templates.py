@@ -0,0 +1,127 @@
+from typing import Dict, FrozenSet, Tuple
+
+from stixorm.module.typedb_lib.factories.auth_factory import get_auth_factory_instance
+from stixorm.module.typedb_lib.factories.import_type_factory import ImportType
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+###################################################################################################
+#
+#    Export Templates, the relations each exported type is discovered through
+#
+###################################################################################################
+
+# --------------------------------------------------------------------------------------------------------
+#  Overview:
+#     An exported object only needs the relations it owns, i.e. its references and sub objects. The
+#     relations it is only the target of, such as the created-by of every object an identity created, or
+#     the object-marking of every object a marking marks, are dropped again by the exporter. So the roles
+#     that only ever point at, or link, objects are compiled from the definitions, and each type's template
+#     keeps the roles it plays apart from those, so the cost of an export does not grow with the number of
+#     objects that refer to it.
+# --------------------------------------------------------------------------------------------------------
+
+# the roles of a sighting, which is not in the relationship definitions
+SIGHTING_ROLES = ("sighting-of", "where-sighted", "observed")
+
+# link roles keyed by the import type key
+_link_roles_by_key: Dict[str, FrozenSet[str]] = {}
+
+
+def get_link_roles(import_type: ImportType) -> FrozenSet[str]:
+    """ compile the role names that only point at, or link, Stix objects, and are never the owner of a sub object
+
+    Args:
+        import_type (): the import type, whose definitions give the relations
+
+    Returns:
+        roles: the role names
+    """
+    key = import_type.get_key()
+    roles = _link_roles_by_key.get(key)
+    if roles is None:
+        auth_factory = get_auth_factory_instance()
+        auth = auth_factory.get_auth_for_import(import_type)
+        reln = auth["reln"]
+        pointed = set(SIGHTING_ROLES)
+        owners = set()
+        for group, pointed_field in (("embedded_relations", "pointed-to"),
+                                     ("list_of_objects", "pointed_to"),
+                                     ("key_value_relations", "pointed_to"),
+                                     ("extension_relations", "pointed-to")):
+            for record in reln[group]:
+                pointed.add(record[pointed_field])
+                owners.add(record["owner"])
+        for group in ("standard_relations", "relations_sro_roles"):
+            for record in reln[group]:
+                pointed.add(record["source"])
+                pointed.add(record["target"])
+        roles = frozenset(pointed - owners)
+        _link_roles_by_key[key] = roles
+    return roles
+
+
+def owned_role_filter(role_types, variable: str = "$o") -> str:
+    """ build the match statement that restricts a role variable to the role types of a template
+
+    Args:
+        role_types (): the role types, as returned by ExportTemplates.owned_roles
+        variable (): the role variable
+
+    Returns:
+        match: the TypeQL statement, a disjunction if there is more than one role type
+    """
+    labels = [role_type.get_label().scoped_name() for role_type in role_types]
+    if len(labels) == 1:
+        return ' ' + variable + ' type ' + labels[0] + ';\n'
+    return ' ' + ' or '.join('{' + variable + ' type ' + label + ';}' for label in labels) + ';\n'
+
+
+class ExportTemplates:
+    """
+        The per type templates of one export, each is the role types a type owns its relations through.
+        They are built from the role types the schema lets the type play, less the link roles.
+    Args:
+        r_tx (): the read transaction
+        import_type (): the import type of the export
+    """
+    def __init__(self, r_tx, import_type: ImportType):
+        self.r_tx = r_tx
+        self.link_roles = get_link_roles(import_type)
+        self.templates: Dict[str, Tuple] = {}
+
+    def owned_roles(self, thing) -> Tuple:
+        """
+            Get the role types a thing owns its references and sub objects through
+        Args:
+            thing (): the entity or relation being exported
+
+        Returns:
+            role_types: the role types, shared by every thing of the same type
+        """
+        thing_type = thing.get_type()
+        label = thing_type.get_label().name
+        if label not in self.templates:
+            role_types = []
+            for role_type in thing_type.get_plays(self.r_tx):
+                if role_type.get_label().name not in self.link_roles:
+                    role_types.append(role_type)
+            self.templates[label] = tuple(role_types)
+            logger.debug('export template for %s owns %s', label, len(role_types))
+        return self.templates[label]
+
+    def get_relations(self, thing):
+        """
+            Get the relations a thing owns
+        Args:
+            thing (): the entity or relation being exported
+
+        Returns:
+            relations: the relations the thing plays an owned role in
+        """
+        role_types = self.owned_roles(thing)
+        if len(role_types) == 0:
+            return []
+        return thing.get_relations(self.r_tx, list(role_types))
@@ -1,9 +1,12 @@
 import copy
 from datetime import timezone
 
+from typing import Optional
+
 from typedb.api.concept.type.attribute_type import AttributeType
 
-from stixorm.module.authorise import authorised_mappings
+from stixorm.module.authorise import authorised_mappings, find_record
+from stixorm.module.orm.export_templates import ExportTemplates, owned_role_filter
 
 import logging
 
@@ -19,6 +22,179 @@ logger = logging.getLogger(__name__)
 # --------------------------------------------------------------------------------------------------------
 
 
+class StixIdLookup:
+    """
+        Reads what an export needs to know about the things around an exported object. prefetch() sends a fixed
+        set of queries per object, built from the role types its export template owns, that read its attributes,
+        the players of the relations it owns, the attributes and relations of the sub objects in them, and the
+        stix-ids of all of those players. So neither the size of the object, nor the number of objects referring
+        to it, adds round trips. Anything that was not prefetched, such as a sub object nested more than one level
+        down, is read through the concept API and remembered.
+    Args:
+        r_tx (): the read transaction
+    """
+    def __init__(self, r_tx):
+        self.r_tx = r_tx
+        self._attribute_type = None
+        self.ids = {}
+        self._has = {}
+        self._relations = {}
+        self._players = {}
+        self._role_depths = {}
+
+    @property
+    def attribute_type(self):
+        if self._attribute_type is None:
+            self._attribute_type = self.r_tx.concepts.get_attribute_type("stix-id").resolve()
+        return self._attribute_type
+
+    def prefetch(self, thing, role_types, is_relation: bool) -> list:
+        """
+            Read the attributes of a thing, the relations it owns, with their players and sub objects, and if it is
+            a relation, its own players, in one pipelined set of queries
+        Args:
+            thing (): the exported entity or relation
+            role_types (): the role types the thing owns its relations through, from its export template
+            is_relation (): whether the thing is a relation
+
+        Returns:
+            relations: the relations the thing owns
+        """
+        match = 'match $x iid ' + thing.get_iid() + ';\n'
+        queries = {"has": match + ' $x has $a;\nget $a;'}
+        if len(role_types) > 0:
+            owned = match + ' $r ($o: $x) isa relation;\n' + owned_role_filter(role_types)
+            sub = owned + ' $r ($p); $p isa entity; not { $p has stix-id $pid; };\n'
+            sub_relation = sub + ' $s ($p) isa relation;\n'
+            queries["players"] = owned + ' $r ($role: $p);\nget $r, $role, $p;'
+            queries["ids"] = owned + ' $r ($p); $p has stix-id $id;\nget $p, $id;'
+            queries["sub_has"] = sub + ' $p has $a;\nget $p, $a;'
+            queries["sub_relations"] = sub_relation + 'get $p, $s;'
+            queries["sub_players"] = sub_relation + ' $s ($role: $q);\nget $s, $role, $q;'
+            queries["sub_ids"] = sub_relation + ' $s ($q); $q has stix-id $id;\nget $q, $id;'
+        if is_relation:
+            queries["own_players"] = match + ' $x ($role: $p);\nget $role, $p;'
+            queries["own_ids"] = match + ' $x ($p); $p has stix-id $id;\nget $p, $id;'
+        # all the queries are sent before any answer is read
+        answers = {name: self.r_tx.query.get(query) for name, query in queries.items()}
+
+        self._has[thing.get_iid()] = [answer.get("a") for answer in answers["has"]]
+        relations = {}
+        plays = []
+        for name, relation, player in (("players", "r", "p"), ("sub_players", "s", "q"), ("own_players", None, "p")):
+            for answer in answers.get(name, []):
+                owner = thing if relation is None else answer.get(relation)
+                plays.append((owner, answer.get("role"), answer.get(player)))
+                if name == "players":
+                    relations.setdefault(owner.get_iid(), owner)
+        self.__add_players(plays)
+        for name in ("ids", "sub_ids", "own_ids"):
+            for answer in answers.get(name, []):
+                self.ids[answer.get("p" if name != "sub_ids" else "q").get_iid()] = answer.get("id").get_value()
+
+        # the sub objects are the entity players without a stix-id, they may have no attributes or relations
+        for players in [self._players[iid] for iid in relations]:
+            for _, role_players in players.values():
+                for player in role_players:
+                    if player.is_entity() and self.ids.get(player.get_iid()) is None:
+                        self.ids.setdefault(player.get_iid(), None)
+                        self._has.setdefault(player.get_iid(), [])
+                        self._relations.setdefault(player.get_iid(), [])
+        sub_relations = {}
+        for answer in answers.get("sub_has", []):
+            self._has.setdefault(answer.get("p").get_iid(), []).append(answer.get("a"))
+        for answer in answers.get("sub_relations", []):
+            sub_relation = answer.get("s")
+            if (answer.get("p").get_iid(), sub_relation.get_iid()) not in sub_relations:
+                sub_relations[(answer.get("p").get_iid(), sub_relation.get_iid())] = sub_relation
+                self._relations.setdefault(answer.get("p").get_iid(), []).append(sub_relation)
+        return list(relations.values())
+
+    def __add_players(self, plays):
+        # a variable role also matches the supertypes of the role played, so only the most specific is kept
+        candidates = {}
+        for relation, role, player in plays:
+            if role.is_root():
+                continue
+            key = (relation.get_iid(), player.get_iid())
+            if key not in candidates:
+                candidates[key] = (relation, player, [])
+            candidates[key][2].append(role)
+        players = {}
+        for relation, player, roles in candidates.values():
+            role = max(roles, key=self.__role_depth)
+            role_players = players.setdefault(relation.get_iid(), {})
+            role_players.setdefault(role.get_label().name, (role, []))[1].append(player)
+        self._players.update(players)
+
+    def __role_depth(self, role) -> int:
+        label = role.get_label()
+        key = (label.scope, label.name)
+        if key not in self._role_depths:
+            self._role_depths[key] = len(list(role.get_supertypes(self.r_tx)))
+        return self._role_depths[key]
+
+    def get(self, thing):
+        """
+            Get the stix-id of a thing
+        Args:
+            thing (): the entity or relation
+
+        Returns:
+            stix_id: the stix-id value, or None if the thing has none
+        """
+        iid = thing.get_iid()
+        if iid not in self.ids:
+            value = None
+            for attr in thing.get_has(self.r_tx, attribute_type=self.attribute_type):
+                value = attr.get_value()
+            self.ids[iid] = value
+        return self.ids[iid]
+
+    def get_has(self, thing) -> list:
+        """
+            Get the attributes a thing owns
+        Args:
+            thing (): the entity or relation
+
+        Returns:
+            attributes: the attributes
+        """
+        iid = thing.get_iid()
+        if iid not in self._has:
+            self._has[iid] = list(thing.get_has(self.r_tx))
+        return self._has[iid]
+
+    def get_relations(self, thing) -> list:
+        """
+            Get the relations a sub object plays a role in
+        Args:
+            thing (): the sub object entity
+
+        Returns:
+            relations: the relations
+        """
+        iid = thing.get_iid()
+        if iid not in self._relations:
+            self._relations[iid] = list(thing.get_relations(self.r_tx))
+        return self._relations[iid]
+
+    def get_players(self, relation) -> dict:
+        """
+            Get the players of a relation by role type
+        Args:
+            relation (): the relation
+
+        Returns:
+            players: the players of each role type
+        """
+        iid = relation.get_iid()
+        if iid not in self._players:
+            self._players[iid] = {role.get_label().name: (role, list(players))
+                                  for role, players in relation.get_players(self.r_tx).items()}
+        return dict(self._players[iid].values())
+
+
 def convert_ans_to_res(answer_iterator, r_tx, import_type: ImportType):
     """
     Take the response from TypeDB to a query, and start the process to use GRPC (typedb_lib-client) commands
@@ -37,6 +213,8 @@ def convert_ans_to_res(answer_iterator, r_tx, import_type: ImportType):
         res: A list of data objects, in the intermediate form for processing into Stix objects
     """
     res = []
+    stix_ids = StixIdLookup(r_tx)
+    templates = ExportTemplates(r_tx, import_type)
 
     for answer in answer_iterator:
         #concepts = answer.concepts()
@@ -52,12 +230,12 @@ def convert_ans_to_res(answer_iterator, r_tx, import_type: ImportType):
                        'symbol': key,
                        'T_id': thing.get_iid(),
                        'T_name': thing.get_type().get_label().name}
+                reln_types = stix_ids.prefetch(thing, templates.owned_roles(thing), False)
                 # 2 get and dsecribe properties
-                props_obj = thing.get_has(r_tx)
+                props_obj = stix_ids.get_has(thing)
                 ent['has'] = process_props(props_obj)
                 # 3. get and describe relations
-                reln_types = thing.get_relations(r_tx)
-                ent['relns'] = process_relns(reln_types, r_tx, import_type)
+                ent['relns'] = process_relns(reln_types, r_tx, import_type, stix_ids)
                 res.append(ent)
                 # logger.debug(f'ent -> {ent}')
 
@@ -69,20 +247,19 @@ def convert_ans_to_res(answer_iterator, r_tx, import_type: ImportType):
                        'symbol': key,
                        'T_id': thing.get_iid(),
                        'T_name': thing.get_type().get_label().name}
-                att_obj = thing.get_has(r_tx)
+                reln_types = stix_ids.prefetch(thing, templates.owned_roles(thing), True)
+                att_obj = stix_ids.get_has(thing)
                 rel['has'] = process_props(att_obj)
                 # 3. get and describe relations
-                reln_types = thing.get_relations(r_tx)
-                rel['relns'] = process_relns(reln_types, r_tx, import_type)
+                rel['relns'] = process_relns(reln_types, r_tx, import_type, stix_ids)
                 # 4. get and describe the edges
                 edges = []
-                edge_types = thing.get_players(r_tx)
-                stix_id = r_tx.concepts.get_attribute_type("stix-id").resolve()
+                edge_types = stix_ids.get_players(thing)
                 for role, things in edge_types.items():
                     edge = {"role": role.get_label().name, 'player': []}
                     for thing in things:
                         if thing.is_entity():
-                            edge['player'].append(process_entity(thing, r_tx, stix_id))
+                            edge['player'].append(process_entity(thing, r_tx, stix_ids))
 
                     edges.append(edge)
 
@@ -91,77 +268,78 @@ def convert_ans_to_res(answer_iterator, r_tx, import_type: ImportType):
 
             # else log out error condition
             elif concept.is_type():
-                logger.debug(f'Error key is {key}, thing is type')
+                logger.debug('Error key is %s, thing is type', key)
             elif concept.is_thing_type():
-                logger.debug(f'Error key is {key}, thing is thing type')
+                logger.debug('Error key is %s, thing is thing type', key)
             elif concept.is_attribute_type():
-                logger.debug(f'Error key is {key}, thing is attribute type')
+                logger.debug('Error key is %s, thing is attribute type', key)
             elif concept.is_relation_type():
-                logger.debug(f'Error key is {key}, thing is relation type')
+                logger.debug('Error key is %s, thing is relation type', key)
             elif concept.is_attribute():
-                logger.debug(f'Error key is {key}, thing is attributee')
+                logger.debug('Error key is %s, thing is attributee', key)
             elif concept.is_value():
-                logger.debug(f'Error key is {key}, thing is value')
+                logger.debug('Error key is %s, thing is value', key)
             elif concept.is_role_type():
-                logger.debug(f'Error key is {key}, thing is role type')
+                logger.debug('Error key is %s, thing is role type', key)
 
     return res
 
 
-def process_entity(thing, r_tx, stix_id: str):
+def process_entity(thing, r_tx, stix_ids: StixIdLookup):
     """
         If the current returned object from typedb_lib contains an entity then unpack it install grpc commands
         into an interim list
     Args:
         thing (): the grpc entity reference
         r_tx (): the typedb_lib transaction
-        stix_id (): the stix object id
+        stix_ids (): the stix-id lookup of the export
 
     Returns:
         play {}: a return dict
     """
     play = {"type": "entity", "tql": thing.get_type().get_label().name}
-    attr_stix_id = thing.get_has(r_tx, attribute_type=stix_id)
-    for attr in attr_stix_id:
-        play["stix_id"] = attr.get_value()
+    stix_id = stix_ids.get(thing)
+    if stix_id is not None:
+        play["stix_id"] = stix_id
 
     return play
 
 
-def process_relns(reln_types, r_tx, import_type: ImportType):
+def process_relns(reln_types, r_tx, import_type: ImportType, stix_ids: Optional[StixIdLookup] = None):
     """
         If the current returned object is a list of relations (i.e. a list of embedded objects), then unpack them
     Args:
         reln_types (): iterable of relation types
         r_tx (): returned transaction
+        stix_ids (): the stix-id lookup of the export
 
     Returns:
         relns []: a list of reln's
     """
     relns = []
     for r in reln_types:
-        logger.debug(f'r  - >{r}, rtx -> {r_tx}')
-        reln = get_relation_details(r, r_tx, import_type)
+        logger.debug('r  - >%s, rtx -> %s', r, r_tx)
+        reln = get_relation_details(r, r_tx, import_type, stix_ids)
         relns.append(reln)
 
     return relns
 
 
-def process_relation(p, r_tx, stix_id):
+def process_relation(p, r_tx, stix_ids: StixIdLookup):
     """
         If the current returned object is a relation (i.e. embedded object) then unpack it
     Args:
         p ():  returned object
         r_tx (): returned transaction
-        stix_id (): the id of the stix object
+        stix_ids (): the stix-id lookup of the export
 
     Returns:
         plays {}: a dict containing the unpacked relation
     """
     plays = {"type": "attribute", "tql": p.get_type().get_label().name}
-    attr_stix_id = p.get_has(r_tx, attribute_type=stix_id)
-    for attr in attr_stix_id:
-        plays["stix_id"] = attr.get_value()
+    stix_id = stix_ids.get(p)
+    if stix_id is not None:
+        plays["stix_id"] = stix_id
 
     return plays
 
@@ -221,16 +399,19 @@ def process_value(p):
     return ret_value
 
 
-def get_relation_details(r, r_tx, import_type: ImportType):
+def get_relation_details(r, r_tx, import_type: ImportType, stix_ids: Optional[StixIdLookup] = None):
     """
         For a given sub-object type, unpack it
     Args:
         r (): the embedded relation object
         r_tx (): the retrned transaction
+        stix_ids (): the stix-id lookup of the export, a new one is used if not given
 
     Returns:
         reln {}: a dict containing the reln details
     """
+    if stix_ids is None:
+        stix_ids = StixIdLookup(r_tx)
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
     reln = {}
@@ -238,39 +419,39 @@ def get_relation_details(r, r_tx, import_type: ImportType):
     reln['T_name'] = reln_name
     reln['T_id'] = r.get_iid()
     if reln_name in auth["tql_types"]["embedded_relations"]:
-        reln['roles'] = get_embedded_relations(r, r_tx)
+        reln['roles'] = get_embedded_relations(r, r_tx, stix_ids)
 
     elif reln_name in auth["tql_types"]["standard_relations"] or reln_name == "sighting":
         reln['roles'] = get_standard_relations(r, r_tx)
 
     elif reln_name in auth["tql_types"]["key_value_relations"]:
-        reln['roles'] = get_key_value_relations(r, r_tx)
+        reln['roles'] = get_key_value_relations(r, r_tx, stix_ids)
 
     elif reln_name in auth["tql_types"]["extension_relations"]:
-        reln['roles'] = get_extension_relations(r, r_tx, import_type)
+        reln['roles'] = get_extension_relations(r, r_tx, import_type, stix_ids)
 
     elif reln_name in auth["tql_types"]["list_of_objects"]:
-        reln['roles'] = get_list_of_objects(r, r_tx, import_type)
+        reln['roles'] = get_list_of_objects(r, r_tx, import_type, stix_ids)
 
     elif reln_name == "granular-marking":
-        reln['roles'] = get_granular_marking(r, r_tx)
+        reln['roles'] = get_granular_marking(r, r_tx, stix_ids)
 
     elif reln_name == "hashes" or reln_name == "file-header-hashes" or reln_name == "playbook-hashes":
-        reln['roles'] = get_hashes(r, r_tx)
+        reln['roles'] = get_hashes(r, r_tx, stix_ids)
 
     else:
-        logger.error(f'Error, relation name is {reln_name}')
+        logger.error('Error, relation name is %s', reln_name)
 
     return reln
 
 
-def reln_map_entity_attribute(reln_map, r_tx, stix_id: str, is_kv):
+def reln_map_entity_attribute(reln_map, r_tx, stix_ids: StixIdLookup, is_kv):
     """
         Process a map of Player by Role types, and unpack entity and attribute
     Args:
         reln_map (): relation map of player by role types
         r_tx (): transaction
-        stix_id (): stix id
+        stix_ids (): the stix-id lookup of the export
         is_kv (): do extra stuff if coming froma key-value relationship
 
     Returns:
@@ -282,7 +463,7 @@ def reln_map_entity_attribute(reln_map, r_tx, stix_id: str, is_kv):
         for p in player:
             play = {}
             if p.is_entity():
-                role_i['player'].append(process_entity(p, r_tx, stix_id))
+                role_i['player'].append(process_entity(p, r_tx, stix_ids))
             elif p.is_attribute():
                 play["type"] = "attribute"
                 play["tql"] = p.get_type().get_label().name
@@ -293,44 +474,43 @@ def reln_map_entity_attribute(reln_map, r_tx, stix_id: str, is_kv):
                 role_i['player'].append(play)
 
             else:
-                logger.debug(f'player is not entity type {p}')
+                logger.debug('player is not entity type %s', p)
 
         roles.append(role_i)
 
     return roles
 
 
-def get_granular_marking(r, r_tx):
+def get_granular_marking(r, r_tx, stix_ids: StixIdLookup):
     """
         Process a granular marking sub object through grpc
     Args:
         r (): the typedb_lib object
         r_tx (): the transaction
+        stix_ids (): the stix-id lookup of the export
 
     Returns:
         roles []: list of dict objects
     """
-    stix_id = r_tx.concepts.get_attribute_type("stix-id").resolve()
-    reln_map = r.get_players(r_tx)
+    reln_map = stix_ids.get_players(r)
     is_kv: object = False
-    roles = reln_map_entity_attribute(reln_map, r_tx, stix_id, is_kv)
+    roles = reln_map_entity_attribute(reln_map, r_tx, stix_ids, is_kv)
     return roles
 
 
-def get_hashes(r, r_tx):
+def get_hashes(r, r_tx, stix_ids: StixIdLookup):
     """
         Process a get hashes sub object through grpc
     Args:
         r (): the typedb_lib object
         r_tx (): the transaction
+        stix_ids (): the stix-id lookup of the export
 
     Returns:
         roles []: list of dict objects
     """
     roles = []
-    stix_id = r_tx.concepts.get_attribute_type("stix-id").resolve()
-    hash_value = r_tx.concepts.get_attribute_type("hash-value").resolve()
-    reln_map = r.get_players(r_tx)
+    reln_map = stix_ids.get_players(r)
 
     for role, player in reln_map.items():
         role_name = role.get_label().name
@@ -341,48 +521,50 @@ def get_hashes(r, r_tx):
                 play["type"] = "entity"
                 play["tql"] = p.get_type().get_label().name
                 if role_name == "owner":
-                    attr_stix_id = p.get_has(r_tx, attribute_type=stix_id)
-                    for attr in attr_stix_id:
-                        play["stix_id"] = attr.get_value()
+                    stix_id = stix_ids.get(p)
+                    if stix_id is not None:
+                        play["stix_id"] = stix_id
                 else:
-                    attr_hash_value = p.get_has(r_tx, attribute_type=hash_value)
-                    for attr in attr_hash_value:
-                        play["hash_value"] = attr.get_value()
+                    for attr in stix_ids.get_has(p):
+                        if attr.get_type().get_label().name == "hash-value":
+                            play["hash_value"] = attr.get_value()
 
                 role_i['player'].append(play)
 
             else:
-                logger.debug(f'player is not entity type {p}')
+                logger.debug('player is not entity type %s', p)
 
         roles.append(role_i)
     return roles
 
 
-def get_key_value_relations(r, r_tx):
+def get_key_value_relations(r, r_tx, stix_ids: StixIdLookup):
     """
         Process a key-value sub object through grpc
     Args:
         r (): the typedb_lib object
         r_tx (): the transaction
+        stix_ids (): the stix-id lookup of the export
 
     Returns:
         roles []: list of dict objects
     """
-    stix_id = r_tx.concepts.get_attribute_type("stix-id").resolve()
-    reln_map = r.get_players(r_tx)
+    reln_map = stix_ids.get_players(r)
     is_kv: object = True
-    roles = reln_map_entity_attribute(reln_map, r_tx, stix_id, is_kv)
+    roles = reln_map_entity_attribute(reln_map, r_tx, stix_ids, is_kv)
     return roles
 
 
 def get_list_of_objects(r,
                         r_tx,
-                        import_type: ImportType):
+                        import_type: ImportType,
+                        stix_ids: StixIdLookup):
     """
         Process a list of objects sub object through grpc
     Args:
         r (): the typedb_lib object
         r_tx (): the transaction
+        stix_ids (): the stix-id lookup of the export
 
     Returns:
         roles []: list of dict objects
@@ -390,15 +572,14 @@ def get_list_of_objects(r,
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
     reln_name = r.get_type().get_label().name
-    for lot in auth["reln"]["list_of_objects"]:
-        if reln_name == lot["typeql"]:
-            reln_pointed_to = lot["pointed_to"]
-            reln_object = lot["object"]
-            reln_object_props = copy.deepcopy(auth["sub_objects"][reln_object])
-            reln_stix = lot["name"]
-
-    stix_id = r_tx.concepts.get_attribute_type("stix-id").resolve()
-    reln_map = r.get_players(r_tx)
+    lot = find_record(auth, "reln", "list_of_objects", "typeql", reln_name, last=True)
+    if lot is not None:
+        reln_pointed_to = lot["pointed_to"]
+        reln_object = lot["object"]
+        reln_object_props = copy.deepcopy(auth["sub_objects"][reln_object])
+        reln_stix = lot["name"]
+
+    reln_map = stix_ids.get_players(r)
     roles = []
     for role, player in reln_map.items():
         role_i = {'role': role.get_label().name, 'player': []}
@@ -407,10 +588,10 @@ def get_list_of_objects(r,
             if p.is_entity():
                 play["type"] = "entity"
                 play["tql"] = p.get_type().get_label().name
-                props_obj = p.get_has(r_tx)
+                props_obj = stix_ids.get_has(p)
                 play['has'] = process_props(props_obj)
                 # 3. get and describe relations
-                reln_types = p.get_relations(r_tx)
+                reln_types = stix_ids.get_relations(p)
                 relns = []
                 for rel in reln_types:
                     reln = {}
@@ -418,8 +599,8 @@ def get_list_of_objects(r,
 
                     reln['T_name'] = reln_name
                     reln['T_id'] = rel.get_iid()
-                    reln_map = rel.get_players(r_tx)
-                    reln['roles'] = reln_map_entity_relation(reln_map, r_tx, stix_id)
+                    reln_map = stix_ids.get_players(rel)
+                    reln['roles'] = reln_map_entity_relation(reln_map, r_tx, stix_ids)
                     relns.append(reln)
 
                 play['relns'] = relns
@@ -427,7 +608,7 @@ def get_list_of_objects(r,
 
 
             else:
-                logger.debug(f'player is not entity type {p}')
+                logger.debug('player is not entity type %s', p)
 
         roles.append(role_i)
     return roles
@@ -435,13 +616,13 @@ def get_list_of_objects(r,
 
 def reln_map_entity_relation(reln_map,
                              r_tx,
-                             stix_id: str):
+                             stix_ids: StixIdLookup):
     """
 
     Args:
         reln_map ():
         r_tx ():
-        stix_id ():
+        stix_ids (): the stix-id lookup of the export
 
     Returns:
 
@@ -452,12 +633,12 @@ def reln_map_entity_relation(reln_map,
             role_i = {'role': role_type.get_label().name, 'player': []}
             play = {}
             if reln.is_entity():
-                role_i['player'].append(process_entity(reln, r_tx, stix_id))
+                role_i['player'].append(process_entity(reln, r_tx, stix_ids))
             elif reln.is_relation():
-                role_i['player'].append(process_relation(reln, r_tx, stix_id))
+                role_i['player'].append(process_relation(reln, r_tx, stix_ids))
 
             else:
-                logger.debug(f'player is not entity type {reln.get_type().get_label().name}')
+                logger.debug('player is not entity type %s', reln.get_type().get_label().name)
 
 
             roles.append(role_i)
@@ -465,32 +646,32 @@ def reln_map_entity_relation(reln_map,
     return roles
 
 
-def get_embedded_relations(r, r_tx):
+def get_embedded_relations(r, r_tx, stix_ids: StixIdLookup):
     """
         Process embedded relationships (i.e. based on Stix-id)
     Args:
         r (): relation
         r_tx (): transaction
+        stix_ids (): the stix-id lookup of the export
 
     Returns:
         roles []: list of dict objects
     """
-    stix_id_attribute_type: AttributeType = r_tx.concepts.get_attribute_type("stix-id").resolve()
-
-    #stix_id = stix_id_attribute_type.get(r_tx, str)
-    reln_map = r.get_players(r_tx)
-    roles = reln_map_entity_relation(reln_map, r_tx, stix_id_attribute_type)
+    reln_map = stix_ids.get_players(r)
+    roles = reln_map_entity_relation(reln_map, r_tx, stix_ids)
     return roles
 
 
 def get_extension_relations(r,
                             r_tx,
-                            import_type: ImportType):
+                            import_type: ImportType,
+                            stix_ids: StixIdLookup):
     """
         Process a Stix extension sub object through grpc
     Args:
         r (): the typedb_lib object
         r_tx (): the transaction
+        stix_ids (): the stix-id lookup of the export
 
     Returns:
         roles []: list of dict objects
@@ -498,12 +679,11 @@ def get_extension_relations(r,
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
     reln_name = r.get_type().get_label().name
-    for ext in auth["reln"]["extension_relations"]:
-        if ext['relation'] == reln_name:
-            reln_object = ext['object']
+    ext = find_record(auth, "reln", "extension_relations", "relation", reln_name, last=True)
+    if ext is not None:
+        reln_object = ext['object']
 
-    stix_id = r_tx.concepts.get_attribute_type("stix-id").resolve()
-    reln_map = r.get_players(r_tx)
+    reln_map = stix_ids.get_players(r)
     roles = []
     for role, player in reln_map.items():
         role_i = {'role': role.get_label().name, 'player': []}
@@ -514,14 +694,14 @@ def get_extension_relations(r,
                 p_name = p.get_type().get_label().name
                 play["tql"] = p_name
                 if p_name == reln_object:
-                    props_obj = p.get_has(r_tx)
+                    props_obj = stix_ids.get_has(p)
                     play['has'] = process_props(props_obj)
                     # 3. get and describe relations
-                    reln_types = p.get_relations(r_tx)
+                    reln_types = stix_ids.get_relations(p)
                     relns = []
                     for rel in reln_types:
                         reln = {}
-                        reln = validate_get_relns(rel, r_tx, reln_object, import_type)
+                        reln = validate_get_relns(rel, r_tx, reln_object, import_type, stix_ids)
                         if reln == {} or reln is None:
                             pass
                         else:
@@ -530,9 +710,9 @@ def get_extension_relations(r,
                     play['relns'] = relns
 
                 else:
-                    attr_stix_id = p.get_has(r_tx, attribute_type=stix_id)
-                    for attr in attr_stix_id:
-                        play["stix_id"] = attr.get_value()
+                    stix_id = stix_ids.get(p)
+                    if stix_id is not None:
+                        play["stix_id"] = stix_id
 
                 role_i['player'].append(play)
             elif p.is_attribute():
@@ -542,7 +722,7 @@ def get_extension_relations(r,
                 role_i['player'].append(play)
 
             else:
-                logger.debug(f'player is not entity type {p}')
+                logger.debug('player is not entity type %s', p)
 
         roles.append(role_i)
     return roles
@@ -551,7 +731,8 @@ def get_extension_relations(r,
 def validate_get_relns(rel,
                        r_tx,
                        obj_name,
-                       import_type: ImportType):
+                       import_type: ImportType,
+                       stix_ids: Optional[StixIdLookup] = None):
     """
         When processing relations for an object, ensure we only access relations for sub objects,
         and not Stix relations or sightings
@@ -559,6 +740,7 @@ def validate_get_relns(rel,
         rel (): the relation
         r_tx (): the transaction
         obj_name (): the object involved in the relation
+        stix_ids (): the stix-id lookup of the export
 
     Returns:
         reln {}: a dict containing the reln details
@@ -568,45 +750,46 @@ def validate_get_relns(rel,
     reln={}
     reln_name = rel.get_type().get_label().name
     if reln_name in auth["tql_types"]["embedded_relations"]:
-        for emb in auth["reln"]["embedded_relations"]:
-            if emb['typeql'] == reln_name:
-                role_owner = emb['owner']
-        return return_valid_relations(rel, r_tx, obj_name, role_owner, import_type)
+        emb = find_record(auth, "reln", "embedded_relations", "typeql", reln_name, last=True)
+        if emb is not None:
+            role_owner = emb['owner']
+        return return_valid_relations(rel, r_tx, obj_name, role_owner, import_type, stix_ids)
 
     elif reln_name in auth["tql_types"]["key_value_relations"]:
-        for kvt in auth["reln"]["key_value_relations"]:
-            if kvt['typeql'] == reln_name:
-                role_owner = kvt['owner']
-        return return_valid_relations(rel, r_tx, obj_name, role_owner, import_type)
+        kvt = find_record(auth, "reln", "key_value_relations", "typeql", reln_name, last=True)
+        if kvt is not None:
+            role_owner = kvt['owner']
+        return return_valid_relations(rel, r_tx, obj_name, role_owner, import_type, stix_ids)
 
     elif reln_name in auth["tql_types"]["extension_relations"]:
-        logger.debug(f'reln name {reln_name}')
-        for kvt in auth["reln"]["extension_relations"]:
-            if kvt['relation'] == reln_name:
-                role_owner = kvt['owner']
-        return return_valid_relations(rel, r_tx, obj_name, role_owner, import_type)
+        logger.debug('reln name %s', reln_name)
+        kvt = find_record(auth, "reln", "extension_relations", "relation", reln_name, last=True)
+        if kvt is not None:
+            role_owner = kvt['owner']
+        return return_valid_relations(rel, r_tx, obj_name, role_owner, import_type, stix_ids)
 
     elif reln_name in auth["tql_types"]["list_of_objects"]:
-        for kvt in auth["reln"]["list_of_objects"]:
-            if kvt['typeql'] == reln_name:
-                role_owner = kvt['owner']
-        return return_valid_relations(rel, r_tx, obj_name, role_owner, import_type)
+        kvt = find_record(auth, "reln", "list_of_objects", "typeql", reln_name, last=True)
+        if kvt is not None:
+            role_owner = kvt['owner']
+        return return_valid_relations(rel, r_tx, obj_name, role_owner, import_type, stix_ids)
 
     elif reln_name == "granular-marking":
-        return get_relation_details(rel, r_tx, import_type)
+        return get_relation_details(rel, r_tx, import_type, stix_ids)
 
     elif reln_name == "hashes":
-        return get_relation_details(rel, r_tx, import_type)
+        return get_relation_details(rel, r_tx, import_type, stix_ids)
 
     else:
-        logger.error(f'Error, relation name is {reln_name}')
+        logger.error('Error, relation name is %s', reln_name)
 
 
 def return_valid_relations(rel,
                            r_tx,
                            obj_name,
                            role_owner,
-                           import_type: ImportType):
+                           import_type: ImportType,
+                           stix_ids: Optional[StixIdLookup] = None):
     """
         return only the valid relations to the relation check
     Args:
@@ -614,11 +797,14 @@ def return_valid_relations(rel,
         r_tx (): the transaction
         obj_name (): the object involved
         role_owner (): the owner of the role
+        stix_ids (): the stix-id lookup of the export
 
     Returns:
         reln {}: a dict containing the reln details
     """
-    reln_map = rel.get_players(r_tx)
+    if stix_ids is None:
+        stix_ids = StixIdLookup(r_tx)
+    reln_map = stix_ids.get_players(rel)
     for role, player in reln_map.items():
         role_name = role.get_label().name
         if role_name == role_owner:
@@ -626,7 +812,7 @@ def return_valid_relations(rel,
                 if p.is_entity():
                     play_name = p.get_type().get_label().name
                     if play_name == obj_name:
-                        return get_relation_details(rel, r_tx, import_type)
+                        return get_relation_details(rel, r_tx, import_type, stix_ids)
 
 
 def get_standard_relations(r, r_tx):
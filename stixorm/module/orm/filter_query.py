@@ -0,0 +1,311 @@
+import datetime
+import functools
+import pathlib
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import stix2.utils
+from stix2.datastore.filters import Filter
+
+from stixorm.module.authorise import find_record
+from stixorm.module.orm.import_utilities import val_tql
+from stixorm.module.typedb_lib.factories.auth_factory import get_auth_factory_instance
+from stixorm.module.typedb_lib.factories.definition_factory import get_definition_factory_instance
+from stixorm.module.typedb_lib.factories.import_type_factory import ImportType
+from stixorm.module.typedb_lib.model.definitions import DefinitionName
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+###################################################################################################
+#
+#    stix2 Filter to TypeQL Match
+#
+###################################################################################################
+
+# --------------------------------------------------------------------------------------------------------
+#  Overview:
+#     The filters that can be answered by the database are turned into match clauses, so that only the
+#     candidate objects are read. The match is a superset of the filter, and the caller still applies every
+#     filter to the objects it gets back, so any filter that is not pushed down is simply checked afterwards.
+# --------------------------------------------------------------------------------------------------------
+
+# the common properties that are pushed down, they are only present on an object when they were set
+PUSHDOWN_PROPERTIES = ("type", "id", "created", "modified", "labels")
+TIMESTAMP_PROPERTIES = ("created", "modified")
+EQUALITY_OPS = ("=", "in")
+RANGE_OPS = (">", ">=", "<", "<=")
+# the roles every stix-core-relationship sub type specialises for its source_ref and target_ref
+RELATIONSHIP_ROLES = {"source_ref": "source", "target_ref": "target"}
+# a type defined in a schema file, e.g. "detection-strategy sub stix-domain-object,"
+SCHEMA_TYPE = re.compile(r"^\s*([a-zA-Z_][a-zA-Z0-9_-]*)\s+sub\s", re.MULTILINE)
+
+
+@functools.lru_cache(maxsize=None)
+def get_base_attributes() -> Dict[str, str]:
+    """ get the typeql attribute of each pushed down property, from the base object definitions
+
+    Returns:
+        attributes: the property to attribute map
+    """
+    stix_model = get_definition_factory_instance().lookup_definition(DefinitionName.STIX_21)
+    attributes = {}
+    for base in ("base_sdo", "base_sro", "base_sco"):
+        for prop, attribute in stix_model.get_base(base).items():
+            if prop in PUSHDOWN_PROPERTIES and attribute != "":
+                attributes[prop] = attribute
+    return attributes
+
+
+@functools.lru_cache(maxsize=None)
+def get_schema_types() -> FrozenSet[str]:
+    """ get the type labels defined in the schema files of every definition
+
+    Returns:
+        labels: the type labels
+    """
+    definition_dir = pathlib.Path(__file__).parents[1].joinpath("definitions")
+    labels = set()
+    for schema_path in definition_dir.glob("*/schema/*.tql"):
+        labels.update(SCHEMA_TYPE.findall(schema_path.read_text(encoding="utf-8")))
+    return frozenset(labels)
+
+
+def build_filter_query(filters: Iterable[Filter], import_type: ImportType) -> str:
+    """ build the match query for the stix-ids of the objects that may pass the filters
+
+    Args:
+        filters (): the stix2 filters, all of which must pass
+        import_type (): the import type, whose definitions give the relations of the embedded references
+
+    Returns:
+        query: the TypeQL get query, its answers hold the stix-id in $id
+    """
+    auth_factory = get_auth_factory_instance()
+    auth = auth_factory.get_auth_for_import(import_type)
+    match = 'match $obj has stix-id $id;\n'
+    for i, filter_ in enumerate(filters):
+        clause = filter_to_tql(filter_, i, auth)
+        if clause is None:
+            logger.debug('filter is not pushed down: %s', filter_)
+        else:
+            match += clause
+    return match + 'get $id;'
+
+
+def build_ids_query(import_type: ImportType,
+                    stix_types: Optional[List[str]] = None,
+                    protocol: Optional[str] = None,
+                    exclude_ids: Iterable[str] = (),
+                    after: Optional[str] = None,
+                    offset: int = 0,
+                    limit: Optional[int] = None,
+                    count: bool = False) -> str:
+    """ build the query for the stix-ids of a database, optionally of some types, one page at a time
+
+    Args:
+        import_type (): the import type, whose definitions give the typeql types of a protocol
+        stix_types (): only the objects with one of these stix types, e.g. ["indicator", "malware"]
+        protocol (): only the objects of this protocol, e.g. "stix21", "attack", "os-threat"
+        exclude_ids (): stix-ids that are never returned
+        after (): only the stix-ids that sort after this one, to carry on from the end of a page
+        offset (): the number of sorted stix-ids to skip
+        limit (): the maximum number of stix-ids returned, if set the ids are sorted
+        count (): return the count aggregate instead of the ids
+
+    Returns:
+        query: the TypeQL get query, its answers hold the stix-id in $id
+    """
+    match = 'match $obj has stix-id $id;\n'
+    if stix_types:
+        match += values_to_tql('$obj has stix-type {value};\n', 'in', list(stix_types))
+    if protocol is not None:
+        match += protocol_to_tql(protocol, import_type)
+    for stix_id in exclude_ids:
+        match += ' not { $id ' + val_tql(stix_id) + '; };\n'
+    if after is not None:
+        match += ' $id > ' + val_tql(after) + ';\n'
+    if count:
+        return match + 'get $id; count;'
+    modifiers = ''
+    if limit is not None:
+        modifiers = ' sort $id;'
+        if offset > 0:
+            modifiers += ' offset ' + str(offset) + ';'
+        modifiers += ' limit ' + str(limit) + ';'
+    return match + 'get $id;' + modifiers
+
+
+def protocol_to_tql(protocol: str, import_type: ImportType) -> str:
+    """ match the objects whose typeql type belongs to a protocol
+
+    Args:
+        protocol (): the protocol, e.g. "stix21", "attack", "os-threat"
+        import_type (): the import type, whose definitions give the typeql types
+
+    Returns:
+        clause: the typeql match clause
+    """
+    auth_factory = get_auth_factory_instance()
+    auth = auth_factory.get_auth_for_import(import_type)
+    tql_types = []
+    for group in ("sdo", "sro", "sco", "meta"):
+        for record in auth["conv"][group]:
+            if record.get("protocol") != protocol:
+                continue
+            if record["typeql"] not in get_schema_types():
+                logger.warning('Skipping the %s type "%s", it is not defined in the schema', protocol, record["typeql"])
+                continue
+            tql_types.append(record["typeql"])
+    if len(tql_types) == 0:
+        raise ValueError("No object types are known for the protocol " + protocol)
+    return ' ' + ' or '.join('{$obj isa! ' + tql_type + ';}' for tql_type in dict.fromkeys(tql_types)) + ';\n'
+
+
+def filter_to_tql(filter_: Filter, i: int, auth) -> Optional[str]:
+    """ convert one filter into a match clause on $obj
+
+    Args:
+        filter_ (): the stix2 filter
+        i (): the number of the filter, to keep its variables apart
+        auth (): the authorised mappings
+
+    Returns:
+        clause: the typeql match clause, or None if the filter cannot be pushed down
+    """
+    prop, op, value = filter_.property, filter_.op, filter_.value
+    if "." in prop:
+        return sub_object_to_tql(prop, op, value, i, auth)
+    if prop in RELATIONSHIP_ROLES:
+        return reference_to_tql("$obj (" + RELATIONSHIP_ROLES[prop] + ":{ref}) isa stix-core-relationship;\n",
+                                op, value, i)
+    ex = find_record(auth, "reln", "embedded_relations", "rel", prop)
+    if ex is not None:
+        return reference_to_tql("(" + ex["owner"] + ":$obj, " + ex["pointed-to"] + ":{ref}) isa " + ex["typeql"] + ";\n",
+                                op, value, i)
+    attribute = get_base_attributes().get(prop)
+    if attribute is None:
+        return None
+    if prop == "id":
+        return values_to_tql("$id {value};\n", op, value)
+    if prop in TIMESTAMP_PROPERTIES:
+        return timestamp_to_tql(attribute, op, value, i)
+    return values_to_tql("$obj has " + attribute + " {value};\n", op, value)
+
+
+def values_to_tql(pattern: str, op: str, value) -> Optional[str]:
+    """ match one value with "=", or any one of the values with "in"
+
+    Args:
+        pattern (): the clause, with {value} in place of the typeql value
+        op (): the filter operator
+        value (): the filter value
+
+    Returns:
+        clause: the typeql match clause, or None if the operator or values cannot be pushed down
+    """
+    if op not in EQUALITY_OPS:
+        return None
+    values = [value] if op == "=" else list(value) if isinstance(value, (list, tuple)) else None
+    if not values or not all(isinstance(v, (str, int, float)) for v in values):
+        return None
+    if len(values) == 1:
+        return ' ' + pattern.format(value=val_tql(values[0]))
+    return ' ' + ' or '.join('{' + pattern.format(value=val_tql(v)).strip() + '}' for v in values) + ';\n'
+
+
+def reference_to_tql(relation: str, op: str, value, i: int) -> Optional[str]:
+    """ match a relation from $obj to the object with a given stix-id
+
+    Args:
+        relation (): the relation clause, with {ref} in place of the referenced variable
+        op (): the filter operator
+        value (): the filter value
+        i (): the number of the filter
+
+    Returns:
+        clause: the typeql match clause, or None if the filter cannot be pushed down
+    """
+    ref_var = '$ref' + str(i)
+    ids = values_to_tql(ref_var + ' has stix-id {value};\n', op, value)
+    if ids is None:
+        return None
+    return ids + ' ' + relation.format(ref=ref_var)
+
+
+def sub_object_to_tql(prop: str, op: str, value, i: int, auth) -> Optional[str]:
+    """ match a property of a list of sub objects, e.g. external_references.external_id
+
+    Args:
+        prop (): the dotted filter property
+        op (): the filter operator
+        value (): the filter value
+        i (): the number of the filter
+        auth (): the authorised mappings
+
+    Returns:
+        clause: the typeql match clause, or None if the filter cannot be pushed down
+    """
+    list_prop, sub_prop = prop.split(".", 1)
+    lot = find_record(auth, "reln", "list_of_objects", "name", list_prop)
+    if lot is None:
+        return None
+    attribute = auth["sub_objects"].get(lot["object"], {}).get(sub_prop, "")
+    if attribute == "":
+        return None
+    sub_var = '$sub' + str(i)
+    values = values_to_tql(sub_var + ' has ' + attribute + ' {value};\n', op, value)
+    if values is None:
+        return None
+    return (' ' + sub_var + ' isa ' + lot["object"] + ';\n' + values +
+            ' (' + lot["owner"] + ':$obj, ' + lot["pointed_to"] + ':' + sub_var + ') isa ' + lot["typeql"] + ';\n')
+
+
+def timestamp_to_tql(attribute: str, op: str, value, i: int) -> Optional[str]:
+    """ match a timestamp range, widened to whole milliseconds as TypeDB stores them
+
+    Args:
+        attribute (): the typeql attribute
+        op (): the filter operator
+        value (): the filter value, a datetime or a timestamp string
+        i (): the number of the filter
+
+    Returns:
+        clause: the typeql match clause, or None if the filter cannot be pushed down
+    """
+    if op not in RANGE_OPS and op != "=":
+        return None
+    try:
+        timestamp = stix2.utils.parse_into_datetime(value)
+    except (ValueError, TypeError):
+        return None
+    lower, upper = millisecond_bounds(timestamp)
+    var = '$' + attribute + str(i)
+    clause = ' $obj has ' + attribute + ' ' + var + ';\n'
+    if op in ("=", ">", ">="):
+        clause += ' ' + var + ' >= ' + lower + ';\n'
+    if op in ("=", "<", "<="):
+        clause += ' ' + var + ' <= ' + upper + ';\n'
+    return clause
+
+
+def millisecond_bounds(timestamp: datetime.datetime) -> Tuple[str, str]:
+    """ the typeql datetimes of the whole milliseconds either side of a timestamp
+
+    Args:
+        timestamp (): the timestamp, naive or timezone aware
+
+    Returns:
+        lower: the millisecond at or before the timestamp
+        upper: the millisecond at or after the timestamp
+    """
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    lower = timestamp.replace(microsecond=timestamp.microsecond - timestamp.microsecond % 1000)
+    upper = lower if lower == timestamp else lower + datetime.timedelta(milliseconds=1)
+    return tql_datetime(lower), tql_datetime(upper)
+
+
+def tql_datetime(timestamp: datetime.datetime) -> str:
+    return timestamp.strftime("%Y-%m-%dT%H:%M:%S.") + "%03d" % (timestamp.microsecond // 1000)
@@ -1,8 +1,7 @@
-import copy
 import json
 from typing import Dict
 
-from stixorm.module.authorise import default_import_type
+from stixorm.module.authorise import default_import_type, find_record
 from stixorm.module.parsing.conversion_decisions import get_embedded_match, stix_dict_to_tql
 from stixorm.module.orm.import_utilities import clean_props, split_on_activity_type, \
     add_property_to_typeql, add_relation_to_typeql, val_tql
@@ -24,6 +23,29 @@ marking =["marking-definition--613f2e26-407d-48c7-9eca-b8e91df99dc9",
 # ---------------------------------------------------
 
 
+def stix_object_to_dict(stix_object, direct: bool = False) -> dict:
+    """
+    Get the dict of a Stix2 object, json.loads(stix_object.serialize()) by default
+
+    Args:
+        stix_object (): valid Stix2 object
+        direct (): if True, read the canonical dict straight from the object without serialising it, it has the
+            same keys, as the optional properties left at their default are dropped, but its values are not JSON
+
+    Returns:
+        stix_dict: the properties of the object
+    """
+    if direct:
+        stix_dict = getattr(stix_object, "_inner", None)
+        defaulted = getattr(stix_object, "_defaulted_optional_properties", None)
+        if stix_dict is not None and defaulted is not None:
+            if not defaulted:
+                return stix_dict
+            return {key: value for key, value in stix_dict.items() if key not in defaulted}
+        logger.debug('stix2 object has no _inner dict, falling back to serialising it')
+    return json.loads(stix_object.serialize())
+
+
 def stix2_to_typeql(stix_object, import_type=default_import_type):
     """
     Initial function to convert Stix into typeql, it adds together the match and insert statements
@@ -69,7 +91,8 @@ def stix2_to_match_insert(stix_object, import_type=default_import_type):
 
 
 def raw_stix2_to_typeql(stix_object,
-                        import_type=None) -> [str, str, str, str, {}]:
+                        import_type=None,
+                        direct: bool = False) -> [str, str, str, str, {}]:
     """
     Initial function to convert Stix into typeql, it splits the incoming object into different
     channels based on its object type: sdo, sro, sco or meta
@@ -77,6 +100,7 @@ def raw_stix2_to_typeql(stix_object,
     Args:
         stix_object (): valid Stix2 object
         import_type (): string, either Stix2 or ATT&CK
+        direct (): if True, the object's dict is read from it directly rather than serialised and loaded again
 
     Returns:
         dep_match: a typeql match statement that depends on other objects
@@ -90,22 +114,22 @@ def raw_stix2_to_typeql(stix_object,
 
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
-    logger.debug(f'stix object type {stix_object["type"]}\n')
-
-    auth_types = copy.deepcopy(auth["types"])
-    if stix_object.type in auth_types["sdo"]:
-        logger.debug(f' going into sdo ---? {stix_object}')
-        dep_match, dep_insert, indep_ql, core_ql, dep_obj = sdo_to_typeql(stix_object, import_type)
-    elif stix_object.type in auth_types["sro"]:
-        logger.debug(f' going into sro ---> {stix_object}')
-        dep_match, dep_insert, indep_ql, core_ql, dep_obj = sro_to_typeql(stix_object, import_type)
-    elif stix_object.type in auth_types["sco"]:
-        logger.debug(f' going into sco ---> {stix_object}')
-        dep_match, dep_insert, indep_ql, core_ql, dep_obj = sco_to_typeql(stix_object, import_type)
+    logger.debug('stix object type %s\n', stix_object['type'])
+
+    group = auth["type_group"].get(stix_object.type)
+    if group == "sdo":
+        logger.debug(' going into sdo ---? %s', stix_object)
+        dep_match, dep_insert, indep_ql, core_ql, dep_obj = sdo_to_typeql(stix_object, import_type, direct)
+    elif group == "sro":
+        logger.debug(' going into sro ---> %s', stix_object)
+        dep_match, dep_insert, indep_ql, core_ql, dep_obj = sro_to_typeql(stix_object, import_type, direct)
+    elif group == "sco":
+        logger.debug(' going into sco ---> %s', stix_object)
+        dep_match, dep_insert, indep_ql, core_ql, dep_obj = sco_to_typeql(stix_object, import_type, direct)
     elif stix_object.type == 'marking-definition':
-        dep_match, dep_insert, indep_ql, core_ql, dep_obj = marking_definition_to_typeql(stix_object, import_type)
+        dep_match, dep_insert, indep_ql, core_ql, dep_obj = marking_definition_to_typeql(stix_object, import_type, direct)
     else:
-        logger.error(f'object type not supported: {stix_object.type}, import type {import_type}')
+        logger.error('object type not supported: %s, import type %s', stix_object.type, import_type)
         dep_match, dep_insert, indep_ql, core_ql, dep_obj = '', '', '', '', ''
         dep_list = []
 
@@ -116,12 +140,13 @@ def raw_stix2_to_typeql(stix_object,
 # 1.1) SDO Object Method to convert a Python object --> typeql string
 #                 -   
 # -------------------------------------------------------------
-def sdo_to_data(sdo, import_type=default_import_type) -> [dict, Dict[str, str], str]:
+def sdo_to_data(sdo, import_type=default_import_type, direct: bool = False) -> [dict, Dict[str, str], str]:
     """ convert Stix object into a data model for processing
 
     Args:
         sdo (): the Stix2 SDO object
         import_type (): the type of import to use
+        direct (): if True, the object's dict is read from it directly rather than serialised
 
     Returns:
         total_props, : a list of all properties
@@ -132,20 +157,21 @@ def sdo_to_data(sdo, import_type=default_import_type) -> [dict, Dict[str, str],
     total_props = sdo._inner
     total_props = clean_props(total_props)
     # 1.B) get the specific typeql names for an object into a dictionary
-    sdo_dict = json.loads(sdo.serialize())
+    sdo_dict = stix_object_to_dict(sdo, direct)
     obj_tql, sdo_tql_name, is_list, protocol = stix_dict_to_tql(sdo_dict)
-    logger.debug(f'\nobject tql {obj_tql}, \nsdo tql name {sdo_tql_name},\n is_list {is_list}')
+    logger.debug('\nobject tql %s, \nsdo tql name %s,\n is_list %s', obj_tql, sdo_tql_name, is_list)
 
     return total_props, obj_tql, sdo_tql_name, protocol
 
 
-def sdo_to_typeql(sdo, import_type=default_import_type) -> [str, str, str, str, dict]:
+def sdo_to_typeql(sdo, import_type=default_import_type, direct: bool = False) -> [str, str, str, str, dict]:
     """
     Initial function to convert Stix2 SDO object into typeql
 
     Args:
         sdo (): valid Stix2 object
         import_type (): string, either Stix2 or ATT&CK
+        direct (): if True, the object's dict is read from it directly rather than serialised
 
     Returns:
         dep_match: a typeql match statement that depends on other objects
@@ -158,9 +184,9 @@ def sdo_to_typeql(sdo, import_type=default_import_type) -> [str, str, str, str,
     # - variable for use in typeql statements
     dep_list = []
     # 1.B) get the data model
-    total_props, obj_tql, sdo_tql_name, protocol = sdo_to_data(sdo, import_type)
+    total_props, obj_tql, sdo_tql_name, protocol = sdo_to_data(sdo, import_type, direct)
     logger.debug("\n Step 0 I've just gotten through getting data")
-    logger.debug(f'\n\n total_props {total_props}\n\nobj_tql {obj_tql}\n\nsdo_tql_name {sdo_tql_name}')
+    logger.debug('\n\n total_props %s\n\nobj_tql %s\n\nsdo_tql_name %s', total_props, obj_tql, sdo_tql_name)
     sdo_var = '$' + sdo_tql_name
     if obj_tql == '':
         return '', '', '', '', {}
@@ -203,12 +229,13 @@ def sdo_to_typeql(sdo, import_type=default_import_type) -> [str, str, str, str,
 # 1.2) SRO Object Method to convert a Python object --> typeql string
 #                 -   
 # -----------------------------------------------------
-def sro_to_data(sro, import_type=default_import_type) -> [dict, Dict[str, str], str]:
+def sro_to_data(sro, import_type=default_import_type, direct: bool = False) -> [dict, Dict[str, str], str]:
     """ convert Stix object into a data model for processing
 
         Args:
             sro (): the Stix2 sco object
             import_type (): the type of import to use
+            direct (): if True, the object's dict is read from it directly rather than serialised
 
         Returns:
             total_props, : a list of all properties
@@ -219,9 +246,9 @@ def sro_to_data(sro, import_type=default_import_type) -> [dict, Dict[str, str],
     total_props = sro._inner
     total_props = clean_props(total_props)
 
-    logger.debug(f'into sro -> {sro}')
+    logger.debug('into sro -> %s', sro)
     # - work out the type of object
-    sro_dict = json.loads(sro.serialize())
+    sro_dict = stix_object_to_dict(sro, direct)
     obj_tql, sro_tql_name, is_list, protocol = stix_dict_to_tql(sro_dict)
     # If sro tql name == "relationship", then sro tql name = sro_dict["relationship_type"]
     if sro_tql_name == "relationship":
@@ -232,18 +259,19 @@ def sro_to_data(sro, import_type=default_import_type) -> [dict, Dict[str, str],
         target_type = sro_dict["target_ref"].split('--')[0]
         if target_type == "attack-pattern" and (source_type == "intrusion-set" or source_type == "malware" or source_type == "tool"):
             sro_tql_name = "procedure"
-    logger.debug(f'object tql {obj_tql}, sro tql name {sro_tql_name}')
+    logger.debug('object tql %s, sro tql name %s', obj_tql, sro_tql_name)
 
     return total_props, obj_tql, sro_tql_name, protocol
 
 
-def sro_to_typeql(sro, import_type=default_import_type) -> [str, str, str, str, dict]:
+def sro_to_typeql(sro, import_type=default_import_type, direct: bool = False) -> [str, str, str, str, dict]:
     """
     Initial function to convert Stix2 SRO object into typeql
 
     Args:
         sro (): valid Stix2 object
         import_type (): string, either Stix2 or ATT&CK
+        direct (): if True, the object's dict is read from it directly rather than serialised
 
     Returns:
         dep_match: a typeql match statement that depends on other objects
@@ -259,7 +287,7 @@ def sro_to_typeql(sro, import_type=default_import_type) -> [str, str, str, str,
     dep_list = []
     # - work out the type of object
     obj_type = sro.type
-    total_props, obj_tql, sro_tql_name, protocol = sro_to_data(sro, import_type)
+    total_props, obj_tql, sro_tql_name, protocol = sro_to_data(sro, import_type, direct)
     sro_var = '$' + sro_tql_name
     if obj_tql == '':
         return '', '', '', '', {}
@@ -277,17 +305,16 @@ def sro_to_typeql(sro, import_type=default_import_type) -> [str, str, str, str,
         target_var, target_match = get_embedded_match(target_id, import_type, 1, protocol)
         dep_match += source_match + target_match
         # 3.)  then setup the typeql statement to insert the specific sro relation, from the dict, with the matches
-        for record in auth["reln"]["standard_relations"]:
-            if record['stix'] == sro_tql_name:
-                dep_insert += '\n' + sro_var
-                dep_insert += ' (' + record['source'] + ':' + source_var
-                dep_insert += ', ' + record['target'] + ':' + target_var + ')'
-                dep_insert += ' isa ' + record['typeql']
-                core_ql = sro_var + ' isa ' + sro_tql_name
-                core_ql += ', has stix-id $stix-id;\n$stix-id ' + val_tql(sro.id) + ';\n'
-                break
-                # B. If it is a Sighting then match the object to the sighting
-        logger.debug(f'dep_insert -> {dep_insert}')
+        record = find_record(auth, "reln", "standard_relations", "stix", sro_tql_name)
+        if record is not None:
+            dep_insert += '\n' + sro_var
+            dep_insert += ' (' + record['source'] + ':' + source_var
+            dep_insert += ', ' + record['target'] + ':' + target_var + ')'
+            dep_insert += ' isa ' + record['typeql']
+            core_ql = sro_var + ' isa ' + sro_tql_name
+            core_ql += ', has stix-id $stix-id;\n$stix-id ' + val_tql(sro.id) + ';\n'
+            # B. If it is a Sighting then match the object to the sighting
+        logger.debug('dep_insert -> %s', dep_insert)
     elif obj_type == 'sighting':
         sighting_of_id = sro.sighting_of_ref
         dep_list.append(sighting_of_id)
@@ -316,7 +343,7 @@ def sro_to_typeql(sro, import_type=default_import_type) -> [str, str, str, str,
         core_ql = sro_var + ' ($role:$any) isa sighting'
         core_ql += ', has stix-id $stix-id;\n$stix-id ' + val_tql(sro.id) + ';\n'
     else:
-        logger.error(f'relationship type {obj_type} not supported')
+        logger.error('relationship type %s not supported', obj_type)
         return ''
 
     # 4.) next, split total properties into actual properties and nested structures (Relations)
@@ -356,12 +383,13 @@ def sro_to_typeql(sro, import_type=default_import_type) -> [str, str, str, str,
 # 1.3) SCO Object Method to convert a Python object --> typeql string
 #                 -
 # --------------------------------------------------
-def sco_to_data(sco, import_type=default_import_type) -> [dict, dict, str]:
+def sco_to_data(sco, import_type=default_import_type, direct: bool = False) -> [dict, dict, str]:
     """ convert Stix object into a data model for processing
 
         Args:
             sco (): the Stix2 sco object
             import_type (): the type of import to use
+            direct (): if True, the object's dict is read from it directly rather than serialised
 
         Returns:
             total_props, : a list of all properties
@@ -373,19 +401,20 @@ def sco_to_data(sco, import_type=default_import_type) -> [dict, dict, str]:
     total_props = clean_props(total_props)
     # logger.debug(properties)
     # - get the object-specific typeql names, sighting or relationship
-    sco_dict = json.loads(sco.serialize())
+    sco_dict = stix_object_to_dict(sco, direct)
     obj_tql, sco_tql_name, is_list, protocol = stix_dict_to_tql(sco_dict)
 
     return total_props, obj_tql, sco_tql_name, protocol
 
 
-def sco_to_typeql(sco, import_type=default_import_type):
+def sco_to_typeql(sco, import_type=default_import_type, direct: bool = False):
     """
     Initial function to convert Stix2 SCO object into typeql
 
     Args:
         sco (): valid Stix2 object
         import_type (): string, either Stix2 or ATT&CK
+        direct (): if True, the object's dict is read from it directly rather than serialised
 
     Returns:
         dep_match: a typeql match statement that depends on other objects
@@ -400,7 +429,7 @@ def sco_to_typeql(sco, import_type=default_import_type):
     dep_match = dep_insert = indep_ql = core_ql = dep_insert_props = ''
 
     # 1.C) Split them into properties and relations
-    total_props, obj_tql, sco_tql_name, protocol = sco_to_data(sco, import_type)
+    total_props, obj_tql, sco_tql_name, protocol = sco_to_data(sco, import_type, direct)
     properties, relations = split_on_activity_type(total_props, obj_tql)
 
     # - variable for use in typeql statements
@@ -440,13 +469,14 @@ def sco_to_typeql(sco, import_type=default_import_type):
 # --------------------------------------------------
 
 
-def marking_definition_to_typeql(meta, import_type=default_import_type):
+def marking_definition_to_typeql(meta, import_type=default_import_type, direct: bool = False):
     """
     Initial function to convert Stix2 marking object into typeql
 
     Args:
         meta (): valid Stix2 object
         import_type (): string, either Stix2 or ATT&CK
+        direct (): if True, the object's dict is read from it directly rather than serialised
 
     Returns:
         dep_match: a typeql match statement that depends on other objects
@@ -464,7 +494,7 @@ def marking_definition_to_typeql(meta, import_type=default_import_type):
     if meta.id in marking:
         return dep_match, dep_insert, indep_ql, core_ql, {}
     # 1.B) Test for attack object and handle statement if a statement marking
-    meta_dict = json.loads(meta.serialize())
+    meta_dict = stix_object_to_dict(meta, direct)
     obj_tql, meta_tql_name, is_list, protocol = stix_dict_to_tql(meta_dict)
 
     properties, relations = split_on_activity_type(total_props, obj_tql)
@@ -4,7 +4,8 @@ import copy
 
 import logging
 
-from stixorm.module.parsing.conversion_decisions import get_tqlname_from_content_by_ID
+from stixorm.module.parsing.conversion_decisions import get_tqlname_from_content_by_ID, ConversionPlan
+from stixorm.module.authorise import find_record
 from stixorm.module.typedb_lib.factories.auth_factory import get_auth_factory_instance
 from stixorm.module.typedb_lib.factories.definition_factory import get_definition_factory_instance
 from stixorm.module.typedb_lib.factories.import_type_factory import ImportType
@@ -112,12 +113,12 @@ def add_relation_to_typeql(rel,
         match: the typeql match strings
         insert: the typeql insert string
     """
-    logger.debug(f'===============\n=====================\n===================\n')
-    logger.debug(f'rel {rel}')
-    logger.debug(f'obj[rel] {obj[rel]}')
-    logger.debug(f'obj {obj}')
-    logger.debug(f'obj_Var {obj_var}')
-    logger.debug(f'\nprop var list {prop_var_list}')
+    logger.debug('===============\n=====================\n===================\n')
+    logger.debug('rel %s', rel)
+    logger.debug('obj[rel] %s', obj[rel])
+    logger.debug('obj %s', obj)
+    logger.debug('obj_Var %s', obj_var)
+    logger.debug('\nprop var list %s', prop_var_list)
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
     dep_list = []
@@ -164,7 +165,7 @@ def add_relation_to_typeql(rel,
         match = insert = ''
 
     else:
-        logger.debug(f'relation type not known, ignore if "source_ref" or "target_ref" -> {rel}')
+        logger.debug('relation type not known, ignore if "source_ref" or "target_ref" -> %s', rel)
         logger.debug("in else")
         match = insert = ""
 
@@ -202,13 +203,12 @@ def extensions(prop_name: str,
     # for each key in the dict (extension type)
     # logger.debug('--------------------- extensions ----------------------------')
     for num, ext_type in enumerate(prop_dict):
-        for ext_type_ql in auth["reln"]["extension_relations"]:
-            if ext_type == ext_type_ql["stix"]:
-                match2, insert2, dep_list2 = load_object(ext_type, prop_dict[ext_type], parent_var, num, import_type, protocol)
-                match = match + match2
-                insert = insert + insert2
-                dep_list = dep_list + dep_list2
-                break
+        ext_type_ql = find_record(auth, "reln", "extension_relations", "stix", ext_type)
+        if ext_type_ql is not None:
+            match2, insert2, dep_list2 = load_object(ext_type, prop_dict[ext_type], parent_var, num, import_type, protocol)
+            match = match + match2
+            insert = insert + insert2
+            dep_list = dep_list + dep_list2
 
     return match, insert, dep_list
 
@@ -236,50 +236,49 @@ def load_object(prop_name: str,
     match = insert = type_ql = type_ql_props = ''
     # as long as it is predefined, history the object
     # logger.debug('------------------- history object ------------------------------')
-    for prop_type in auth["reln"]["extension_relations"]:
-        if prop_name == prop_type["stix"]:
-            #tot_prop_list = [tot for tot in prop_dict.keys()]
-            obj_type = prop_type["object"]
-            obj_tql = copy.deepcopy(auth["sub_objects"][obj_type])
-            obj_var = '$' + obj_type
-            reln = prop_type["relation"]
-            rel_var = '$' + reln + str(inc)
-            rel_owner = prop_type["owner"]
-            rel_pointed_to = prop_type["pointed-to"]
-            type_ql += ' ' + obj_var + ' isa ' + obj_type
-            # Split them into properties and relations
-            total_props = prop_dict._inner
-            logger.debug(f'load object properties: {total_props}')
-            properties, relations = split_on_activity_type(total_props, obj_tql)
-            prop_var_list = []
-            dep_list = []
-            logger.debug(f'load object relations: {relations}')
-            for prop in properties:
-                # split off for properties processing
-                type_ql2, type_ql_props2, prop_var_list = add_property_to_typeql(prop, obj_tql, prop_dict,
-                                                                                 prop_var_list)
-                # then add them all together
-                type_ql += type_ql2
-                type_ql_props += type_ql_props2
-                # add a terminator on the end of the insert statement
-            type_ql += ";\n" + type_ql_props + "\n\n"
-
-            # add each of the relations to the match and insert statements
-            logger.debug(f'load object relations: {relations}')
-            for rel in relations:
-                # split off for relation processing
-                logger.debug(f'load object relation: {rel}, protocol: {protocol}')
-                match2, insert2, dep_list2 = add_relation_to_typeql(rel, prop_dict, obj_var, prop_var_list, import_type, inc, protocol)
-                # then add it back together    
-                match = match + match2
-                insert = insert + "\n" + insert2
-                dep_list = dep_list + dep_list2
-
-            # finally, connect the local object to the parent object
-            type_ql += ' ' + rel_var + ' (' + rel_owner + ':' + parent_var
-            type_ql += ', ' + rel_pointed_to + ':' + obj_var + ')'
-            type_ql += ' isa ' + reln + ';\n'
-            break
+    prop_type = find_record(auth, "reln", "extension_relations", "stix", prop_name)
+    if prop_type is not None:
+        #tot_prop_list = [tot for tot in prop_dict.keys()]
+        obj_type = prop_type["object"]
+        obj_tql = copy.deepcopy(auth["sub_objects"][obj_type])
+        obj_var = '$' + obj_type
+        reln = prop_type["relation"]
+        rel_var = '$' + reln + str(inc)
+        rel_owner = prop_type["owner"]
+        rel_pointed_to = prop_type["pointed-to"]
+        type_ql += ' ' + obj_var + ' isa ' + obj_type
+        # Split them into properties and relations
+        total_props = prop_dict._inner
+        logger.debug('load object properties: %s', total_props)
+        properties, relations = split_on_activity_type(total_props, obj_tql)
+        prop_var_list = []
+        dep_list = []
+        logger.debug('load object relations: %s', relations)
+        for prop in properties:
+            # split off for properties processing
+            type_ql2, type_ql_props2, prop_var_list = add_property_to_typeql(prop, obj_tql, prop_dict,
+                                                                             prop_var_list)
+            # then add them all together
+            type_ql += type_ql2
+            type_ql_props += type_ql_props2
+            # add a terminator on the end of the insert statement
+        type_ql += ";\n" + type_ql_props + "\n\n"
+
+        # add each of the relations to the match and insert statements
+        logger.debug('load object relations: %s', relations)
+        for rel in relations:
+            # split off for relation processing
+            logger.debug('load object relation: %s, protocol: %s', rel, protocol)
+            match2, insert2, dep_list2 = add_relation_to_typeql(rel, prop_dict, obj_var, prop_var_list, import_type, inc, protocol)
+            # then add it back together    
+            match = match + match2
+            insert = insert + "\n" + insert2
+            dep_list = dep_list + dep_list2
+
+        # finally, connect the local object to the parent object
+        type_ql += ' ' + rel_var + ' (' + rel_owner + ':' + parent_var
+        type_ql += ', ' + rel_pointed_to + ':' + obj_var + ')'
+        type_ql += ' isa ' + reln + ';\n'
 
     insert = type_ql + "\n" + insert
     return match, insert, dep_list
@@ -305,13 +304,12 @@ def list_of_object(prop_name: str,
     """
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
-    for config in auth["reln"]["list_of_objects"]:
-        if config["name"] == prop_name:
-            rel_typeql = config["typeql"]
-            role_owner = config["owner"]
-            role_pointed = config["pointed_to"]
-            typeql_obj = config["object"]
-            break
+    config = find_record(auth, "reln", "list_of_objects", "name", prop_name)
+    if config is not None:
+        rel_typeql = config["typeql"]
+        role_owner = config["owner"]
+        role_pointed = config["pointed_to"]
+        typeql_obj = config["object"]
 
     if typeql_obj in auth["sub_objects"]:
         obj_props_tql = copy.deepcopy(auth["sub_objects"][typeql_obj])
@@ -367,14 +365,13 @@ def key_value_store(prop,
     """
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
-    for config in auth["reln"]["key_value_relations"]:
-        if config["name"] == prop:
-            rel_typeql = config["typeql"]
-            role_owner = config["owner"]
-            role_pointed = config["pointed_to"]
-            d_key = config["key"]
-            d_value = config["value"]
-            break
+    config = find_record(auth, "reln", "key_value_relations", "name", prop)
+    if config is not None:
+        rel_typeql = config["typeql"]
+        role_owner = config["owner"]
+        role_pointed = config["pointed_to"]
+        d_key = config["key"]
+        d_value = config["value"]
 
     match = ''
     insert = '\n'
@@ -421,7 +418,7 @@ def hashes(prop_name, prop_dict, parent_var):
             insert += ' ' + hash_var + ' isa ' + stix_models.get_sub_objects("hash_typeql_dict")[
                 key] + ', has hash-value ' + val_tql(prop_dict[key]) + ';\n'
         else:
-            logger.error(f'Unknown hash type {key}')
+            logger.error('Unknown hash type %s', key)
 
     # insert the hash objects into the hashes relation with the parent object
     insert += '\n $hash_rel (hash-owner:' + parent_var
@@ -522,12 +519,11 @@ def embedded_relation(prop,
     logger.debug("I'm in embedded")
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(import_type)
-    for ex in auth["reln"]["embedded_relations"]:
-        if ex["rel"] == prop:
-            owner = ex["owner"]
-            pointed_to = ex["pointed-to"]
-            relation = ex["typeql"]
-            break
+    ex = find_record(auth, "reln", "embedded_relations", "rel", prop)
+    if ex is not None:
+        owner = ex["owner"]
+        pointed_to = ex["pointed-to"]
+        relation = ex["typeql"]
 
     prop_var_list = []
     dep_list = []
@@ -537,10 +533,10 @@ def embedded_relation(prop,
     else:
         inc_add = str(inc)
     # if the prop_value is a list, then match in each item
-    logger.debug(f'\n1\n')
+    logger.debug('\n1\n')
     if isinstance(prop_value, list):
         dep_list = prop_value
-        logger.debug(f'deplist {dep_list}')
+        logger.debug('deplist %s', dep_list)
         for i, prop_v in enumerate(prop_value):
             prop_type = get_tqlname_from_content_by_ID(prop_v, protocol)
             if prop_type == 'relationship':
@@ -553,7 +549,7 @@ def embedded_relation(prop,
     else:
         dep_list.append(prop_value)
         prop_type = get_tqlname_from_content_by_ID(prop_value, protocol)
-        logger.debug(f'deplist {dep_list}')
+        logger.debug('deplist %s', dep_list)
         if prop_type == 'relationship':
             prop_type = 'stix-core-relationship'
         if prop_type == 'attack-identity':
@@ -564,7 +560,7 @@ def embedded_relation(prop,
         match += ' ' + prop_var + ' isa ' + prop_type + ', has stix-id ' + '"' + prop_value + '";\n'
 
     # Then setup and insert the relation
-    logger.debug(f'\n2\n')
+    logger.debug('\n2\n')
     insert = '\n $' + relation + inc_add + ' (' + owner + ':' + obj_var
     for prop_var in prop_var_list:
         insert += ', ' + pointed_to + ':' + prop_var
@@ -605,7 +601,7 @@ def val_tql(val):
         actual = dt_split[0] + "." + str(millisecs)
         return actual
     else:
-        return logger.error(f'value  not supported: {val}')
+        return logger.error('value  not supported: %s', val)
 
 
 def split_on_activity_type(total_props: dict, obj_tql: Dict[str, str]) -> [List[str], List[str]]:
@@ -613,7 +609,7 @@ def split_on_activity_type(total_props: dict, obj_tql: Dict[str, str]) -> [List[
         Split the Stix object properties into flat properties and sub objects
     Args:
         total_props (): the total properties for this object
-        obj_tql (): the mapping dict for this object
+        obj_tql (): the mapping dict for this object, or the ConversionPlan of its type
 
     Returns:
         prop_list, a list of the flat properties
@@ -623,19 +619,30 @@ def split_on_activity_type(total_props: dict, obj_tql: Dict[str, str]) -> [List[
     rel_list = []
     logger.debug("@@@@@@@@@@@@@@@@@@@@@@ splitting @@@@@@@@@@@@@@@")
     logger.debug("========================================")
-    logger.debug(f'total props: {total_props}')
+    logger.debug('total props: %s', total_props)
     # for k, v in total_props.items():
     #     logger.debug(k, v)
     # logger.debug("=========================================")
     logger.debug("========================================")
-    logger.debug(f'obj tql: {obj_tql}')
+    logger.debug('obj tql: %s', obj_tql)
     # for k, v in obj_tql.items():
     #     logger.debug(k, v)
     # logger.debug("=========================================")
     logger.debug("@@@@@@@@@@@@@@@@@@@@@@ end splitting @@@@@@@@@@@@@@@")
+    if isinstance(obj_tql, ConversionPlan):
+        # the plan has already split its properties from its relations
+        for prop in total_props:
+            if prop in obj_tql.relations:
+                rel_list.append(prop)
+            elif prop in obj_tql.properties:
+                prop_list.append(prop)
+            else:
+                raise KeyError(prop)
+        return prop_list, rel_list
+
     for prop in total_props:
         tql_prop_name = obj_tql[prop]
-        logger.debug(f'prop {prop}, object tql -> {tql_prop_name}')
+        logger.debug('prop %s, object tql -> %s', prop, tql_prop_name)
 
         if tql_prop_name == "":
             rel_list.append(prop)
@@ -1,8 +1,8 @@
 
 from pydantic import BaseModel
-from typing import List, Dict, Union, Optional
+from typing import Callable, List, Dict, Union, Optional, Tuple
+import functools
 import logging
-import copy
 import json
 import os
 
@@ -45,21 +45,72 @@ def read_class_registry() -> List[Dict]:
         
         with open(file_path, 'r', encoding='utf-8') as file:
             data = json.load(file)
-            logger.debug(f"Successfully loaded {len(data)} entries from class_registry.json")
+            logger.debug("Successfully loaded %s entries from class_registry.json", len(data))
             return data
     except FileNotFoundError:
-        logger.error(f"class_registry.json file not found in {current_dir}")
+        logger.error("class_registry.json file not found in %s", current_dir)
         return []
     except json.JSONDecodeError as e:
-        logger.error(f"Error parsing JSON from class_registry.json: {e}")
+        logger.error("Error parsing JSON from class_registry.json: %s", e)
         return []
     except Exception as e:
-        logger.error(f"Error reading class_registry.json file: {e}")
+        logger.error("Error reading class_registry.json file: %s", e)
         return []
 
 
 
 
+@functools.lru_cache(maxsize=None)
+def get_class_registry_instance():
+    return ClassRegistry(read_class_registry())
+
+
+class ClassRegistry:
+    """
+    The class registry loaded once per process, indexed by stix_type, with the conditions of every
+    specialisation compiled ahead of time.
+    """
+
+    def __init__(self, registry_data: List[Dict]):
+        self.by_type: Dict[str, Tuple[ParseContent, ...]] = {}
+        self.defaults: Dict[str, Tuple[ParseContent, ...]] = {}
+        self.specialisations: Dict[str, Tuple[Tuple[ParseContent, Callable[[Dict], bool]], ...]] = {}
+        self.field_paths: Dict[str, Tuple[str, ...]] = {}
+        self.condition_tests: Dict[int, Callable[[Dict], bool]] = {}
+
+        content_by_type: Dict[str, List[ParseContent]] = {}
+        for item in registry_data:
+            try:
+                content = ParseContent(**item)
+            except Exception as e:
+                logger.error("Error creating ParseContent from item %s: %s", item, e)
+                continue
+            content_by_type.setdefault(content.stix_type, []).append(content)
+            for field in (content.field1, content.field2):
+                if field:
+                    self.field_paths[field] = tuple(field.split("."))
+
+        for stix_type, content_list in content_by_type.items():
+            self.by_type[stix_type] = tuple(content_list)
+            self.defaults[stix_type] = tuple(item for item in content_list if item.condition1 == "")
+            specialisations = []
+            for item in content_list:
+                if item.condition1 != "":
+                    condition_test = compile_condition(item, self.field_paths)
+                    self.condition_tests[id(item)] = condition_test
+                    specialisations.append((item, condition_test))
+            self.specialisations[stix_type] = tuple(specialisations)
+
+    def get_content_for_type(self, stix_type: str) -> Tuple[ParseContent, ...]:
+        return self.by_type.get(stix_type, ())
+
+    def get_condition_test(self, item: ParseContent) -> Callable[[Dict], bool]:
+        condition_test = self.condition_tests.get(id(item))
+        if condition_test is None:
+            condition_test = compile_condition(item, self.field_paths)
+        return condition_test
+
+
 ###################################################################################
 #
 # Base - Get Content Record from List Based on Dict Loop
@@ -78,30 +129,17 @@ def get_content_list_for_type(type: str, content_type: str) -> List[ParseContent
         List[ParseContent]: List of ParseContent models matching the type, or empty list if none found.
     """
     if content_type != "class":
-        logger.warning(f"Content type '{content_type}' is not supported. Only 'class' is currently supported.")
+        logger.warning("Content type '%s' is not supported. Only 'class' is currently supported.", content_type)
         return []
     
     try:
-        # Read the class registry data
-        registry_data = read_class_registry()
-        
-        # Filter by the specified type and convert to ParseContent models
-        filtered_data = [item for item in registry_data if item.get("stix_type") == type]
-        
-        # Convert dictionaries to ParseContent models
-        parse_content_list = []
-        for item in filtered_data:
-            try:
-                parse_content_list.append(ParseContent(**item))
-            except Exception as e:
-                logger.error(f"Error creating ParseContent from item {item}: {e}")
-                continue
-        
-        logger.debug(f"Found {len(parse_content_list)} ParseContent entries for type '{type}'")
+        # Look up the type in the process-wide registry
+        parse_content_list = list(get_class_registry_instance().get_content_for_type(type))
+        logger.debug("Found %s ParseContent entries for type '%s'", len(parse_content_list), type)
         return parse_content_list
         
     except Exception as e:
-        logger.error(f"Error getting content list for type '{type}': {e}")
+        logger.error("Error getting content list for type '%s': %s", type, e)
         return []
 
 def process_exists_condition(stix_dict, field_list):
@@ -115,23 +153,12 @@ def process_exists_condition(stix_dict, field_list):
     Returns:
         bool: True if all fields exist in the STIX dictionary, False otherwise.
     """
-    local_dict = copy.deepcopy(stix_dict)
-    correct = False
-    length = len(field_list)
-    for i, field in enumerate(field_list):
-        if length == i+1:
-            if field in local_dict:
-                correct = True
-                return correct
-            else:
-                correct = False
-                return correct
-        else:
-            if field in local_dict:
-                local_dict = local_dict[field]
-            else:
-                correct = False
-                return correct
+    local_dict = stix_dict
+    for field in field_list[:-1]:
+        if field not in local_dict:
+            return False
+        local_dict = local_dict[field]
+    return field_list[-1] in local_dict
 
 def process_starts_with_condition(stix_dict, value):
     """
@@ -139,21 +166,17 @@ def process_starts_with_condition(stix_dict, value):
 
     Args:
         stix_dict (Dict[str, str]): The STIX dictionary to check against.
-        field_list (List[str]): The list of fields to check for existence.
         value (str): The value to check for.
 
     Returns:
         bool: True if it is not an attack object, and any field starts with the given value, False otherwise.
     """
-    correct = False
-    local_dict = copy.deepcopy(stix_dict)
-    if "x_mitre_attack_spec_version" in local_dict:
-        return correct
-    for field_name, field_value in local_dict.items():
+    if "x_mitre_attack_spec_version" in stix_dict:
+        return False
+    for field_name in stix_dict:
         if isinstance(field_name, str) and field_name.startswith(value):
-            correct = True
-            return correct
-    return correct
+            return True
+    return False
 
 def process_equals_condition(stix_dict, field_list, value):
     """
@@ -161,25 +184,54 @@ def process_equals_condition(stix_dict, field_list, value):
 
     Args:
         stix_dict (Dict[str, str]): The STIX dictionary to check against.
-        field (str): The field to check for equality.
+        field_list (List[str]): The list of fields leading to the field to check.
         value (str): The value to check against.
 
     Returns:
         bool: True if the field exists and it equals the value, False otherwise.
     """
-    local_dict = copy.deepcopy(stix_dict)
-    correct = False
-    length = len(field_list)
-    for i, field in enumerate(field_list):
-        if length == i+1:
-            if field in local_dict:
-                if local_dict[field] == value:
-                    correct = True
-                    return correct
-        else:
-            if field in local_dict:
-                local_dict = local_dict[field]
-    return correct
+    local_dict = stix_dict
+    for field in field_list[:-1]:
+        if field in local_dict:
+            local_dict = local_dict[field]
+    last_field = field_list[-1]
+    return last_field in local_dict and local_dict[last_field] == value
+
+def compile_condition(item: ParseContent, field_paths: Optional[Dict[str, Tuple[str, ...]]] = None) -> Callable[[Dict], bool]:
+    """
+    Compile the ParseContent conditions into a single test that reads the STIX dictionary without copying it.
+
+    Args:
+        item (ParseContent): The ParseContent conditions to compile.
+        field_paths (Dict[str, Tuple[str, ...]]): Already split dotted field paths, keyed by field.
+
+    Returns:
+        Callable[[Dict], bool]: The test, returning True if the dict matches the conditions.
+    """
+    field_paths = field_paths or {}
+
+    def field_path(field):
+        return field_paths.get(field) or tuple(field.split("."))
+
+    if item.condition1 == "EXISTS":
+        path1 = field_path(item.field1)
+        first = lambda stix_dict: process_exists_condition(stix_dict, path1)
+    elif item.condition1 == "STARTS_WITH":
+        value1 = item.value1
+        first = lambda stix_dict: process_starts_with_condition(stix_dict, value1)
+    elif item.condition1 == "EQUALS":
+        path1 = field_path(item.field1)
+        value1 = item.value1
+        first = lambda stix_dict: process_equals_condition(stix_dict, path1, value1)
+    else:
+        return lambda stix_dict: False
+
+    # Only an EQUALS second condition is tested, any other second condition is ignored
+    if item.condition2 == "EQUALS":
+        path2 = field_path(item.field2)
+        value2 = item.value2
+        return lambda stix_dict: first(stix_dict) and process_equals_condition(stix_dict, path2, value2)
+    return first
 
 def test_object_by_condition(item: ParseContent, stix_dict: Dict[str, str]) -> bool:
     """
@@ -192,22 +244,7 @@ def test_object_by_condition(item: ParseContent, stix_dict: Dict[str, str]) -> b
     Returns:
         bool: True if the dict matches the conditions, False otherwise.
     """
-    correct = False
-    # Check each condition in the STIX dictionary
-    if item.condition1 == "EXISTS":
-        field_list = item.field1.split(".")
-        correct = process_exists_condition(stix_dict, field_list)
-    elif item.condition1 == "STARTS_WITH":
-        correct = process_starts_with_condition(stix_dict, item.value1)
-    elif item.condition1 == "EQUALS":
-        field_list = item.field1.split(".")
-        correct = process_equals_condition(stix_dict, field_list, item.value1)
-    # Check the second condition if it exists
-    if item.condition2 and correct:
-        if item.condition2 == "EQUALS":
-            field_list = item.field2.split(".")
-            correct = process_equals_condition(stix_dict, field_list, item.value2)
-    return correct
+    return get_class_registry_instance().get_condition_test(item)(stix_dict)
 
 def determine_content_object_from_list_by_tests(stix_dict: Dict[str, str], content_type:str) -> ParseContent:
     """
@@ -220,24 +257,27 @@ def determine_content_object_from_list_by_tests(stix_dict: Dict[str, str], conte
     Returns:
         ParseContent: The matching ParseContent object, or None if not found.
     """
-    content_list: List[ParseContent] = get_content_list_for_type(stix_dict.get("type"), content_type)
+    if content_type != "class":
+        logger.warning("Content type '%s' is not supported. Only 'class' is currently supported.", content_type)
+        return None
+    registry = get_class_registry_instance()
+    stix_type = stix_dict.get("type")
+    content_list = registry.get_content_for_type(stix_type)
     if not content_list:
         return None
     elif len(content_list) == 1:
         return content_list[0]
     else:
-        correct = False
-        # Split the list
-        default = [item for item in content_list if item.condition1 == ""]
-        specialisation = [item for item in content_list if item.condition1 != ""]
+        # The registry has already split the list and compiled the specialisation tests
+        default = registry.defaults[stix_type]
+        specialisation = registry.specialisations[stix_type]
         # First check the specialisation list for test matches
-        for item in specialisation:
-            correct = test_object_by_condition(item, stix_dict)
-            if correct:
+        for item, condition_test in specialisation:
+            if condition_test(stix_dict):
                 return item
 
         # Else return the default, or worst case the first in the specialisation list
-        return default[0] if default else specialisation[0]
+        return default[0] if default else specialisation[0][0]
     
 
 ###################################################################################################
@@ -246,6 +286,7 @@ def determine_content_object_from_list_by_tests(stix_dict: Dict[str, str], conte
 #
 ####################################################################################################
 
+@functools.lru_cache(maxsize=None)
 def get_tqlname_from_type_and_protocol(stix_type, protocol=None) -> Union[str, None]:
     """
     Get the TypeQL name from the type and protocol.
@@ -270,6 +311,7 @@ def get_tqlname_from_type_and_protocol(stix_type, protocol=None) -> Union[str, N
                 return item.typeql
     return content_list[0].typeql
 
+@functools.lru_cache(maxsize=None)
 def get_group_from_type(stix_type) -> Union[str, None]:
     """
     Get the group from the type.
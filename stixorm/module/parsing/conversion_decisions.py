@@ -1,5 +1,8 @@
-from typing import Dict, List, Union
-import copy
+from collections.abc import Mapping as MappingABC
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import FrozenSet, Iterator, List, Mapping, Tuple, Union
+import functools
 
 from stixorm.module.authorise import  import_type_factory
 
@@ -25,36 +28,57 @@ mbc_model = get_definition_factory_instance().lookup_definition(DefinitionName.M
 flow_model = get_definition_factory_instance().lookup_definition(DefinitionName.ATTACK_FLOW)
 
 
-def stix_dict_to_tql(stix_dict) -> Union[dict, str, List[str], str]:
-    """ convert Stix object into a data model for processing
+@dataclass(frozen=True)
+class ConversionPlan(MappingABC):
+    """ The read-only conversion details shared by every object of one typeql type
+
+    The plan reads as its obj_tql map, so callers that are handed it as an obj_tql can keep using it as one,
+    while split_on_activity_type uses its pre-split properties and relations
+
+    Attributes:
+        tql_name: the typeql name of the object
+        protocol: the protocol of the object, e.g. stix21, attack, os-threat, oca, mbc, flow
+        obj_tql: the merged stix property to typeql property map, including the base properties
+        is_list: all the properties that are lists
+        properties: the stix properties that map onto typeql attributes
+        relations: the stix properties that map onto sub objects or relations
+    """
+    tql_name: str
+    protocol: str
+    obj_tql: Mapping[str, str]
+    is_list: Tuple[str, ...]
+    properties: FrozenSet[str]
+    relations: FrozenSet[str]
+
+    def __getitem__(self, prop: str) -> str:
+        return self.obj_tql[prop]
+
+    def __contains__(self, prop) -> bool:
+        return prop in self.obj_tql
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.obj_tql)
+
+    def __len__(self) -> int:
+        return len(self.obj_tql)
+
+
+@functools.lru_cache(maxsize=None)
+def get_conversion_plan(protocol: str, tql_name: str, group: str) -> ConversionPlan:
+    """ build the conversion plan for a typeql type once, and share it between all objects of that type
 
     Args:
-        stix_dict (): a dict with guaranteed base-level Stix properties
+        protocol (): the protocol of the object, e.g. stix21, attack, os-threat, oca, mbc, flow
+        tql_name (): the typeql name of the object
+        group (): the Stix group of the object, e.g. sdo, sro, sco, meta
 
     Returns:
-        obj_tql: {} - the dict of the tql properties
-        tql_name: str - the typeql name of the object
-        is_list: [] - a list of all the properties that are lists
-        protocol: str - the protocol of the object, e.g. stix21, attack, os-threat, oca, mbc, attack_flow
-
+        plan: the read-only ConversionPlan
     """
-    # 1. Establish variables
     auth_factory = get_auth_factory_instance()
     auth = auth_factory.get_auth_for_import(all_imports)
     obj_tql = {}
-    is_list =[]
-    protocol = ""
-    tql_name = ""
-    # 2. get content record
-    content_record: ParseContent = determine_content_object_from_list_by_tests(stix_dict=stix_dict, content_type="class")
-    # 3. get twl name from content
-    tql_name = content_record.typeql
-    # 4. get protocol from content
-    protocol = content_record.protocol
-    # 5. Get stix type
-    stix_type = content_record.stix_type
-    # Get group from content
-    group = content_record.group
+    is_list = []
     # IF group equals meta then grp = sdo
     grp = group
     base = "base_sdo"
@@ -65,36 +89,62 @@ def stix_dict_to_tql(stix_dict) -> Union[dict, str, List[str], str]:
     elif group == "sco":
         base = "base_sco"
 
-    # 6. Based on protocol type, choose is list and obj tql
+    # Based on protocol type, choose is list and obj tql
     match protocol:
         case "stix21":
-            obj_tql = copy.deepcopy(stix_model.get_data(tql_name))
+            obj_tql.update(stix_model.get_data(tql_name))
             is_list.extend(auth["is_lists"][group][tql_name])
         case "attack":
-            obj_tql.update(copy.deepcopy(attack_model.get_data(tql_name)))
-            obj_tql.update(copy.deepcopy(attack_model.get_base("attack_base")))
+            obj_tql.update(attack_model.get_data(tql_name))
+            obj_tql.update(attack_model.get_base("attack_base"))
             is_list.extend(auth["is_lists"][group][tql_name])
             is_list.extend(auth["is_lists"][group]["attack"])
         case "os-threat":
-            obj_tql = copy.deepcopy(os_threat_model.get_data(tql_name))
+            obj_tql.update(os_threat_model.get_data(tql_name))
             is_list.extend(auth["is_lists"][group][tql_name])
         case "oca":
-            obj_tql = copy.deepcopy(oca_model.get_data(tql_name))
+            obj_tql.update(oca_model.get_data(tql_name))
             is_list.extend(auth["is_lists"][group][tql_name])
         case "mbc":
-            obj_tql = copy.deepcopy(mbc_model.get_data(tql_name))
+            obj_tql.update(mbc_model.get_data(tql_name))
             is_list.extend(auth["is_lists"][group][tql_name])
         case "flow":
-            obj_tql = copy.deepcopy(flow_model.get_data(tql_name))
+            obj_tql.update(flow_model.get_data(tql_name))
             is_list.extend(auth["is_lists"][group][tql_name])
 
-    # 7. Add on the underlying base SDO properties
+    # Add on the underlying base SDO properties
     obj_tql.update(stix_model.get_base(base))
     is_list.extend(auth["is_lists"][grp][grp])
+
+    return ConversionPlan(tql_name=tql_name,
+                          protocol=protocol,
+                          obj_tql=MappingProxyType(obj_tql),
+                          is_list=tuple(is_list),
+                          properties=frozenset(k for k, v in obj_tql.items() if v != ""),
+                          relations=frozenset(k for k, v in obj_tql.items() if v == ""))
+
+
+def stix_dict_to_tql(stix_dict) -> Union[dict, str, List[str], str]:
+    """ convert Stix object into a data model for processing
+
+    Args:
+        stix_dict (): a dict with guaranteed base-level Stix properties
+
+    Returns:
+        obj_tql: {} - the read-only map of the tql properties, the shared ConversionPlan of the type
+        tql_name: str - the typeql name of the object
+        is_list: () - all the properties that are lists
+        protocol: str - the protocol of the object, e.g. stix21, attack, os-threat, oca, mbc, attack_flow
+
+    """
+    # 1. get content record
+    content_record: ParseContent = determine_content_object_from_list_by_tests(stix_dict=stix_dict, content_type="class")
+    # 2. get the shared conversion plan for the tql name, protocol and group from the content
+    plan = get_conversion_plan(content_record.protocol, content_record.typeql, content_record.group)
     logger.debug("in sdo decisions")
-    logger.debug(f'obj tql {obj_tql}')
+    logger.debug('obj tql %s', plan.obj_tql)
 
-    return obj_tql, tql_name, is_list, protocol
+    return plan, plan.tql_name, plan.is_list, plan.protocol
 
 ####################################################################################################
 #
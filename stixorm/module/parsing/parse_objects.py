@@ -113,7 +113,7 @@ def parse(data: dict, allow_custom=False, import_type: ImportType=default_import
 
     # convert dict to full python-stix2 obj
     obj = dict_to_stix(obj, allow_custom, import_type)
-    logger.debug(f"############## obj is {obj} ########")
+    logger.debug("############## obj is %s ########", obj)
 
     return obj
 
@@ -170,7 +170,7 @@ def dict_to_stix(stix_dict: dict,
     assert len(stix_dict) > 0
     if 'type' not in stix_dict:
         raise ParseError(f"Can't parse object with no 'type' property: {str(stix_dict)}")
-    logger.debug(f"I'm in dict to stix, {stix_dict}")
+    logger.debug("I'm in dict to stix, %s", stix_dict)
     # 2. get content record
     content_record: ParseContent = determine_content_object_from_list_by_tests(stix_dict=stix_dict, content_type="class")
     
@@ -179,7 +179,7 @@ def dict_to_stix(stix_dict: dict,
         raise ParseError(f"No matching content record found for type: {stix_dict.get('type', 'unknown')}")
     
     # Get the class name from the content record
-    logger.debug(f'content_record is {content_record}')
+    logger.debug('content_record is %s', content_record)
     class_name = content_record.python_class
     
     # Resolve the class name to the actual class object
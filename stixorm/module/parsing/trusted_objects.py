@@ -0,0 +1,230 @@
+import functools
+import logging
+
+import stix2
+from stix2 import properties
+from stix2.base import _STIXBase
+from stix2.utils import NOW, get_timestamp
+
+from stixorm.module.authorise import import_type_factory
+from stixorm.module.parsing.content.parse import determine_content_object_from_list_by_tests, ParseContent
+from stixorm.module.parsing.parse_objects import dict_to_stix, resolve_class_from_name, _get_dict
+from stixorm.module.typedb_lib.factories.import_type_factory import ImportType
+
+logger = logging.getLogger(__name__)
+default_import_type = import_type_factory.get_default_import()
+
+# these overrides only add positional arguments on top of the base constructor
+_TRUSTED_INITS = frozenset([
+    _STIXBase.__init__,
+    stix2.v21.Relationship.__init__,
+    stix2.v21.Sighting.__init__,
+])
+
+_STRING_PROPERTIES = (
+    properties.StringProperty,
+    properties.TypeProperty,
+    properties.IDProperty,
+    properties.ReferenceProperty,
+    properties.OpenVocabProperty,
+)
+
+
+class UntrustedContent(Exception):
+    """Raised when a dict can not be built on the trusted path"""
+    pass
+
+
+class TrustedPlan:
+    """The per class recipe for building a STIX object without its constructor
+
+    Args:
+        obj_class (): the python-stix2 class the plan builds
+        coercers (): (property name, coercer, default) triples, in the class property order
+        required (): the names of the required properties
+        optional_defaults (): (property name, default value) pairs used to find the defaulted properties
+    """
+    def __init__(self, obj_class, coercers, required, optional_defaults):
+        self.obj_class = obj_class
+        self.coercers = coercers
+        self.required = required
+        self.optional_defaults = optional_defaults
+        self.names = frozenset(obj_class._properties)
+
+    def build(self, stix_dict: dict):
+        """Build an instance of the plan's class straight from a trusted dict
+
+        Args:
+            stix_dict (): the raw STIX dict
+
+        Returns:
+            an instance of the plan's class, with the same content its constructor would give
+        """
+        if not self.names.issuperset(stix_dict):
+            raise UntrustedContent("custom properties")
+
+        inner = {}
+        now = None
+        for name, coercer, default in self.coercers:
+            value = stix_dict.get(name)
+            if value is None or value == []:
+                if default is None:
+                    continue
+                value = default()
+                if value == NOW:
+                    if now is None:
+                        now = get_timestamp()
+                    value = now
+            inner[name] = coercer(value)
+
+        if not self.required.issubset(inner):
+            raise UntrustedContent("missing required properties")
+
+        defaulted = []
+        for name, default_value in self.optional_defaults:
+            if name in inner and inner[name] == default_value:
+                defaulted.append(name)
+
+        obj = self.obj_class.__new__(self.obj_class)
+        obj._inner = inner
+        obj._defaulted_optional_properties = defaulted
+        obj._STIXBase__has_custom = False
+        return obj
+
+
+@functools.lru_cache(maxsize=None)
+def get_trusted_plan(obj_class):
+    """Get the cached trusted plan for a class, or None if the class must use its constructor
+
+    Args:
+        obj_class (): the python-stix2 class
+
+    Returns:
+        the TrustedPlan, or None
+    """
+    if obj_class.__init__ not in _TRUSTED_INITS:
+        return None
+
+    coercers = []
+    optional_defaults = []
+    for name, prop in obj_class._properties.items():
+        default = getattr(prop, "default", None)
+        coercers.append((name, compile_property(prop), default))
+        if default is not None and not prop.required and not hasattr(prop, "_fixed_value"):
+            optional_defaults.append((name, default()))
+
+    required = frozenset(name for name, prop in obj_class._properties.items() if prop.required)
+    return TrustedPlan(obj_class, tuple(coercers), required, tuple(optional_defaults))
+
+
+def compile_property(prop):
+    """Compile a property into a function that coerces a trusted value
+
+    Strings, booleans and integers that already have the right python type are used as is,
+    embedded objects are built by their own trusted plan, and everything else goes
+    through the property's clean method.
+
+    Args:
+        prop (): the python-stix2 property
+
+    Returns:
+        a function from the raw value to the value the constructor would store
+    """
+    kind = type(prop)
+    if isinstance(prop, properties.ExtensionsProperty):
+        # extensions can register top level properties, so leave them to the constructor
+        return refuse_value
+    if kind in _STRING_PROPERTIES:
+        return lambda value: value if type(value) is str else clean_value(prop, value)
+    if kind is properties.BooleanProperty:
+        return lambda value: value if type(value) is bool else clean_value(prop, value)
+    if kind is properties.IntegerProperty and prop.min is None and prop.max is None:
+        return lambda value: value if type(value) is int else clean_value(prop, value)
+    if kind is properties.EmbeddedObjectProperty:
+        return compile_embedded(prop.type, lambda value: clean_value(prop, value))
+    if kind is properties.ListProperty:
+        if isinstance(prop.contained, properties.Property):
+            contained = compile_property(prop.contained)
+        else:
+            contained = compile_embedded(prop.contained, None)
+
+        def coerce_list(value):
+            if type(value) is not list:
+                return clean_value(prop, value)
+            return [contained(item) for item in value]
+        return coerce_list
+
+    return lambda value: clean_value(prop, value)
+
+
+def compile_embedded(obj_class, otherwise):
+    """Compile an embedded object class into a function that builds it from a trusted dict
+
+    Args:
+        obj_class (): the embedded python-stix2 class
+        otherwise (): the coercer for values that are not dicts, None if they are untrusted
+
+    Returns:
+        the coercer
+    """
+    def coerce_embedded(value):
+        if type(value) is not dict:
+            if otherwise is None:
+                raise UntrustedContent("embedded value is not a dict")
+            return otherwise(value)
+        plan = get_trusted_plan(obj_class)
+        if plan is None:
+            raise UntrustedContent(f"{obj_class.__name__} needs its constructor")
+        return plan.build(value)
+    return coerce_embedded
+
+
+def refuse_value(value):
+    raise UntrustedContent("value needs the constructor")
+
+
+def clean_value(prop, value):
+    """Clean a value with its property, refusing anything the property reports as custom
+
+    Args:
+        prop (): the python-stix2 property
+        value (): the raw value
+
+    Returns:
+        the cleaned value
+    """
+    cleaned, has_custom = prop.clean(value, False)
+    if has_custom:
+        raise UntrustedContent("custom content")
+    return cleaned
+
+
+def trusted_dict_to_stix(stix_dict: dict, import_type: ImportType=default_import_type):
+    """Convert a dict from a trusted feed into a python-stix2 object, without running its validation
+
+    The object has the same class and content as dict_to_stix would give it, but is built
+    from a cached per class plan instead of the constructor, so object constraints are not
+    checked. Anything the plan can not express, such as observables, extensions, custom
+    properties or values that do not clean, falls back to dict_to_stix.
+
+    Args:
+        stix_dict (): a python dictionary of a STIX object from a trusted source
+        import_type (): the import type the parser uses to pick the class
+
+    Returns:
+        An instantiated Python STIX object
+    """
+    stix_dict = _get_dict(stix_dict)
+    content_record = None
+    if "type" in stix_dict:
+        content_record: ParseContent = determine_content_object_from_list_by_tests(stix_dict=stix_dict, content_type="class")
+    if content_record is not None:
+        obj_class = resolve_class_from_name(content_record.python_class, content_record)
+        plan = get_trusted_plan(obj_class)
+        if plan is not None:
+            try:
+                return plan.build(stix_dict)
+            except Exception as e:
+                logger.debug("trusted build of %s fell back to the parser: %s", stix_dict.get('id'), e)
+
+    return dict_to_stix(stix_dict, False, import_type)
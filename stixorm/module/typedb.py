@@ -1,32 +1,42 @@
 """Python STIX2 TypeDB Source/Sink"""
+import functools
 import os.path
 import pathlib
 import traceback
 from dataclasses import dataclass
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Iterable, Iterator
 from typedb.api.connection.driver import TypeDBDriver
 from typedb.api.connection.session import TypeDBSession
 from typedb.api.connection.transaction import TypeDBTransaction
 from typedb.driver import TypeDB
 from stixorm.module.orm.import_objects import raw_stix2_to_typeql
-from stixorm.module.orm.delete_object import delete_stix_object, add_delete_layers
+from stixorm.module.orm.direct_delete import build_delete_queries, attribute_queries, attribute_iids_from_answers
+from stixorm.module.orm.delete_planner import plan_deletes, referrer_queries, referrers_from_answers
 from stixorm.module.orm.export_object import convert_ans_to_stix
+from stixorm.module.orm.export_capture import ExportCapture
+from stixorm.module.orm.export_templates import get_link_roles
+from stixorm.module.orm.filter_query import build_filter_query, build_ids_query
 from stixorm.module.parsing.parse_objects import parse
+from stixorm.module.parsing.trusted_objects import trusted_dict_to_stix
 from .authorise import import_type_factory
-from .initialise import setup_database, load_schema, load_markings
+from .initialise import setup_database, load_schemas, schema_fingerprints, get_schema_fingerprints, tlp_ids
 import networkx as nx
 from stix2 import v21
 from stix2.base import _STIXBase
 from stix2.datastore import (
     DataSink, DataSource, )
-from stix2.datastore.filters import FilterSet
+from stix2.datastore.filters import Filter, FilterSet, apply_common_filters
 
 import logging
 
 from stixorm.module.typedb_lib.handlers import handle_result
-from stixorm.module.typedb_lib.logging import log_delete_instruction
-from stixorm.module.typedb_lib.queries import delete_database, match_query, query_ids, delete_layers, build_match_id_query,\
-    build_insert_query, query_id, add_instructions_to_typedb
+from stixorm.module.typedb_lib.queries import delete_database, match_query, match_queries, query_ids, delete_layers, build_match_id_query,\
+    build_insert_query, query_id, add_instructions_to_typedb, add_instructions_to_typedb_by_generation,\
+    query_existing_ids, stream_ids, count_query
+from stixorm.module.typedb_lib.connection import get_connection
+from stixorm.module.typedb_lib.known_ids import get_known_ids
+from stixorm.module.typedb_lib.object_cache import ObjectCache, attach_object_cache, invalidate_objects
+from stixorm.module.typedb_lib.garbage_collection import build_orphan_cleanup_queries, delete_orphan_attributes
 from stixorm.module.typedb_lib.instructions import Instructions, Status, AddInstruction, TypeQLObject, Result
 from stixorm.module.typedb_lib.factories.import_type_factory import ImportType, ImportTypeFactory
 from stixorm.module.parsing.conversion_decisions import get_embedded_match
@@ -41,6 +51,13 @@ logging.basicConfig(filename="typedb_log.txt",
                     level=logging.INFO)
 
 
+# the TLP markings loaded with the schema, they are not part of the data
+TLP_MARKING_IDS = ("marking-definition--613f2e26-407d-48c7-9eca-b8e91df99dc9",
+                   "marking-definition--34098fce-860f-48ae-8e50-ebd3cc5e41da",
+                   "marking-definition--f88d31f6-486f-44da-b317-01333bde0b82",
+                   "marking-definition--5e57c739-391a-4eb3-b6be-7d15ca92d5ed")
+
+
 @dataclass
 class TransactionObject:
     transaction: TypeDBTransaction
@@ -63,6 +80,16 @@ class TypeDBSink(DataSink):
             - password (str): Password for TypeDB, if cluster, otherwise None
         - clear (bool): If True, clear the TypeDB before adding objects.
         - import_type (str): It forces the parser to use either the stix2.1, or mitre att&ck
+        - batch_size (int): the number of consecutive objects committed together in one write transaction
+            by add() and delete(), default 1 commits every object on its own
+        - commit_interval (float): if set, the maximum number of seconds a batch transaction is held open
+            before it is committed, even if the batch is not full
+        - parallelism (int): the number of sessions add() inserts through concurrently, one dependency
+            generation at a time, default 1 inserts everything in order through a single session
+        - trusted (bool): if True, add() builds the STIX objects of a trusted feed without validating them,
+            which gives the same TypeQL for valid objects but does not reject invalid ones
+        - direct_dicts (bool): if True, add() reads the dict of each STIX object straight from the python-stix2
+            object instead of serialising it to JSON and loading it again, which gives the same TypeQL faster
 
     """
 
@@ -71,9 +98,14 @@ class TypeDBSink(DataSink):
                  clear=False,
                  import_type: Optional[ImportType]=None,
                  schema_path: Optional[str] = None,
-                 strict_failure: bool = False, **kwargs):
+                 strict_failure: bool = False,
+                 batch_size: int = 1,
+                 commit_interval: Optional[float] = None,
+                 parallelism: int = 1,
+                 trusted: bool = False,
+                 direct_dicts: bool = False, **kwargs):
         super(TypeDBSink, self).__init__()
-        logger.debug(f'TypeDBSink: {connection}')
+        logger.debug('TypeDBSink: %s', connection)
 
         assert connection["uri"] is not None
         assert connection["port"] is not None
@@ -87,6 +119,11 @@ class TypeDBSink(DataSink):
         self.password: str = connection["password"]
         self.clear: bool = clear
         self.strict_failure = strict_failure
+        self.batch_size: int = batch_size
+        self.commit_interval: Optional[float] = commit_interval
+        self.parallelism: int = parallelism
+        self.trusted: bool = trusted
+        self.direct_dicts: bool = direct_dicts
 
         self.schema_path = schema_path
         self.import_type: ImportType = import_type
@@ -102,108 +139,44 @@ class TypeDBSink(DataSink):
         assign_import_result = self.__assign_import_type()
         handle_result(assign_import_result, "assign import result", self.strict_failure)
 
-        # Validate database can be connected
-        validate_connection = self.__validate_connect_to_db()
-        handle_result(validate_connection, "validate connection result", self.strict_failure)
-
         # 1. Setup database
-        setup_database(self._stix_connection, self.clear)
-
-        # 2. Load the Schema's
-        # A. Load the Stix Schema
-        schema_result = self.__load_stix_schema()
-        handle_result(schema_result, "history schema result", self.strict_failure)
-        # B. Load Stix Rules Schema
-        rules_result = self.__load_stix_rules()
-        handle_result(rules_result, "history stix rules result", self.strict_failure)
-        # C. Load the Attack Schema
-        attack_result = self.__load_attack_schema()
-        handle_result(attack_result, "history attack result", self.strict_failure)
-        # D. Load the OS-Threat Schema
-        os_threat_result = self.__load_os_threat_schema()
-        handle_result(os_threat_result, "history os threat result", self.strict_failure)
-        # E. Load the OCA Schema
-        oca_result = self.__load_oca_schema()
-        handle_result(oca_result, "history oca result", self.strict_failure)
-        # F. Load the MBC Schema
-        mbc_result = self.__load_mbc_schema()
-        handle_result(mbc_result, "history mbc result", self.strict_failure)
-        # G. Load the Attack-Flow Schema
-        attack_flow_result = self.__load_attack_flow_schema()
-        handle_result(attack_flow_result, "history attack flow result", self.strict_failure)
+        created = setup_database(self._stix_connection, self.clear)
+
+        # 2. Load the Schema's, all of them in one transaction, unless the database already has them
+        schema_paths = self.__schema_paths()
+        fingerprints = schema_fingerprints(schema_paths)
+        stored = {} if created else get_schema_fingerprints(self._stix_connection)
+        if stored is None:
+            # a database loaded before fingerprints keeps the schema it has
+            logger.warning("database %s has no schema fingerprints, its schema is not checked", self.database)
+            return
+        stale = [schema_path for schema_path in schema_paths
+                 if stored.get(os.path.basename(schema_path)) != fingerprints[os.path.basename(schema_path)]]
+        if len(stale) == 0:
+            logger.debug("database schema is up to date")
+        else:
+            load_schemas(self._stix_connection, stale, {**stored, **fingerprints})
+            self.loaded = tlp_ids
+            logger.info("we have loaded %s schema files", len(stale))
 
         # 3. Load the Objects
         # Still to do
 
-    def __validate_connect_to_db(self):
-        logger.debug("Attempting DB Connection")
-        self.__get_core_client()
-        logger.debug("DB Connection Successful")
-
-
-    def __load_attack_schema(self):
-        if self.clear and self.import_type.ATTACK:
-            logger.debug("ATT&CK")
-            load_schema(self._stix_connection, str(self.cti_schema_attack), "ATT&CK Schema")
-            logger.info("we have loaded ATT&CK schema")
-        else:
-            logger.debug("import type does not load ATT&CK schema")
-
-
-    def __load_oca_schema(self):
-        if self.clear and self.import_type.OCA:
-            logger.debug("OCA")
-            load_schema(self._stix_connection, str(self.cti_schema_oca), "OCA Schema")
-            logger.info("we have loaded OCA schema")
-        else:
-            logger.debug("import type does not load OCA schema")
-
-
-
-    def __load_mbc_schema(self):
-        if self.clear and self.import_type.MBC:
-            logger.debug("MBC")
-            load_schema(self._stix_connection, str(self.cti_schema_mbc), "MBC Schema")
-            logger.info("we have loaded MBC schema")
-        else:
-            logger.debug("import type does not load MBC schema")
-
-
-
-    def __load_attack_flow_schema(self):
-        if self.clear and self.import_type.ATTACK_FLOW:
-            logger.debug("ATTACK_FLOW")
-            load_schema(self._stix_connection, str(self.cti_schema_attack_flow), "ATTACK_FLOW Schema")
-            logger.info("we have loaded ATTACK_FLOW schema")
-        else:
-            logger.debug("import type does not load ATTACK_FLOW schema")
-
-
-    def __load_os_threat_schema(self):
-        if self.clear and self.import_type.OS_THREAT:
-            logger.debug("OS_THREAT")
-            load_schema(self._stix_connection, str(self.cti_schema_os_threat), "OS_THREAT Schema ")
-            logger.info("we have loaded OS_THREAT schema")
-        else:
-            logger.debug("import type does not load OS_THREAT schema")
-
-
-    def __load_stix_rules(self):
-        if self.clear and self.import_type.RULES:
-            logger.debug("rules")
-            load_schema(self._stix_connection, str(self.cti_schema_stix_rules), "Stix 2.1 Rules")
-            logger.info("we have loaded Stix rules")
-        else:
-            logger.debug("ignoring  stix rules")
-
-
-    def __load_stix_schema(self):
-        if self.clear:
-            load_schema(self._stix_connection, str(self.cti_schema_stix), "Stix 2.1 Schema ")
-            self.loaded = load_markings(self._stix_connection)
-            logger.info("we have loaded Stix schema")
-        else:
-            logger.debug("ignoring history stix schema")
+    def __schema_paths(self) -> List[str]:
+        schema_paths = [self.cti_schema_stix]
+        if self.import_type.RULES:
+            schema_paths.append(self.cti_schema_stix_rules)
+        if self.import_type.ATTACK:
+            schema_paths.append(self.cti_schema_attack)
+        if self.import_type.OS_THREAT:
+            schema_paths.append(self.cti_schema_os_threat)
+        if self.import_type.OCA:
+            schema_paths.append(self.cti_schema_oca)
+        if self.import_type.MBC:
+            schema_paths.append(self.cti_schema_mbc)
+        if self.import_type.ATTACK_FLOW:
+            schema_paths.append(self.cti_schema_attack_flow)
+        return [str(schema_path) for schema_path in schema_paths]
 
 
     def __assign_schemas(self):
@@ -248,155 +221,213 @@ class TypeDBSink(DataSink):
         logger.debug("Successfully cleared database")
 
 
-    def __filter_markings(self, stix_ids: List[str]) -> List[str]:
-        marking = ["marking-definition--613f2e26-407d-48c7-9eca-b8e91df99dc9",
-                   "marking-definition--34098fce-860f-48ae-8e50-ebd3cc5e41da",
-                   "marking-definition--f88d31f6-486f-44da-b317-01333bde0b82",
-                   "marking-definition--5e57c739-391a-4eb3-b6be-7d15ca92d5ed"]
-
-        filtered_list = list(filter(lambda x: x.get_value() not in marking, stix_ids))
-        return self.__string_attibute_to_string(filtered_list)
-
-    def __string_attibute_to_string(self,
-                                    string_attributes: List[str]):
-        return [stix_id.get_value() for stix_id in string_attributes]
+    def iter_stix_ids(self,
+                      stix_types: Optional[List[str]] = None,
+                      protocol: Optional[str] = None,
+                      offset: int = 0,
+                      limit: Optional[int] = None,
+                      page_size: int = 10000) -> Iterator[str]:
+        """ Iterate over the stix-ids in the database, a sorted page at a time, leaving out the TLP markings
 
-    def __query_stix_ids(self):
-        get_ids_tql = 'match $ids isa stix-id; get $ids;'
-        data_query = query_ids
-        query_data = match_query(self.uri,
-                                 self.port,
-                                 self.database,
-                                 get_ids_tql,
-                                 data_query)
+        Each page is a separate query that carries on from the last id of the page before, so
+        memory stays bounded by the page size however many ids the database holds.
 
-        return query_data
+        Args:
+            stix_types (): only the objects with one of these stix types, e.g. ["indicator", "malware"]
+            protocol (): only the objects of this protocol, e.g. "stix21", "attack", "os-threat"
+            offset (): the number of sorted stix-ids to skip
+            limit (): the maximum number of stix-ids, default None returns them all
+            page_size (): the number of stix-ids fetched per query
 
+        Returns:
+            stix_ids: an iterator of the stix-ids, in sorted order
+        """
+        remaining = limit
+        after = None
+        while remaining is None or remaining > 0:
+            page_limit = page_size if remaining is None else min(page_size, remaining)
+            query = build_ids_query(self.import_type, stix_types, protocol, TLP_MARKING_IDS, after=after,
+                                    offset=offset if after is None else 0, limit=page_limit)
+            page = list(stream_ids(self.uri, self.port, self.database, query))
+            yield from page
+            if len(page) < page_limit:
+                return
+            after = page[-1]
+            if remaining is not None:
+                remaining -= len(page)
+
+    def count_stix_ids(self,
+                       stix_types: Optional[List[str]] = None,
+                       protocol: Optional[str] = None) -> int:
+        """ Count the stix-ids in the database on the server, leaving out the TLP markings
 
-    def get_stix_ids(self):
-        """ Get all the stix-ids in a database, should be moved to DataSource object
+        Args:
+            stix_types (): only the objects with one of these stix types
+            protocol (): only the objects of this protocol
 
         Returns:
-            id_list : list of the stix-ids in the database
+            count: the number of stix-ids
         """
-        stix_ids_query = self.__query_stix_ids()
+        query = build_ids_query(self.import_type, stix_types, protocol, TLP_MARKING_IDS, count=True)
+        return count_query(self.uri, self.port, self.database, query)
 
-        result = self.__filter_markings(stix_ids_query)
-        return result
+    def get_stix_ids(self,
+                     stix_types: Optional[List[str]] = None,
+                     protocol: Optional[str] = None):
+        """ Get all the stix-ids in a database, should be moved to DataSource object.
+            Use iter_stix_ids to page through a large database.
 
+        Args:
+            stix_types (): only the objects with one of these stix types
+            protocol (): only the objects of this protocol
 
-    def __retrieve_stix_id(self,
-                           stix_id: str):
-        type_db_source = self.__get_source_client()
-        return type_db_source.get(stix_id)
+        Returns:
+            id_list : list of the stix-ids in the database
+        """
+        return list(self.iter_stix_ids(stix_types, protocol))
 
 
     def __delete_instruction(self,
-                             stixid: str):
-
-        stix_obj = self.__retrieve_stix_id(stixid)
+                             stixid: str) -> Optional[dict]:
+        if stixid in TLP_MARKING_IDS:
+            # the TLP markings are part of the database setup, and are never deleted
+            return None
+        return {"id": stixid,
+                "dep_list": [],
+                "type": stixid.split("--")[0],
+                "delete": build_delete_queries([stixid], self.import_type)}
 
-        dep_match, dep_insert, indep_ql, core_ql, dep_obj = raw_stix2_to_typeql(stix_obj, self.import_type)
-        del_match, del_tql = delete_stix_object(stix_obj, dep_match, dep_insert, indep_ql, core_ql, self.import_type)
-        dep_obj["delete"] = del_match + '\n' + del_tql
 
-        log_delete_instruction(del_match, dep_insert, indep_ql, dep_obj, del_match, del_tql)
-        if del_match == '' and del_tql == '':
-            return None
-        else:
-            return dep_obj
-
-
-    def __update_delete_layers(self,
-                               layers,
-                               indexes,
-                               missing,
-                               dep_obj):
-        if dep_obj is None:
-            return layers, indexes, missing
-        if len(layers) == 0:
-            missing = dep_obj['dep_list']
-            indexes.append(dep_obj['id'])
-            layers.append(dep_obj)
-        else:
-            layers, indexes, missing = add_delete_layers(layers, dep_obj, indexes, missing)
-        return layers, indexes, missing
+    def __find_referrers(self,
+                         stixids: List[str]) -> Dict[str, List[str]]:
+        link_roles = get_link_roles(self.import_type)
+        referrers = {}
+        for _, found in match_queries(self.uri, self.port, self.database, referrer_queries(stixids),
+                                      referrers_from_answers, link_roles=link_roles):
+            for stixid, ref in found:
+                referrers.setdefault(stixid, []).append(ref)
+        return referrers
 
 
     def __retrieve_delete_instructions(self,
                                        stixids: List[str]) -> Instructions:
 
-        layers = []
-        indexes = []
-        missing = []
-
         instructions = Instructions()
-
+        existing = set(query_existing_ids(self.uri, self.port, self.database, list(dict.fromkeys(stixids))))
+        dep_objs = {}
         for stixid in stixids:
-            del_result = self.__delete_instruction(stixid)
-            layers, indexes, missing = self.__update_delete_layers(layers, indexes, missing, del_result)
-
-        for layer in layers:
+            if stixid not in existing:
+                instructions.insert_delete_instruction_not_found(stixid)
+                continue
+            dep_obj = self.__delete_instruction(stixid)
+            if dep_obj is not None:
+                dep_objs[stixid] = dep_obj
+
+        # the referrers in the delete set are the dependents of the object they reference
+        referrers = self.__find_referrers(list(dep_objs))
+        for stixid, refs in referrers.items():
+            for ref in refs:
+                if ref in dep_objs:
+                    dep_objs[ref]['dep_list'].append(stixid)
+        plan = plan_deletes(dep_objs.values(), referrers)
+
+        for layer in plan.order:
             instructions.insert_delete_instruction(layer['id'], layer)
+        for dep_obj in dep_objs.values():
+            if dep_obj['id'] in plan.blocked:
+                instructions.insert_delete_instruction_referenced(dep_obj['id'], dep_obj, plan.blocked[dep_obj['id']])
         return instructions
 
 
+    def __find_owned_attributes(self,
+                                stixids: List[str]) -> List[str]:
+        iids = {}
+        for _, found in match_queries(self.uri, self.port, self.database,
+                                      attribute_queries(stixids, self.import_type),
+                                      attribute_iids_from_answers):
+            iids.update(dict.fromkeys(found))
+        return list(iids)
+
+
     def __order_delete_instructions(self,
                                     delete_instructions: Instructions):
-        layer = {}
-        layer['delete'] = 'match $a isa attribute; not { $b isa thing; $b has $a;}; delete $a isa attribute;'
-        delete_instructions.insert_delete_instruction(
-            "cleanup-1", layer
-        )
-        delete_instructions.insert_delete_instruction(
-            "cleanup-2", layer
-        )
+        # only the attributes of the objects being deleted can be orphaned by the delete
+        stixids = [stixid for stixid in delete_instructions.get_ordered_ids()
+                   if not delete_instructions.not_allow_insertion(stixid)]
+        iids = self.__find_owned_attributes(stixids)
+        if len(iids) > 0:
+            layer = {'delete': build_orphan_cleanup_queries(iids)}
+            delete_instructions.insert_delete_instruction("cleanup", layer)
         return delete_instructions
 
-    def delete(self, stixid_list: List[str]) -> Instructions:
+
+    def __batch_delete_queries(self,
+                               delete_instructions: Instructions,
+                               batch: List[str]) -> List[str]:
+        # the objects of a batch are deleted together, a level of their relations per query, then the cleanup
+        stixids = [stixid for stixid in batch if 'dep_list' in delete_instructions.instructions[stixid].layer]
+        queries = build_delete_queries(stixids, self.import_type) if len(stixids) > 0 else []
+        for instruction_id in batch:
+            if instruction_id not in stixids:
+                queries.extend(delete_instructions.get_queries_for_id(instruction_id))
+        return queries
+
+    def collect_orphan_attributes(self, batch_size: int = 10000) -> int:
+        """ Sweep the whole database for attributes without an owner and delete them. A delete only cleans up the
+            attributes of the objects it deletes, so this is best run now and then, e.g. by an OrphanAttributeCollector
+
+        Args:
+            batch_size (): the maximum number of attributes deleted in one write transaction
+
+        Returns:
+            deleted: the number of attributes deleted
+        """
+        return delete_orphan_attributes(self.uri, self.port, self.database, batch_size)
+
+    def delete(self, stixid_list: List[str], batch_size: Optional[int] = None) -> Instructions:
         """ Delete a list of STIX objects from the typedb_lib server. Must include all related objects and relations
 
         Args:
             stixid_list (): The list of Stix-id's of the object's to delete
+            batch_size (): the number of objects deleted together in one write transaction, default None uses
+                the batch_size of the sink. A failing batch is split until the failing objects are found, so
+                every object still gets its own result
         """
 
         delete_instruction_result = self.__retrieve_delete_instructions(stixid_list)
         order_instruction_result = self.__order_delete_instructions(delete_instruction_result)
-        delete_from_database_result = delete_layers(self.uri,
-                                                    self.port,
-                                                    self.database,
-                                                    order_instruction_result)
+        try:
+            delete_from_database_result = delete_layers(self.uri,
+                                                        self.port,
+                                                        self.database,
+                                                        order_instruction_result,
+                                                        batch_size=batch_size or self.batch_size,
+                                                        batch_queries=functools.partial(self.__batch_delete_queries,
+                                                                                        order_instruction_result))
+        finally:
+            invalidate_objects(self.uri, self.port, self.database, stixid_list)
 
         instructions = delete_from_database_result
+        get_known_ids(self.uri, self.port, self.database).discard(stixid_list)
 
         return instructions.convert_to_result()
 
 
 
     def __get_core_client(self) -> TypeDBDriver:
-        typedb_url = self.uri + ":" + self.port
-        return TypeDB.core_driver(typedb_url)
-
-
-    def __get_source_client(self):
-        connection = {'uri': self.uri,
-                      'port': self.port,
-                      'database': self.database,
-                      'user': self.user,
-                      'password': self.password}
-
-        return TypeDBSource(connection, self.import_type)
-
-
+        return get_connection(self.uri, self.port).driver
 
 
     def __generate_typeql_object(self, stix_dict: dict) -> TypeQLObject:
 
-        logger.debug(f"\n================================================================\nim about to parse \n")
-        stix_obj = parse(stix_dict, False, self.import_type)
-        logger.debug(f'\n-------------------------------------------------------------\n i have parsed\n')
-        dep_match, dep_insert, indep_ql, core_ql, dep_obj = raw_stix2_to_typeql(stix_obj, self.import_type)
-        logger.debug(f'\ndep_match {dep_match} \ndep_insert {dep_insert} \nindep_ql {indep_ql} \ncore_ql {core_ql}')
+        logger.debug("\n================================================================\nim about to parse \n")
+        if self.trusted:
+            stix_obj = trusted_dict_to_stix(stix_dict, self.import_type)
+        else:
+            stix_obj = parse(stix_dict, False, self.import_type)
+        logger.debug('\n-------------------------------------------------------------\n i have parsed\n')
+        dep_match, dep_insert, indep_ql, core_ql, dep_obj = raw_stix2_to_typeql(stix_obj, self.import_type, self.direct_dicts)
+        logger.debug('\ndep_match %s \ndep_insert %s \nindep_ql %s \ncore_ql %s', dep_match, dep_insert, indep_ql, core_ql)
         typeql_obj = TypeQLObject(
             dep_match=dep_match,
             dep_insert=dep_insert,
@@ -478,22 +509,14 @@ class TypeDBSink(DataSink):
                                      instructions: Instructions):
         missing_ids_from_tree = instructions.missing_dependency_ids()
 
-        result = []
-        for missing_ids in self.batch_generator(missing_ids_from_tree):
-            query_result = build_match_id_query(missing_ids)
-
-            data_result = match_query(uri=self.uri,
-                                      port=self.port,
-                                      database=self.database,
-                                      query=query_result,
-                                      data_query=query_id,
-                                      import_type=None)
-            result = result + data_result
-
+        # only ask the database about ids that are not already known to be in it
+        known_ids = get_known_ids(self.uri, self.port, self.database)
+        unknown_ids = known_ids.unknown(missing_ids_from_tree)
+        missing_ids_found_in_db = query_existing_ids(self.uri, self.port, self.database, unknown_ids)
+        known_ids.add(missing_ids_found_in_db)
 
-        missing_ids_found_in_db = result
         # ids with no record in db and in dependency tree
-        ids_missing = list(set(missing_ids_from_tree) - set(missing_ids_found_in_db))
+        ids_missing = list(set(unknown_ids) - set(missing_ids_found_in_db))
         instructions.register_missing_dependencies(ids_missing)
 
         return instructions
@@ -505,6 +528,7 @@ class TypeDBSink(DataSink):
         try:
             order = list(nx.topological_sort(instructions.dependencies))
             instructions.add_insertion_order(order)
+            instructions.add_insertion_generations(nx.topological_generations(instructions.dependencies))
         except Exception as e:
             logging.exception(e)
         return instructions
@@ -519,7 +543,8 @@ class TypeDBSink(DataSink):
                 a. get raw stix to tql
                 b. add object to an ordered list
                 c. return the ordered list
-            3. Add each object in the ordered list
+            3. Add each object in the ordered list, committing batch_size objects per transaction, or
+                if parallelism > 1, add each dependency generation concurrently across parallelism sessions
         Args:
             stix_data (STIX object OR Bundle OR dict OR list): valid STIX 2.1 content
                 in a STIX object (or list of), dict (or list of), or a STIX 2.1
@@ -553,12 +578,29 @@ class TypeDBSink(DataSink):
 
         queries_result = self.__generate_queries(reorder_result)
 
-        add_to_database_result = add_instructions_to_typedb(self.uri,
-                                                            self.port,
-                                                            self.database,
-                                                            reorder_result)
+        if self.parallelism > 1:
+            add_to_database_result = add_instructions_to_typedb_by_generation(self.uri,
+                                                                              self.port,
+                                                                              self.database,
+                                                                              reorder_result,
+                                                                              parallelism=self.parallelism,
+                                                                              batch_size=self.batch_size,
+                                                                              commit_interval=self.commit_interval)
+        else:
+            add_to_database_result = add_instructions_to_typedb(self.uri,
+                                                                self.port,
+                                                                self.database,
+                                                                reorder_result,
+                                                                batch_size=self.batch_size,
+                                                                commit_interval=self.commit_interval)
 
         instructions = add_to_database_result
+        successful_ids = instructions.get_successful_ids()
+        known_ids = get_known_ids(self.uri, self.port, self.database)
+        known_ids.add(successful_ids)
+        # a known dependency may have been deleted by another process, so the next add() asks the database again
+        known_ids.discard(instructions.get_failed_dependency_ids())
+        invalidate_objects(self.uri, self.port, self.database, successful_ids)
 
         return instructions.convert_to_result()
 
@@ -574,15 +616,15 @@ class TypeDBSink(DataSink):
         #logger.debug('-----------------------------------------------------')
 
         if isinstance(stix_data, (v21.Bundle)):
-            logger.debug(f'isinstance Bundle')
+            logger.debug('isinstance Bundle')
             # recursively add individual STIX objects
-            logger.debug(f'obects are {stix_data["objects"]}')
+            logger.debug('obects are %s', stix_data['objects'])
             return stix_data.get("objects", [])
 
 
         elif isinstance(stix_data, _STIXBase):
             logger.debug("base")
-            logger.debug(f'isinstance _STIXBase')
+            logger.debug('isinstance _STIXBase')
             temp_list = []
             temp_list.append(stix_data)
             return temp_list
@@ -592,7 +634,7 @@ class TypeDBSink(DataSink):
                 return stix_data.get("objects", [])
             else:
                 logger.debug("dcit")
-                logger.debug(f'isinstance dict')
+                logger.debug('isinstance dict')
                 temp_list = []
                 temp_list.append(stix_data)
                 return temp_list
@@ -605,7 +647,7 @@ class TypeDBSink(DataSink):
                 else:
                     item_list.append(item)
 
-            logger.debug(f'isinstance list')
+            logger.debug('isinstance list')
             # recursively add individual STIX objects
             return item_list
 
@@ -631,12 +673,18 @@ class TypeDBSource(DataSource):
             - user (str): Username for TypeDB, if cluster, otherwise None
             - password (str): Password for TypeDB, if cluster, otherwise None
         - import_type (str): It forces the parser to use either the stix2.1, or mitre att&ck
+        - export_capture (ExportCapture): if set, receives the intermediate form and the stix dict of
+            every object retrieved, for troubleshooting, default None captures nothing
+        - object_cache (ObjectCache): if set, get() and get_many() answer repeated reads from this
+            cache, which TypeDBSink add() and delete() on the same database keep up to date
 
     """
 
-    def __init__(self, connection: Dict[str, str], import_type: Optional[ImportType]=None, **kwargs):
+    def __init__(self, connection: Dict[str, str], import_type: Optional[ImportType]=None,
+                 export_capture: Optional[ExportCapture] = None,
+                 object_cache: Optional[ObjectCache] = None, **kwargs):
         super(TypeDBSource, self).__init__()
-        logger.debug(f'TypeDBSource: {connection}')
+        logger.debug('TypeDBSource: %s', connection)
 
         assert connection["uri"] is not None
         assert connection["port"] is not None
@@ -650,6 +698,10 @@ class TypeDBSource(DataSource):
         self.user = connection["user"]
         self.password = connection["password"]
         self.import_type: ImportType = self.__default_import_type() if import_type is None else import_type
+        self.export_capture: Optional[ExportCapture] = export_capture
+        self.object_cache: Optional[ObjectCache] = object_cache
+        if object_cache is not None:
+            attach_object_cache(self.uri, self.port, self.database, object_cache)
 
     def __default_import_type(self):
         return ImportTypeFactory.get_default_import()
@@ -659,21 +711,26 @@ class TypeDBSource(DataSource):
         return self._stix_connection
 
 
+    def __stix_object_query(self,
+                            stix_id: str) -> str:
+        obj_var, type_ql = get_embedded_match(stix_id, self.import_type)
+        return 'match ' + type_ql + "get;"
+
     def __retrieve_stix_object(self,
                                stix_id: str):
-        logger.debug(f'__retrieve_stix_object: {stix_id}')
-        obj_var, type_ql = get_embedded_match(stix_id, self.import_type)
-        query = 'match ' + type_ql + "get;"
-        logger.debug(f'query is {query}')
+        logger.debug('__retrieve_stix_object: %s', stix_id)
+        query = self.__stix_object_query(stix_id)
+        logger.debug('query is %s', query)
 
         data = match_query(uri=self.uri,
                            port=self.port,
                            database=self.database,
                            query=query,
                            data_query=convert_ans_to_stix,
-                           import_type=self.import_type)
+                           import_type=self.import_type,
+                           capture=self.export_capture)
 
-        logger.debug(f'data is -> {data}')
+        logger.debug('data is -> %s', data)
         stix_obj = parse(data=data, allow_custom=False, import_type=self.import_type)
 
         # result = write_to_file("stixorm/module/how_it_works/export_final.json", stix_obj)
@@ -698,52 +755,118 @@ class TypeDBSource(DataSource):
 
         """
 
-        result = self.__retrieve_stix_object(stix_id)
+        if self.object_cache is None:
+            return self.__retrieve_stix_object(stix_id)
+        result = self.object_cache.get(stix_id)
+        if result is None:
+            version = self.object_cache.version()
+            result = self.__retrieve_stix_object(stix_id)
+            self.object_cache.put(stix_id, result, version)
         return result
 
+    def get_many(self, stix_ids: Iterable[str], batch_size: int = 50) -> Iterator[_STIXBase]:
+        """Retrieve many STIX objects through one session and read transaction.
+
+        The ids are grouped by type and their match queries are pipelined, batch_size at a time,
+        so a report or grouping and all of its referenced objects cost a single connection setup.
+
+        Args:
+            stix_ids (list): The STIX IDs of the STIX objects to be retrieved, repeats are fetched once.
+            batch_size (int): The maximum number of object queries in flight at once.
+
+        Returns:
+            (iterator): the STIX objects, yielded as each one is assembled, grouped by type.
+                Ids that are not in the database are logged and skipped. If the source has an
+                object cache, the cached objects come first.
+
+        """
+        unique_ids = list(dict.fromkeys(stix_ids))
+        unique_ids.sort(key=lambda stix_id: stix_id.split("--")[0])
+        if self.object_cache is None:
+            return self.__stream_stix_objects(unique_ids, batch_size)
+        return self.__stream_cached_stix_objects(unique_ids, batch_size)
+
+    def __stream_cached_stix_objects(self, stix_ids: List[str], batch_size: int) -> Iterator[_STIXBase]:
+        missing_ids = []
+        for stix_id in stix_ids:
+            stix_obj = self.object_cache.get(stix_id)
+            if stix_obj is None:
+                missing_ids.append(stix_id)
+            else:
+                yield stix_obj
+        version = self.object_cache.version()
+        for stix_obj in self.__stream_stix_objects(missing_ids, batch_size):
+            self.object_cache.put(stix_obj.id, stix_obj, version)
+            yield stix_obj
+
+    def __stream_stix_objects(self, stix_ids: Iterable[str], batch_size: int = 50) -> Iterator[_STIXBase]:
+        queries = ((stix_id, self.__stix_object_query(stix_id)) for stix_id in stix_ids)
+        results = match_queries(uri=self.uri,
+                                port=self.port,
+                                database=self.database,
+                                queries=queries,
+                                data_query=convert_ans_to_stix,
+                                batch_size=batch_size,
+                                import_type=self.import_type,
+                                capture=self.export_capture)
+        for stix_id, data in results:
+            if not data:
+                logger.warning('%s is not in the database', stix_id)
+                continue
+            yield parse(data=data, allow_custom=False, import_type=self.import_type)
+
     def query(self, query=None, version=None, _composite_filters=None):
         """Search and retrieve STIX objects based on the complete query.
 
         A "complete query" includes the filters from the query, the filters
-        attached to this FileSystemSource, and any filters passed from a
+        attached to this TypeDBSource, and any filters passed from a
         CompositeDataSource (i.e. _composite_filters).
 
+        The type, id, created, modified and labels filters, the embedded
+        reference filters (e.g. created_by_ref, object_marking_refs, source_ref)
+        and the sub object filters (e.g. external_references.external_id) are
+        turned into the TypeQL match, so only the candidate objects are read.
+        Every filter is then checked against the returned objects.
+
         Args:
             query (list): list of filters to search on
             _composite_filters (FilterSet): collection of filters passed from
                 the CompositeDataSource, not user supplied
-            version (str): If present, it forces the parser to use the version
-                provided. Otherwise, the library will make the best effort based
-                on checking the "spec_version" property.
+            version (str): Not used, the objects are parsed with the import type
+                of this source.
 
         Returns:
-            (list): list of STIX objects that matches the supplied
-                query. The STIX objects are loaded from their json files,
-                parsed into a python STIX objects and then returned.
+            (iterator): the STIX objects that match the supplied query,
+                read from the database and parsed as they are iterated.
 
         """
-        pass
+        query = FilterSet(query)
+        query.add(self.filters)
+        query.add(_composite_filters)
+        filters = list(query)
+
+        typeql = build_filter_query(filters, self.import_type)
+        logger.debug('query is %s', typeql)
+        stix_ids = stream_ids(self.uri, self.port, self.database, typeql)
+        return apply_common_filters(self.__stream_stix_objects(stix_ids), filters)
 
     def all_versions(self, stix_id, version=None, _composite_filters=None):
-        """Retrieve STIX object from file directory via STIX ID, all versions.
+        """Retrieve STIX object from the database via STIX ID, all versions.
 
-        Note: Since FileSystem sources/sinks don't handle multiple versions
-        of a STIX object, this operation is unnecessary. Pass call to get().
+        Note: Since the database keeps one version of each STIX object,
+        this returns the stored version if it passes the filters.
 
         Args:
             stix_id (str): The STIX ID of the STIX objects to be retrieved.
             _composite_filters (FilterSet): collection of filters passed from
                 the parent CompositeDataSource, not user supplied
-            version (str): If present, it forces the parser to use the version
-                provided. Otherwise, the library will make the best effort based
-                on checking the "spec_version" property.
+            version (str): Not used, the object is parsed with the import type
+                of this source.
 
         Returns:
             (list): of STIX objects that has the supplied STIX ID.
-                The STIX objects are loaded from their json files, parsed into
-                a python STIX objects and then returned
 
         """
-        pass
+        return list(self.query([Filter("id", "=", stix_id)], version, _composite_filters))
 
 
@@ -0,0 +1,173 @@
+import functools
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from typedb.api.connection.driver import TypeDBDriver
+from typedb.api.connection.session import SessionType, TypeDBSession
+from typedb.driver import TypeDB
+
+logger = logging.getLogger(__name__)
+
+
+class TypeDBConnection:
+    """A long lived TypeDB driver, with a pool of idle data sessions per database
+
+    The driver is opened on first use and reopened if it is found closed, or if it fails a health
+    check after an error, as a driver whose server went away still reports itself open. Data
+    sessions are borrowed from the pool and handed back once the caller is done with them. A
+    session that is closed, or that was in use when an error escaped or a generator using it was
+    closed early, is dropped instead of being pooled again, so the next borrower gets a fresh one.
+
+    Args:
+        uri (): the TypeDB uri
+        port (): the TypeDB port
+        max_idle_sessions (): the maximum number of idle data sessions kept per database
+    """
+    def __init__(self, uri: str, port: str, max_idle_sessions: int = 8):
+        self.url = uri + ":" + port
+        self.max_idle_sessions = max_idle_sessions
+        self._driver: Optional[TypeDBDriver] = None
+        self._idle_sessions: Dict[str, List[TypeDBSession]] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def driver(self) -> TypeDBDriver:
+        """The shared driver, reconnected if it has been closed"""
+        with self._lock:
+            if self._driver is None or not self._driver.is_open():
+                if self._driver is not None:
+                    logger.warning('TypeDB driver for %s was closed, reconnecting', self.url)
+                self._idle_sessions = {}
+                self._driver = TypeDB.core_driver(self.url)
+            return self._driver
+
+    def is_healthy(self) -> bool:
+        """Check the driver is open and the server answers
+
+        Returns:
+            healthy: True if the server could be reached
+        """
+        try:
+            self.driver.databases.all()
+            return True
+        except Exception as e:
+            logger.warning('TypeDB connection to %s failed its health check: %s', self.url, e)
+            self.reset()
+            return False
+
+    @contextmanager
+    def data_session(self, database: str):
+        """Borrow a data session for the database from the pool
+
+        Args:
+            database (): the database name
+
+        Returns:
+            session: an open data session, returned to the pool when the context exits
+        """
+        session = self.__take_session(database)
+        failed = True
+        try:
+            yield session
+            failed = False
+        except Exception:
+            # a driver whose server went away fails every query, the check reconnects it for the next borrower
+            self.is_healthy()
+            raise
+        finally:
+            # an error, or a generator abandoned part way through, leaves the session in an unknown state
+            if failed:
+                self.__discard_session(session)
+            else:
+                self.__return_session(database, session)
+
+    @contextmanager
+    def schema_session(self, database: str):
+        """Open a schema session for the database, schema sessions are never pooled and
+        the idle data sessions of the database are closed first
+
+        Args:
+            database (): the database name
+
+        Returns:
+            session: an open schema session, closed when the context exits
+        """
+        self.close_sessions(database)
+        with self.driver.session(database, SessionType.SCHEMA) as session:
+            yield session
+
+    def close_sessions(self, database: str):
+        """Close the idle sessions of a database, for example before it is deleted
+
+        Args:
+            database (): the database name
+        """
+        with self._lock:
+            sessions = self._idle_sessions.pop(database, [])
+        for session in sessions:
+            self.__discard_session(session)
+
+    def reset(self):
+        """Close the idle sessions and the driver, the next use reconnects"""
+        with self._lock:
+            databases = list(self._idle_sessions)
+        for database in databases:
+            self.close_sessions(database)
+        with self._lock:
+            driver, self._driver = self._driver, None
+        if driver is not None and driver.is_open():
+            driver.close()
+
+    def __take_session(self, database: str) -> TypeDBSession:
+        try:
+            return self.__open_session(database)
+        except Exception as e:
+            if self.is_healthy():
+                raise
+            logger.warning('Opening a session on %s failed, retrying on a new driver: %s', self.url, e)
+            return self.__open_session(database)
+
+    def __open_session(self, database: str) -> TypeDBSession:
+        driver = self.driver
+        with self._lock:
+            idle = self._idle_sessions.setdefault(database, [])
+            while len(idle) > 0:
+                session = idle.pop()
+                if session.is_open():
+                    return session
+        return driver.session(database, SessionType.DATA)
+
+    def __return_session(self, database: str, session: TypeDBSession):
+        with self._lock:
+            idle = self._idle_sessions.setdefault(database, [])
+            if session.is_open() and len(idle) < self.max_idle_sessions:
+                idle.append(session)
+                return
+        self.__discard_session(session)
+
+    def __discard_session(self, session: TypeDBSession):
+        try:
+            if session.is_open():
+                session.close()
+        except Exception as e:
+            logger.debug('Closing a discarded session failed: %s', e)
+
+
+def get_connection(uri: str, port: str) -> TypeDBConnection:
+    """Get the process wide connection for a TypeDB server
+
+    Args:
+        uri (): the TypeDB uri
+        port (): the TypeDB port, as a str or an int
+
+    Returns:
+        connection: the shared TypeDBConnection
+    """
+    return _get_connection(uri, str(port))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_connection(uri: str, port: str) -> TypeDBConnection:
+    return TypeDBConnection(uri, port)
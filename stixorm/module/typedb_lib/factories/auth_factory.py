@@ -1,10 +1,41 @@
 import functools
-import hashlib
 
 from stixorm.module.authorise import authorised_mappings
 from stixorm.module.typedb_lib.factories.import_type_factory import ImportType
 
 
+class FrozenDict(dict):
+    """ A read-only dict. It can be shared between callers safely, so copying it returns the same dict"""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("authorised mappings are read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def freeze_auth(value):
+    """ Convert the authorised mappings into read-only dicts and tuples
+
+    Args:
+        value (): the authorised mappings, or a value inside them
+
+    Returns:
+        frozen: the read-only value
+    """
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze_auth(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze_auth(item) for item in value)
+    return value
+
+
 class AuthFactory:
 
     def __init__(self):
@@ -13,15 +44,13 @@ class AuthFactory:
 
     def get_auth_for_import(self,
                             import_type: ImportType):
-        json_string = import_type.json()
-        hashed_string = hashlib.sha256(json_string.encode()).hexdigest()
-        if hashed_string in self.auths_by_import_type.keys():
-            return self.auths_by_import_type[hashed_string]
-        else:
-            authorised_mapping = authorised_mappings(import_type)
-            self.auths_by_import_type[hashed_string] = authorised_mapping
-            return authorised_mapping
+        key = import_type.get_key()
+        authorised_mapping = self.auths_by_import_type.get(key)
+        if authorised_mapping is None:
+            authorised_mapping = freeze_auth(authorised_mappings(import_type))
+            self.auths_by_import_type[key] = authorised_mapping
+        return authorised_mapping
 
 @functools.lru_cache(maxsize=None)
 def get_auth_factory_instance() -> AuthFactory:
-    return AuthFactory()
\ No newline at end of file
+    return AuthFactory()
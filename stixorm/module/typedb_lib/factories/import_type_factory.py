@@ -22,6 +22,17 @@ class ImportType(BaseModel):
     ATTACK_Domains: List[AttackDomains]
     RULES: bool
 
+    def get_key(self) -> tuple:
+        """ a hashable key that identifies the import type, equal for import types with equal fields"""
+        return (self.STIX21,
+                self.OS_THREAT,
+                self.OCA,
+                self.MBC,
+                self.ATTACK_FLOW,
+                self.ATTACK,
+                tuple(version.value for version in self.ATTACK_Versions),
+                tuple(domain.value for domain in self.ATTACK_Domains),
+                self.RULES)
 
 
 class ImportTypeFactory:
@@ -0,0 +1,120 @@
+import itertools
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from stixorm.module.typedb_lib.connection import get_connection
+from stixorm.module.typedb_lib.queries import get_read_transaction, get_write_transaction
+
+logger = logging.getLogger(__name__)
+
+ORPHAN_ATTRIBUTES_QUERY = 'match $a isa attribute; not { $b isa thing; $b has $a; }; get $a;'
+
+
+def build_orphan_cleanup_queries(iids: Iterable[str], batch_size: int = 500) -> List[str]:
+    """ build the queries that delete those of a set of attributes that no longer have an owner
+
+    Args:
+        iids (): the attribute iids
+        batch_size (): the number of attributes in each query
+
+    Returns:
+        queries: the TypeQL delete queries
+    """
+    queries = []
+    iids = iter(iids)
+    batch = list(itertools.islice(iids, batch_size))
+    while len(batch) > 0:
+        if len(batch) == 1:
+            match = ' $a iid ' + batch[0] + ';\n'
+        else:
+            match = ' ' + ' or '.join('{$a iid ' + iid + ';}' for iid in batch) + ';\n'
+        queries.append('match $a isa attribute;\n' + match +
+                       'not { $b isa thing; $b has $a; };\ndelete $a isa attribute;')
+        batch = list(itertools.islice(iids, batch_size))
+    return queries
+
+
+def delete_orphan_attributes(uri: str, port: str, database: str, batch_size: int = 10000) -> int:
+    """ Sweep the whole database for attributes without an owner, and delete them a batch at a time
+
+    A delete only removes the attributes its own objects leave without an owner, so attributes orphaned any
+    other way are collected here. Each batch is read and deleted in its own transactions, so a sweep never
+    holds one large write transaction open.
+
+    Args:
+        uri (): the TypeDB uri
+        port (): the TypeDB port
+        database (): the database name
+        batch_size (): the maximum number of attributes deleted in one write transaction
+
+    Returns:
+        deleted: the number of attributes deleted
+    """
+    deleted = 0
+    with get_connection(uri, port).data_session(database) as session:
+        while True:
+            with get_read_transaction(session) as transaction:
+                query = ORPHAN_ATTRIBUTES_QUERY + ' limit ' + str(batch_size) + ';'
+                iids = [answer.get("a").get_iid() for answer in transaction.query.get(query)]
+            if len(iids) == 0:
+                break
+            with get_write_transaction(session) as transaction:
+                for query_future in [transaction.query.delete(query) for query in build_orphan_cleanup_queries(iids)]:
+                    query_future.resolve()
+                transaction.commit()
+            deleted += len(iids)
+            logger.info('deleted %s orphan attributes from %s', len(iids), database)
+    return deleted
+
+
+class OrphanAttributeCollector:
+    """Sweeps a database for orphan attributes on a background thread, at a fixed interval
+
+    Args:
+        connection (): the TypeDB connection dict, with its uri, port and database
+        interval (): the number of seconds between the end of one sweep and the start of the next
+        batch_size (): the maximum number of attributes deleted in one write transaction
+    """
+    def __init__(self, connection: Dict[str, str], interval: float = 3600.0, batch_size: int = 10000):
+        self.uri = connection["uri"]
+        self.port = connection["port"]
+        self.database = connection["database"]
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        """Run one sweep now
+
+        Returns:
+            deleted: the number of attributes deleted
+        """
+        return delete_orphan_attributes(self.uri, self.port, self.database, self.batch_size)
+
+    def start(self):
+        """Start sweeping on a daemon thread, the first sweep runs after one interval"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self.__run, name="orphan-attribute-collector", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop sweeping, waiting for a sweep in progress to finish
+
+        Args:
+            timeout (): the maximum number of seconds to wait, default None waits until it finishes
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.exception(e)
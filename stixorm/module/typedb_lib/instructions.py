@@ -25,6 +25,8 @@ class ResultStatus(str, Enum):
     CYCLICAL_DEPENDENCY = "cyclical_dependency"
     MISSING_DEPENDENCY = "missing_Dependency"
     VALID_FOR_DB_COMMIT = "valid_for_db_commit"
+    REFERENCED = "referenced"
+    NOT_IN_DB = "not_in_db"
 
 class Result(BaseModel):
     id: str
@@ -40,16 +42,17 @@ class Instructions:
         self.dependencies: Optional[DiGraph] = None
         self.verified_missing_dependencies = []
         self.order = []
+        self.generations = []
         self.cyclical_references = {}
 
 
     def convert_to_result(self):
         results = []
-        message = None
-        error = None
-        status = ResultStatus.UNKNOWN
         instruction: Instruction
         for instruction in self.instructions.values():
+            message = None
+            error = None
+            status = ResultStatus.UNKNOWN
             if instruction.status in [Status.SUCCESS]:
                 status = ResultStatus.SUCCESS
             elif instruction.status == Status.EXCLUDE_EXISTS_IN_DATABASE:
@@ -62,6 +65,11 @@ class Instructions:
             elif instruction.status == Status.FAILED_MISSING_DEPENDENCY:
                 status = ResultStatus.MISSING_DEPENDENCY
                 message = "Missing values " + str(instruction.missing)
+            elif instruction.status == Status.FAILED_REFERENCED:
+                status = ResultStatus.REFERENCED
+                message = "Referenced by " + str(instruction.missing)
+            elif instruction.status == Status.EXCLUDE_NOT_IN_DATABASE:
+                status = ResultStatus.NOT_IN_DB
             elif instruction.status in [Status.CREATED_QUERY, Status.CREATED]:
                 status = ResultStatus.VALID_FOR_DB_COMMIT
 
@@ -114,6 +122,44 @@ class Instructions:
                 self.order.append(id)
 
 
+    def add_insertion_generations(self,
+                                  generations):
+        included_ids_in_order = self.instructions.keys()
+        # each generation only depends on the generations before it
+        for generation in generations:
+            included = [id for id in generation if id in included_ids_in_order]
+            if len(included) > 0:
+                self.generations.append(included)
+
+    def get_generations(self):
+        if len(self.generations) == 0:
+            return [list(self.get_ordered_ids())]
+
+        return self.generations
+
+    def get_insertable_ids(self,
+                           ids):
+        return [id for id in ids if not self.not_allow_insertion(id)]
+
+    def get_successful_ids(self):
+        return [id for id, instruction in self.instructions.items() if instruction.status == Status.SUCCESS]
+
+    def get_failed_dependency_ids(self):
+        dependency_ids = []
+        for instruction in self.instructions.values():
+            typeql_obj = getattr(instruction, "typeql_obj", None)
+            if instruction.status == Status.ERROR and typeql_obj is not None:
+                dependency_ids.extend(typeql_obj.dep_list)
+        return dependency_ids
+
+    def update_first_insertable_as_error(self,
+                                         ids: List[str],
+                                         error: str):
+        for id in ids:
+            if not self.not_allow_insertion(id):
+                self.update_instruction_as_error(id, error)
+                return
+
     def missing_dependency_ids(self):
         missing = []
 
@@ -198,6 +244,10 @@ class Instructions:
                          id: str):
         return self.instructions[id].query
 
+    def get_queries_for_id(self,
+                           id: str) -> List[str]:
+        return self.instructions[id].queries
+
     def insert_add_instruction(self,
                                id: str,
                                typeql_obj: Optional[TypeQLObject]):
@@ -206,10 +256,12 @@ class Instructions:
     def insert_delete_instruction(self,
                                id: str,
                                layer: dict):
+        queries = layer['delete'] if isinstance(layer['delete'], list) else [layer['delete']]
         self.instructions[id] = DeleteInstruction(status=Status.CREATED_QUERY,
                                                 id=id,
                                                 layer=layer,
-                                                query=layer['delete'])
+                                                query='\n\n'.join(queries),
+                                                queries=queries)
 
     def insert_delete_instruction_error(self,
                                  id: str,
@@ -219,6 +271,19 @@ class Instructions:
         logging.exception("\n".join(traceback.format_exception(error)))
         self.instructions[id] = DeleteInstruction(status=Status.ERROR, id=id, error=str(error))
 
+    def insert_delete_instruction_referenced(self,
+                                             id: str,
+                                             layer: dict,
+                                             referrers: List[str]):
+        self.instructions[id] = DeleteInstruction(status=Status.FAILED_REFERENCED,
+                                                  id=id,
+                                                  layer=layer,
+                                                  missing=referrers)
+
+    def insert_delete_instruction_not_found(self,
+                                            id: str):
+        self.instructions[id] = DeleteInstruction(status=Status.EXCLUDE_NOT_IN_DATABASE, id=id)
+
     def insert_instruction_error(self,
                                  id: str,
                                  error: Exception):
@@ -245,6 +310,8 @@ class Status(Enum):
     EXCLUDE_EXISTS_IN_DATABASE = 'exists_in_database'
     FAILED_MISSING_DEPENDENCY = 'missing_dependency'
     FAILED_CYCLICAL = 'cyclical'
+    FAILED_REFERENCED = 'referenced'
+    EXCLUDE_NOT_IN_DATABASE = 'not_in_database'
     CREATED= "created"
 
 
@@ -273,7 +340,7 @@ class AddInstruction(Instruction):
     typeql_obj: Optional[TypeQLObject]
 
 class DeleteInstruction(Instruction):
-    pass
+    queries: List[str] = []
 
 class AddInstructions(BaseModel):
     order_instructions: List[AddInstruction]
@@ -0,0 +1,96 @@
+import functools
+import logging
+import threading
+from collections import OrderedDict
+from typing import Iterable, List
+
+logger = logging.getLogger(__name__)
+
+
+class KnownIds:
+    """A bounded, least recently used set of the stix-ids known to be in a database
+
+    It is seeded from successful inserts and from existence lookups, so that repeated loads of
+    the same feed only need to ask the database about ids they have never seen. Ids written or
+    removed by another process are not tracked, so deletes must go through discard() or clear().
+    An insert that depends on an id deleted elsewhere matches nothing and fails, and its
+    dependencies are then discarded, so they are looked up again on the next load.
+
+    Args:
+        max_size (): the maximum number of ids remembered, the least recently used are dropped first
+    """
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self._ids: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, stix_id: str):
+        return stix_id in self._ids
+
+    def unknown(self, stix_ids: Iterable[str]) -> List[str]:
+        """Split off the ids that are not known to be in the database
+
+        Args:
+            stix_ids (): the ids to check
+
+        Returns:
+            unknown: the ids that still need an existence lookup, in their original order
+        """
+        unknown = []
+        with self._lock:
+            for stix_id in stix_ids:
+                if stix_id in self._ids:
+                    self._ids.move_to_end(stix_id)
+                else:
+                    unknown.append(stix_id)
+        return unknown
+
+    def add(self, stix_ids: Iterable[str]):
+        """Remember ids that are in the database
+
+        Args:
+            stix_ids (): the ids found in, or committed to, the database
+        """
+        with self._lock:
+            for stix_id in stix_ids:
+                self._ids[stix_id] = None
+                self._ids.move_to_end(stix_id)
+            while len(self._ids) > self.max_size:
+                self._ids.popitem(last=False)
+
+    def discard(self, stix_ids: Iterable[str]):
+        """Forget ids that have been deleted from the database
+
+        Args:
+            stix_ids (): the deleted ids
+        """
+        with self._lock:
+            for stix_id in stix_ids:
+                self._ids.pop(stix_id, None)
+
+    def clear(self):
+        """Forget every id, for example when the database is deleted"""
+        with self._lock:
+            self._ids.clear()
+
+
+def get_known_ids(uri: str, port: str, database: str) -> KnownIds:
+    """Get the process wide known id set for a database
+
+    Args:
+        uri (): the TypeDB uri
+        port (): the TypeDB port, as a str or an int
+        database (): the database name
+
+    Returns:
+        known_ids: the shared KnownIds
+    """
+    return _get_known_ids(uri, str(port), database)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_known_ids(uri: str, port: str, database: str) -> KnownIds:
+    return KnownIds()
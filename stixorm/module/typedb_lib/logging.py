@@ -5,6 +5,34 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def log_banner(log: logging.Logger, level: int, title: str):
+    if log.isEnabledFor(level):
+        log.log(level, '\n%s\n%s\n%s', '-' * 120, ('-' * 40 + ' ' + title + ' ').ljust(120, '-'), '-' * 120)
+
+
+def log_concept_map(log: logging.Logger, level: int, title: str, number: int, concept_map):
+    """ Log the concepts of one query answer, the answer is only read if the level is enabled
+
+    Args:
+        log (): the logger of the calling module
+        level (): the logging level
+        title (): the title of the answer
+        number (): the position of the answer in its query
+        concept_map (): the ConceptMap answer
+    """
+    if not log.isEnabledFor(level):
+        return
+    log.log(level, '%s %s', title, number)
+    for concept in concept_map.concepts():
+        if concept.is_type():
+            log.log(level, '   Type: %s', concept.as_type().get_label())
+        if concept.is_relation():
+            log.log(level, '   Relation: iid %s', concept.as_relation().get_iid())
+        if concept.is_attribute():
+            log.log(level, '   Attribute iid: %s', concept.as_attribute().get_iid())
+            log.log(level, '           value: %s', concept.as_attribute().get_value())
+
+
 def log_delete_layers(result):
     try:
         if result is None:
@@ -76,9 +104,9 @@ def log_delete_instruction(dep_match,
                            del_tql):
     try:
         logger.debug(' ---------------------------Delete Object----------------------')
-        logger.debug(f'dep_match -> {dep_match}\n dep_insert -> {dep_insert}')
-        logger.debug(f'indep_ql -> {indep_ql}\n dep_obj -> {dep_obj}')
+        logger.debug('dep_match -> %s\n dep_insert -> %s', dep_match, dep_insert)
+        logger.debug('indep_ql -> %s\n dep_obj -> %s', indep_ql, dep_obj)
         logger.debug("=========================== delete typeql below ====================================")
-        logger.debug(f'del_match -> {del_match}\n del_tql -> {del_tql}')
+        logger.debug('del_match -> %s\n del_tql -> %s', del_match, del_tql)
     except Exception as e:
         logger.error(e)
@@ -0,0 +1,187 @@
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ObjectCacheStats:
+    """ A snapshot of an ObjectCache's metrics
+
+    Attributes:
+        hits: the number of lookups answered by the cache
+        misses: the number of lookups that went to the database
+        evictions: the number of objects dropped to stay within the bounds
+        invalidations: the number of objects dropped because they were written or deleted
+        entries: the number of objects held
+        size_bytes: the approximate size of the objects held
+    """
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    entries: int
+    size_bytes: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+class ObjectCache:
+    """A bounded, least recently used cache of parsed STIX objects, keyed by stix-id
+
+    A TypeDBSource given a cache answers repeated gets from it. Each cache is attached to the
+    databases its sources read, and every TypeDBSink add or delete on such a database drops the
+    ids it touches, so a cached object is never served once it has been written or deleted.
+
+    Args:
+        max_entries (): the maximum number of objects held, the least recently used are dropped first
+        max_bytes (): the maximum approximate size of the objects held, measured as their serialised length
+    """
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._objects: OrderedDict = OrderedDict()
+        self._size_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __contains__(self, stix_id: str):
+        return stix_id in self._objects
+
+    def get(self, stix_id: str):
+        """Get a cached object, counting the hit or miss
+
+        Args:
+            stix_id (): the stix-id of the object
+
+        Returns:
+            stix_obj: the cached object, or None if it is not cached
+        """
+        with self._lock:
+            entry = self._objects.get(stix_id)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._objects.move_to_end(stix_id)
+            self._hits += 1
+            return entry[0]
+
+    def version(self) -> int:
+        """The number of invalidations so far, taken before reading an object from the database
+
+        Returns:
+            version: the version to hand to put()
+        """
+        return self._invalidations
+
+    def put(self, stix_id: str, stix_obj, version: int):
+        """Cache an object read from the database
+
+        Args:
+            stix_id (): the stix-id of the object
+            stix_obj (): the parsed STIX object
+            version (): the version() taken before the object was read, if anything has been
+                invalidated since then the object may be stale and it is not cached
+        """
+        size = len(stix_obj.serialize())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if version != self._invalidations:
+                return
+            self.__remove(stix_id)
+            self._objects[stix_id] = (stix_obj, size)
+            self._size_bytes += size
+            while len(self._objects) > self.max_entries or self._size_bytes > self.max_bytes:
+                oldest = next(iter(self._objects))
+                self.__remove(oldest)
+                self._evictions += 1
+
+    def discard(self, stix_ids: Iterable[str]):
+        """Drop objects that have been written or deleted
+
+        Args:
+            stix_ids (): the stix-ids of the objects
+        """
+        with self._lock:
+            for stix_id in stix_ids:
+                self.__remove(stix_id)
+                self._invalidations += 1
+
+    def clear(self):
+        """Drop every object, for example when the database is deleted"""
+        with self._lock:
+            self._objects.clear()
+            self._size_bytes = 0
+            self._invalidations += 1
+
+    def stats(self) -> ObjectCacheStats:
+        """Get the metrics of the cache
+
+        Returns:
+            stats: the ObjectCacheStats
+        """
+        with self._lock:
+            return ObjectCacheStats(hits=self._hits,
+                                    misses=self._misses,
+                                    evictions=self._evictions,
+                                    invalidations=self._invalidations,
+                                    entries=len(self._objects),
+                                    size_bytes=self._size_bytes)
+
+    def __remove(self, stix_id: str):
+        entry = self._objects.pop(stix_id, None)
+        if entry is not None:
+            self._size_bytes -= entry[1]
+
+
+# the caches attached to each database, held weakly so a cache goes when its sources do
+_caches: Dict[Tuple[str, str, str], "weakref.WeakSet[ObjectCache]"] = {}
+_caches_lock = threading.Lock()
+
+
+def attach_object_cache(uri: str, port: str, database: str, cache: ObjectCache):
+    """Attach a cache to a database, so that writes to the database invalidate it
+
+    Args:
+        uri (): the TypeDB uri
+        port (): the TypeDB port
+        database (): the database name
+        cache (): the ObjectCache
+    """
+    with _caches_lock:
+        _caches.setdefault((uri, str(port), database), weakref.WeakSet()).add(cache)
+
+
+def invalidate_objects(uri: str, port: str, database: str, stix_ids: Optional[Iterable[str]] = None):
+    """Drop objects from every cache attached to a database
+
+    Args:
+        uri (): the TypeDB uri
+        port (): the TypeDB port
+        database (): the database name
+        stix_ids (): the stix-ids written or deleted, default None drops every object
+    """
+    with _caches_lock:
+        caches = list(_caches.get((uri, str(port), database), ()))
+    if len(caches) == 0:
+        return
+    stix_ids = None if stix_ids is None else list(stix_ids)
+    for cache in caches:
+        if stix_ids is None:
+            cache.clear()
+        else:
+            cache.discard(stix_ids)
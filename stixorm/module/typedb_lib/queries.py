@@ -1,6 +1,9 @@
+import itertools
 import logging
+import time
 import traceback
-from typing import List, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Iterator, Optional, Tuple
 from typedb.api.answer.concept_map import ConceptMap
 from typedb.api.connection.driver import TypeDBDriver
 from typedb.api.connection.session import SessionType, TypeDBSession
@@ -11,8 +14,11 @@ from typedb.driver import TypeDB
 #from typedb.stream.bidirectional_stream import BidirectionalStream
 from typedb.common.promise import Promise
 from typedb.driver import TypeDB
-from stixorm.module.typedb_lib.logging import log_delete_layer, log_add_layer
+from stixorm.module.typedb_lib.logging import log_add_layer, log_banner, log_concept_map
 from stixorm.module.typedb_lib.instructions import Instructions
+from stixorm.module.typedb_lib.connection import get_connection
+from stixorm.module.typedb_lib.known_ids import get_known_ids
+from stixorm.module.typedb_lib.object_cache import invalidate_objects
 
 logger = logging.getLogger(__name__)
 
@@ -30,8 +36,8 @@ def build_insert_query(layer):
         insert_tql = ''
     else:
         insert_tql = 'insert ' + indep_ql + dep_insert
-    logger.debug(f'\n match_tql string?-> {match_tql}')
-    logger.debug(f'\n insert_tql string?-> {insert_tql}')
+    logger.debug('\n match_tql string?-> %s', match_tql)
+    logger.debug('\n insert_tql string?-> %s', insert_tql)
     typeql_string = match_tql + insert_tql
 
     insertion_is_empty = len(insert_tql) == 0
@@ -76,24 +82,141 @@ def get_write_transaction(session: TypeDBSession):
 def match_query(uri: str, port: str, database: str, query: str, data_query, **data_query_args):
     data = []
     try:
-        with get_core_client(uri, port) as client:
-            client_session = get_data_session(client, database)
-            with client_session as session:
-                read_transaction = get_read_transaction(session)
-                with read_transaction as transaction:
-                    answer_iterator = transaction.query.get(query)
-                    data = data_query(query, answer_iterator, transaction, **data_query_args)
-                    return data
+        with get_connection(uri, port).data_session(database) as session:
+            read_transaction = get_read_transaction(session)
+            with read_transaction as transaction:
+                answer_iterator = transaction.query.get(query)
+                data = data_query(query, answer_iterator, transaction, **data_query_args)
+                return data
     except Exception as e:
         logger.exception(e)
         raise Exception("Problem matching")
 
+
+def match_queries(uri: str, port: str, database: str, queries: Iterable[Tuple[str, str]], data_query,
+                  batch_size: int = 50, **data_query_args) -> Iterator[Tuple[str, object]]:
+    """ Run many match queries in one read transaction, yielding each result as soon as it is converted.
+        The queries of a batch are all sent before any answer is read, so they run pipelined.
+
+    Args:
+        uri (): the TypeDB uri
+        port (): the TypeDB port
+        database (): the database name
+        queries (): (key, query) pairs, the key is handed back with the result, they are read lazily
+        data_query (): the function converting a query's answers, as in match_query
+        batch_size (): the maximum number of queries in flight at once
+        **data_query_args (): passed on to data_query
+
+    Returns:
+        results: an iterator of (key, data) pairs, in the order of the queries
+    """
+    queries = iter(queries)
+    batch = list(itertools.islice(queries, batch_size))
+    if len(batch) == 0:
+        return
+    try:
+        with get_connection(uri, port).data_session(database) as session:
+            with get_read_transaction(session) as transaction:
+                while len(batch) > 0:
+                    answers = [(key, query, transaction.query.get(query)) for key, query in batch]
+                    for key, query, answer_iterator in answers:
+                        yield key, data_query(query, answer_iterator, transaction, **data_query_args)
+                    batch = list(itertools.islice(queries, batch_size))
+    except Exception as e:
+        logger.exception(e)
+        raise Exception("Problem matching")
+
+
+def stream_ids(uri: str, port: str, database: str, query: str) -> Iterator[str]:
+    """ Stream the stix-ids answered by a get query, without holding them all in memory
+
+    Args:
+        uri (): the TypeDB uri
+        port (): the TypeDB port
+        database (): the database name
+        query (): a get query binding the stix-id attribute to $id
+
+    Returns:
+        stix_ids: an iterator of the stix-id values, read as the answers arrive
+    """
+    logger.debug('stream ids query is %s', query)
+    try:
+        with get_connection(uri, port).data_session(database) as session:
+            with get_read_transaction(session) as transaction:
+                for answer in transaction.query.get(query):
+                    yield answer.get("id").get_value()
+    except Exception as e:
+        logger.exception(e)
+        raise Exception("Problem matching")
+
+
+def count_query(uri: str, port: str, database: str, query: str) -> int:
+    """ Run a count aggregate query
+
+    Args:
+        uri (): the TypeDB uri
+        port (): the TypeDB port
+        database (): the database name
+        query (): a get query ending in count
+
+    Returns:
+        count: the number of answers, counted by the server
+    """
+    logger.debug('count query is %s', query)
+    try:
+        with get_connection(uri, port).data_session(database) as session:
+            with get_read_transaction(session) as transaction:
+                value = transaction.query.get_aggregate(query).resolve()
+                return 0 if value is None else value.as_long()
+    except Exception as e:
+        logger.exception(e)
+        raise Exception("Problem matching")
+
+
+def query_existing_ids(uri: str, port: str, database: str, stix_ids: List[str], batch_size: int = 500) -> List[str]:
+    """ Find which stix-ids are in the database, with one small query per id rather than an or-chain.
+        All the queries of a batch are sent before any answer is read, so they run pipelined in one
+        read transaction.
+
+    Args:
+        uri (): the TypeDB uri
+        port (): the TypeDB port
+        database (): the database name
+        stix_ids (): the ids to look up
+        batch_size (): the maximum number of queries in flight in one transaction
+
+    Returns:
+        existing: the ids that were found, in their original order
+    """
+    existing = []
+    if len(stix_ids) == 0:
+        return existing
+    try:
+        with get_connection(uri, port).data_session(database) as session:
+            for position in range(0, len(stix_ids), batch_size):
+                batch = stix_ids[position:position + batch_size]
+                with get_read_transaction(session) as transaction:
+                    answers = [(stix_id, transaction.query.get(build_match_id_query([stix_id])))
+                               for stix_id in batch]
+                    for stix_id, answer in answers:
+                        if next(iter(answer), None) is not None:
+                            existing.append(stix_id)
+    except Exception as e:
+        logger.exception(e)
+        raise Exception("Problem matching")
+    return existing
+
+
 def get_all_databases(uri: str, port: str):
-    client = get_core_client(uri, port)
+    client = get_connection(uri, port).driver
     return client.databases.all()
 
 def delete_database(uri: str, port: str, database: str):
-    client = get_core_client(uri, port)
+    connection = get_connection(uri, port)
+    connection.close_sessions(database)
+    get_known_ids(uri, port, database).clear()
+    invalidate_objects(uri, port, database)
+    client = connection.driver
     if client.databases.contains(database):
        logger.info('Database ' + database + ' exists... deleting')
        client.databases.get(database).delete()
@@ -102,155 +225,307 @@ def delete_database(uri: str, port: str, database: str):
 
 
 def query_ids(query, generator, transaction, **data_query_args):
-    logger.info(
-        '\n\n-------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------\n' + \
-        '---------------------------------------------------------------------------------------- Query ids ------------------------------------------------------------------------------\n' + \
-        '-------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------\n')
-
+    log_banner(logger, logging.INFO, "Query ids")
     logger.info(query)
 
-    number = 0
     ids = []
     for result in generator:
         ids.append(result.get("ids"))
-        logger.info(
-            '\nxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\n' + \
-            'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx    Query IDs Concept Map ' + str(
-                number) + 'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\n' + \
-            'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\n')
-        for concept in enumerate(result.concepts()):
-            if concept[1].is_type():
-                logger.info('   Type:' + concept[1].as_type().get_label())
-            if concept[1].is_relation():
-                logger.info('   Relation: iid ' + concept[1].as_relation().get_iid())
-            if concept[1].is_attribute():
-                logger.info('   Attribute iid: ' + concept[1].as_attribute().get_iid())
-                logger.info('           value: ' + str(concept[1].as_attribute().get_value()))
-        number = number + 1
-
-    logger.info('\n')
+        log_concept_map(logger, logging.INFO, "Query IDs Concept Map", len(ids) - 1, result)
 
     return ids
 
 def query_id(query, generator, transaction, **data_query_args):
-    logger.info(
-        '\n\n-------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------\n' + \
-        '---------------------------------------------------------------------------------------- Query ids ------------------------------------------------------------------------------\n' + \
-        '-------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------\n')
-
+    log_banner(logger, logging.INFO, "Query ids")
     logger.info(query)
 
-    number = 0
     ids = []
     for result in generator:
         ids.append(result.get("id").get_value())
-        logger.info(
-            '\nxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\n' + \
-            'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx    Query ID Concept Map ' + str(
-                number) + 'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\n' + \
-            'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\n')
-        for concept in enumerate(result.concepts()):
-            if concept[1].is_type():
-                logger.info('   Type:' + concept[1].as_type().get_label())
-            if concept[1].is_relation():
-                logger.info('   Relation: iid ' + concept[1].as_relation().get_iid())
-            if concept[1].is_attribute():
-                logger.info('   Attribute iid: ' + concept[1].as_attribute().get_iid())
-                logger.info('           value: ' + str(concept[1].as_attribute().get_value()))
-        number = number + 1
-
-    logger.info('\n')
+        log_concept_map(logger, logging.INFO, "Query ID Concept Map", len(ids) - 1, result)
 
     return ids
 
 
-def delete_layers(uri: str, port: str, database: str, instructions: Instructions):
-    with get_core_client(uri, port) as client:
-        client_session = get_data_session(client, database)
-        with client_session as session:
-            for instruction_id in instructions.get_ordered_ids():
-                write_transaction = get_write_transaction(session)
-                with write_transaction as transaction:
-                    query = instructions.get_query_for_id(instruction_id)
-                    result = delete_layer(transaction, query)
-                    log_delete_layer(result, query)
-                    instructions.update_delete_instruction_as_success(instruction_id)
+def delete_layers(uri: str,
+                  port: str,
+                  database: str,
+                  instructions: Instructions,
+                  batch_size: int = 1,
+                  batch_queries: Optional[Callable[[List[str]], List[str]]] = None) -> Instructions:
+    """ Run the delete instructions in order, committing up to batch_size of them together in one write transaction
+
+    Args:
+        uri (): the TypeDB uri
+        port (): the TypeDB port
+        database (): the database name
+        instructions (): the ordered delete instructions, only those with created queries are run
+        batch_size (): the maximum number of instructions committed in one transaction
+        batch_queries (): if set, builds the queries of a batch from its instruction ids, default None runs
+            the queries of each instruction in turn
+
+    Returns:
+        instructions: the instructions, each marked as a success once its transaction has committed,
+            or as an error if it failed on its own
+    """
+    instruction_ids = [instruction_id for instruction_id in instructions.get_ordered_ids()
+                       if not instructions.not_allow_insertion(instruction_id)]
+    with get_connection(uri, port).data_session(database) as session:
+        for position in range(0, len(instruction_ids), max(batch_size, 1)):
+            batch = instruction_ids[position:position + max(batch_size, 1)]
+            delete_instruction_batch(session, instructions, batch, batch_queries)
     return instructions
 
 
+def delete_instruction_batch(session: TypeDBSession,
+                             instructions: Instructions,
+                             batch: List[str],
+                             batch_queries: Optional[Callable[[List[str]], List[str]]] = None) -> bool:
+    """ Delete a batch of instructions in one write transaction, and commit them together.
+        If the batch fails it is split in half and each half is retried, so a failing instruction is isolated
+        in log(n) retries, and every other instruction still gets deleted
 
-def delete_layer(transaction: TypeDBTransaction, query: str):
-    transaction_query: QueryManager = transaction.query
-    query_future: Promise = transaction_query.delete(query)
-    bi_d = query_future.resolve()
-    logger.info(
-        '\n\n-------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------\n' + \
-        '---------------------------------------------------------------------------------------- Delete Layer Query ------------------------------------------------------------------------------\n' + \
-        '-------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------\n')
+    Args:
+        session (): the data session to use
+        instructions (): the instructions holding the queries
+        batch (): the ordered instruction ids to delete
+        batch_queries (): if set, builds the queries of a batch from its instruction ids
 
-    logger.info(query)
+    Returns:
+        success: True if every instruction in the batch was committed
+    """
+    try:
+        if batch_queries is None:
+            queries = [query for instruction_id in batch for query in instructions.get_queries_for_id(instruction_id)]
+        else:
+            queries = batch_queries(batch)
+        with get_write_transaction(session) as transaction:
+            delete_layer(transaction, queries)
+        logger.debug('Deleted %s instructions with %s queries', len(batch), len(queries))
+    except Exception as e:
+        if len(batch) == 1:
+            logger.exception(e)
+            instructions.update_delete_instruction_as_error(batch[0], traceback.format_exc())
+            return False
+        logger.warning('Batch of %s delete instructions failed, splitting it in two', len(batch))
+        logger.debug(e)
+        middle = len(batch) // 2
+        first = delete_instruction_batch(session, instructions, batch[:middle], batch_queries)
+        second = delete_instruction_batch(session, instructions, batch[middle:], batch_queries)
+        return first and second
+
+    for instruction_id in batch:
+        instructions.update_delete_instruction_as_success(instruction_id)
+    return True
+
+
+def delete_layer(transaction: TypeDBTransaction, queries: List[str]):
+    """ Run delete queries in order in a write transaction and commit it, all the queries are sent before any is resolved
+
+    Args:
+        transaction (): the write transaction
+        queries (): the TypeQL delete queries
+    """
+    transaction_query: QueryManager = transaction.query
+    query_futures: List[Promise] = [transaction_query.delete(query) for query in queries]
+    log_banner(logger, logging.INFO, "Delete Layer Query")
+    for query, query_future in zip(queries, query_futures):
+        bi_d = query_future.resolve()
+        logger.info(query)
+        logger.info('Delete Result %s', bi_d)
 
-    logger.info(
-        '\nxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\n' + \
-        'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx    Delete Result ' + 'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\n' + \
-        'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\n')
+    transaction.commit()
 
-    logger.info(str(bi_d))
 
+def add_layer(transaction: TypeDBTransaction, layer: str):
+    insert_layer(transaction, layer)
     transaction.commit()
 
 
-def add_layer(transaction: TypeDBTransaction, layer: str):
+def insert_layer(transaction: TypeDBTransaction, layer: str):
     transaction_query: QueryManager = transaction.query
     query_future: Iterator[ConceptMap] = transaction_query.insert(layer)
 
-    logger.debug('\n\n-------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------\n')
-    logger.info('\n------------------------------------------------ Add Layer Query ----------------------------------------------\n')
-    logger.debug('-------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------\n')
-
+    log_banner(logger, logging.INFO, "Add Layer Query")
     logger.info(layer)
 
+    # the answers are drained so any insert error is raised here, their concepts are only read when debug is on
     number = 0
-    logger.info('\nxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx    Add Layer Response     xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\n')
-    logger.info(f'insert_iterator response ->\n{query_future}')
     for result in query_future:
-        logger.debug('\nxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\n' )
-        logger.debug('\nxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx    Add Layer Concept Map ' + str(number) +      'xxxxxxxxxxxxxxxxxxxxxx\n')
-        logger.debug('\nxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\n')
-
-        logger.debug(f'typedb response ->\n{result}')
-
-        for concept in enumerate(result.concepts()):
-            if concept[1].is_type():
-                logger.debug('   Type:' + concept[1].as_type().get_label())
-            if concept[1].is_relation():
-                logger.debug('   Relation: iid ' + concept[1].as_relation().get_iid() )
-            if concept[1].is_attribute():
-                logger.debug('   Attribute iid: ' + concept[1].as_attribute().get_iid())
-                logger.debug('           value: ' + str(concept[1].as_attribute().get_value()))
+        log_concept_map(logger, logging.DEBUG, "Add Layer Concept Map", number, result)
         number = number + 1
+    logger.debug('Add Layer Response, %s concept maps', number)
+    if number == 0:
+        # a match-insert whose match found nothing inserts nothing, so a dependency is no longer in the database
+        raise Exception("Insert matched nothing, a dependency is missing from the database")
 
-    logger.info('\n\n')
 
-    transaction.commit()
+def add_instruction(session: TypeDBSession, instructions: Instructions, instruction_id: str) -> bool:
+    """ Insert and commit a single instruction in its own write transaction
 
+    Args:
+        session (): the data session to use
+        instructions (): the instructions holding the query
+        instruction_id (): the stix-id of the instruction to insert
 
-def add_instructions_to_typedb(uri: str, port: str, database: str, instructions: Instructions):
+    Returns:
+        success: True if the instruction was committed, else the instruction is marked as an error
+    """
+    try:
+        with get_write_transaction(session) as transaction:
+            add_layer(transaction, instructions.get_query_for_id(instruction_id))
+        instructions.update_instruction_as_success(instruction_id)
+        return True
+    except Exception as e:
+        logger.exception(e)
+        instructions.update_instruction_as_error(instruction_id, traceback.format_exc())
+        return False
+
+
+def add_instruction_batch(session: TypeDBSession,
+                          instructions: Instructions,
+                          batch: List[str],
+                          commit_interval: Optional[float] = None) -> Optional[int]:
+    """ Insert a batch of consecutive instructions in one write transaction, and commit them together.
+        If the batch fails, it is replayed one instruction per commit, so each stix-id gets an accurate status
+
+    Args:
+        session (): the data session to use
+        instructions (): the instructions holding the queries
+        batch (): the ordered instruction ids to insert
+        commit_interval (): if set, the number of seconds after which the open transaction is committed,
+            even if the batch is not complete
+
+    Returns:
+        committed: the number of instructions from the start of the batch that were committed,
+            or None if an instruction failed, in which case insertion must stop
+    """
+    if len(batch) == 1:
+        return 1 if add_instruction(session, instructions, batch[0]) else None
+
+    attempted = []
     try:
-        with get_core_client(uri, port) as client:
-            client_session = get_data_session(client, database)
-            with client_session as session:
-                for instruction_id in instructions.get_ordered_ids():
-                    if instructions.not_allow_insertion(instruction_id):
-                        continue
-                    write_transaction = get_write_transaction(session)
-                    with write_transaction as transaction:
-                        query = instructions.get_query_for_id(instruction_id)
-                        add_layer(transaction, query)
-                        instructions.update_instruction_as_success(instruction_id)
+        with get_write_transaction(session) as transaction:
+            started = time.monotonic()
+            for instruction_id in batch:
+                attempted.append(instruction_id)
+                insert_layer(transaction, instructions.get_query_for_id(instruction_id))
+                if commit_interval is not None and time.monotonic() - started >= commit_interval:
+                    break
+            transaction.commit()
     except Exception as e:
-        traceback_str = traceback.format_exc()
-        instructions.update_instruction_as_error(instruction_id, traceback_str)
+        logger.warning('Batch of %s instructions failed, falling back to one commit per instruction', len(attempted))
+        logger.debug(e)
+        for instruction_id in attempted:
+            if not add_instruction(session, instructions, instruction_id):
+                return None
+        return len(attempted)
+
+    for instruction_id in attempted:
+        instructions.update_instruction_as_success(instruction_id)
+    return len(attempted)
+
+
+def add_instruction_ids(session: TypeDBSession,
+                        instructions: Instructions,
+                        instruction_ids: List[str],
+                        batch_size: int = 1,
+                        commit_interval: Optional[float] = None) -> bool:
+    """ Insert a list of ordered instructions through one session, in batches of up to batch_size instructions
+
+    Args:
+        session (): the data session to use
+        instructions (): the instructions holding the queries
+        instruction_ids (): the ordered instruction ids to insert
+        batch_size (): the maximum number of instructions committed in one transaction
+        commit_interval (): if set, the maximum number of seconds a batch transaction is held open before committing
+
+    Returns:
+        success: False if an instruction failed and insertion stopped, else True
+    """
+    position = 0
+    while position < len(instruction_ids):
+        batch = instruction_ids[position:position + max(batch_size, 1)]
+        committed = add_instruction_batch(session, instructions, batch, commit_interval)
+        if committed is None:
+            return False
+        position += committed
+    return True
+
+
+def add_instructions_to_typedb(uri: str,
+                               port: str,
+                               database: str,
+                               instructions: Instructions,
+                               batch_size: int = 1,
+                               commit_interval: Optional[float] = None):
+    """ Insert the instructions into TypeDB, in the order given by instructions.get_ordered_ids().
+        Consecutive instructions are grouped into write transactions of up to batch_size instructions,
+        with batch_size = 1 committing each object on its own. Insertion stops at the first failure.
+
+    Args:
+        uri (): the TypeDB uri
+        port (): the TypeDB port
+        database (): the database name
+        instructions (): the instructions to insert
+        batch_size (): the maximum number of instructions committed in one transaction
+        commit_interval (): if set, the maximum number of seconds a batch transaction is held open before committing
+
+    Returns:
+        instructions: the instructions, with their status updated
+    """
+    instruction_ids = instructions.get_insertable_ids(instructions.get_ordered_ids())
+    try:
+        with get_connection(uri, port).data_session(database) as session:
+            add_instruction_ids(session, instructions, instruction_ids, batch_size, commit_interval)
+    except Exception as e:
+        logger.exception(e)
+        instructions.update_first_insertable_as_error(instruction_ids, traceback.format_exc())
     return instructions
 
 
+def add_instructions_to_typedb_by_generation(uri: str,
+                                             port: str,
+                                             database: str,
+                                             instructions: Instructions,
+                                             parallelism: int = 4,
+                                             batch_size: int = 1,
+                                             commit_interval: Optional[float] = None):
+    """ Insert the instructions into TypeDB one dependency generation at a time, from
+        instructions.get_generations(). Every object in a generation only depends on objects in earlier
+        generations, so the batches of a generation are inserted concurrently through pooled sessions.
+        A generation only starts once the previous one is committed, and insertion stops after any
+        generation that contains a failure.
+
+    Args:
+        uri (): the TypeDB uri
+        port (): the TypeDB port
+        database (): the database name
+        instructions (): the instructions to insert
+        parallelism (): the number of sessions inserting concurrently
+        batch_size (): the maximum number of instructions committed in one transaction
+        commit_interval (): if set, the maximum number of seconds a batch transaction is held open before committing
+
+    Returns:
+        instructions: the instructions, with their status updated
+    """
+    parallelism = max(parallelism, 1)
+    instruction_ids = instructions.get_insertable_ids(instructions.get_ordered_ids())
+    connection = get_connection(uri, port)
+    try:
+        def insert_batch(batch: List[str]) -> bool:
+            with connection.data_session(database) as session:
+                return add_instruction_ids(session, instructions, batch, len(batch), commit_interval)
+
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            for generation in instructions.get_generations():
+                generation_ids = instructions.get_insertable_ids(generation)
+                batches = [generation_ids[i:i + max(batch_size, 1)]
+                           for i in range(0, len(generation_ids), max(batch_size, 1))]
+                outcomes = list(executor.map(insert_batch, batches))
+                if not all(outcomes):
+                    break
+    except Exception as e:
+        logger.exception(e)
+        instructions.update_first_insertable_as_error(instruction_ids, traceback.format_exc())
+    return instructions
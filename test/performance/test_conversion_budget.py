@@ -0,0 +1,48 @@
+import json
+import pathlib
+import time
+
+import pytest
+
+from stixorm.module.authorise import import_type_factory
+from stixorm.module.orm.import_objects import raw_stix2_to_typeql
+from stixorm.module.parsing.parse_objects import parse
+
+CORPUS = pathlib.Path(__file__).parent.parent / "data" / "stix" / "examples"
+# mean seconds allowed to convert one parsed object into typeql
+BUDGET_PER_OBJECT = 0.002
+
+
+def load_corpus(import_type):
+    """ Parse every object in the fixed corpus, skipping any the stix2 library rejects"""
+    stix_objects = []
+    for path in sorted(CORPUS.rglob("*.json")):
+        with open(path, encoding="utf-8") as corpus_file:
+            data = json.load(corpus_file)
+        objects = data.get("objects", [data]) if isinstance(data, dict) else data
+        for stix_dict in objects:
+            try:
+                stix_objects.append(parse(stix_dict, False, import_type))
+            except Exception:
+                continue
+    return stix_objects
+
+
+@pytest.mark.performance
+def test_conversion_time_per_object_within_budget():
+    """ Fail if converting the fixed corpus into typeql takes longer per object than the budget"""
+    import_type = import_type_factory.get_all_imports()
+    stix_objects = load_corpus(import_type)
+    assert len(stix_objects) > 100
+
+    # warm the per-type caches before timing
+    for stix_object in stix_objects:
+        raw_stix2_to_typeql(stix_object, import_type)
+
+    start_time = time.perf_counter()
+    for stix_object in stix_objects:
+        raw_stix2_to_typeql(stix_object, import_type)
+    per_object = (time.perf_counter() - start_time) / len(stix_objects)
+
+    print(f"\nconverted {len(stix_objects)} objects, {per_object * 1e3:.3f} ms per object")
+    assert per_object < BUDGET_PER_OBJECT, f"conversion took {per_object * 1e3:.3f} ms per object"
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from stixorm.module.parsing.content.parse import get_class_registry_instance, \
+    determine_content_object_from_list_by_tests
+
+ROUNDS = 2000
+
+
+def make_sample(item):
+    """ Build a STIX dict that selects the given registry entry, carrying a large payload that must not be copied"""
+    stix_dict = {
+        "type": item.stix_type,
+        "id": item.stix_type + "--9b8b8e4f-6e0e-4cba-9a42-3c3b1f2b4c11",
+        "description": "x" * 4096,
+        "external_references": [{"source_name": "ref-" + str(i), "url": "https://example.com/" + str(i)}
+                                for i in range(200)],
+    }
+    if item.condition1 == "EXISTS":
+        stix_dict[item.field1] = "3.1.0"
+    elif item.condition1 == "STARTS_WITH":
+        stix_dict[item.value1 + "extension"] = True
+    elif item.condition1 == "EQUALS" and "." not in item.field1:
+        stix_dict[item.field1] = item.value1
+    return stix_dict
+
+
+@pytest.mark.performance
+def test_dispatch_cost_per_registry_type():
+    """ Report the per-object cost of selecting the class record for every entry in the class registry"""
+    registry = get_class_registry_instance()
+    timings = {}
+    for stix_type, content_list in registry.by_type.items():
+        for item in content_list:
+            stix_dict = make_sample(item)
+            selected = determine_content_object_from_list_by_tests(stix_dict, "class")
+            assert selected is not None
+            start_time = time.perf_counter()
+            for _ in range(ROUNDS):
+                determine_content_object_from_list_by_tests(stix_dict, "class")
+            timings[(stix_type, item.typeql)] = (time.perf_counter() - start_time) / ROUNDS
+
+    print("\nclass dispatch cost per object")
+    for (stix_type, typeql), seconds in sorted(timings.items(), key=lambda entry: -entry[1]):
+        print(f"  {stix_type:32} {typeql:32} {seconds * 1e6:8.2f} us")
+
+    # Selection reads the dict in place, so even large objects dispatch in well under a millisecond
+    assert max(timings.values()) < 0.001
@@ -0,0 +1,68 @@
+import io
+import json
+import logging
+import pathlib
+import time
+
+import pytest
+
+from stixorm.module.authorise import import_type_factory
+from stixorm.module.orm.import_objects import raw_stix2_to_typeql
+from stixorm.module.parsing.parse_objects import parse
+
+CORPUS = pathlib.Path(__file__).parent.parent / "data" / "stix" / "examples"
+LOGGER_NAMES = ["stixorm"]
+
+
+def load_corpus():
+    """ Load every object dict in the fixed corpus"""
+    stix_dicts = []
+    for path in sorted(CORPUS.rglob("*.json")):
+        with open(path, encoding="utf-8") as corpus_file:
+            data = json.load(corpus_file)
+        stix_dicts.extend(data.get("objects", [data]) if isinstance(data, dict) else data)
+    return stix_dicts
+
+
+def ingest(stix_dicts, import_type):
+    """ Parse and convert the objects, returning the number converted per second"""
+    converted = 0
+    start_time = time.perf_counter()
+    for stix_dict in stix_dicts:
+        try:
+            raw_stix2_to_typeql(parse(stix_dict, False, import_type), import_type)
+            converted += 1
+        except Exception:
+            continue
+    return converted / (time.perf_counter() - start_time)
+
+
+@pytest.mark.performance
+def test_ingest_throughput_with_logging_off_and_on():
+    """ Report ingest throughput with the stixorm loggers at WARNING and at DEBUG into a discarded stream"""
+    import_type = import_type_factory.get_all_imports()
+    stix_dicts = load_corpus()
+    ingest(stix_dicts, import_type)
+
+    loggers = [logging.getLogger(name) for name in LOGGER_NAMES]
+    handler = logging.StreamHandler(io.StringIO())
+    previous = [(log.level, log.propagate) for log in loggers]
+    try:
+        for log in loggers:
+            log.setLevel(logging.WARNING)
+        off = ingest(stix_dicts, import_type)
+
+        for log in loggers:
+            log.setLevel(logging.DEBUG)
+            log.propagate = False
+            log.addHandler(handler)
+        on = ingest(stix_dicts, import_type)
+    finally:
+        for log, (level, propagate) in zip(loggers, previous):
+            log.removeHandler(handler)
+            log.setLevel(level)
+            log.propagate = propagate
+
+    print(f"\ningest throughput, logging off {off:.0f} objects/s, debug logging on {on:.0f} objects/s")
+    # disabled logging must not format any of the debug records
+    assert off > on
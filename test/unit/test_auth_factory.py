@@ -0,0 +1,46 @@
+import copy
+
+import pytest
+
+from stixorm.module.authorise import find_record
+from stixorm.module.typedb_lib.factories.auth_factory import get_auth_factory_instance
+from stixorm.module.typedb_lib.factories.import_type_factory import ImportTypeFactory
+
+
+def test_equal_import_types_share_one_auth():
+    first = ImportTypeFactory.get_all_imports()
+    second = ImportTypeFactory.get_default_import()
+    stix_only = ImportTypeFactory.create_import(attack=False, os_threat=False)
+
+    assert first.get_key() == second.get_key()
+    assert hash(first.get_key()) == hash(second.get_key())
+    factory = get_auth_factory_instance()
+    assert factory.get_auth_for_import(first) is factory.get_auth_for_import(second)
+    assert factory.get_auth_for_import(stix_only) is not factory.get_auth_for_import(first)
+
+
+def test_auth_is_read_only():
+    auth = get_auth_factory_instance().get_auth_for_import(ImportTypeFactory.get_all_imports())
+
+    assert "identity" in auth["types"]["sdo"]
+    assert copy.deepcopy(auth["types"]) is auth["types"]
+    with pytest.raises(TypeError):
+        auth["types"]["sdo"] = []
+    with pytest.raises(AttributeError):
+        auth["types"]["sdo"].append("new-type")
+
+
+def test_find_record_matches_a_linear_scan():
+    auth = get_auth_factory_instance().get_auth_for_import(ImportTypeFactory.get_all_imports())
+
+    assert isinstance(auth["reln_name"]["embedded_relations"], frozenset)
+    for section in ["reln", "conv"]:
+        for group, records in auth[section].items():
+            for record in records:
+                for field in ["rel", "stix", "typeql", "name", "relation", "type"]:
+                    if field not in record:
+                        continue
+                    matches = [r for r in records if r.get(field) == record[field]]
+                    assert find_record(auth, section, group, field, record[field]) == matches[0]
+                    assert find_record(auth, section, group, field, record[field], last=True) == matches[-1]
+    assert find_record(auth, "reln", "embedded_relations", "rel", "not_a_relation") is None
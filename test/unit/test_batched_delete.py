@@ -0,0 +1,51 @@
+from stixorm.module.typedb_lib import queries
+from stixorm.module.typedb_lib.instructions import Instructions, ResultStatus
+from test.unit.utils.typedb_fakes import FakeConnection, FakeSession
+
+
+def create_instructions(ids):
+    instructions = Instructions()
+    for stix_id in ids:
+        instructions.insert_delete_instruction(stix_id, {"delete": ["query-" + stix_id]})
+    instructions.insert_delete_instruction_not_found("indicator--missing")
+    instructions.add_insertion_order(ids)
+    return instructions
+
+
+def test_deletes_commit_together(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(queries, "get_connection", lambda uri, port: FakeConnection(session))
+    instructions = create_instructions(["a", "b", "c", "d", "e"])
+
+    queries.delete_layers("localhost", "1729", "stix", instructions, batch_size=2)
+
+    assert session.commits == [["query-a", "query-b"], ["query-c", "query-d"], ["query-e"]]
+    results = {result.id: result.status for result in instructions.convert_to_result()}
+    assert results.pop("indicator--missing") == ResultStatus.NOT_IN_DB
+    assert all(status == ResultStatus.SUCCESS for status in results.values())
+
+
+def test_failed_batch_is_bisected_to_the_failing_delete(monkeypatch):
+    session = FakeSession(failing=["query-f"])
+    monkeypatch.setattr(queries, "get_connection", lambda uri, port: FakeConnection(session))
+    ids = ["a", "b", "c", "d", "e", "f", "g", "h"]
+    instructions = create_instructions(ids)
+
+    queries.delete_layers("localhost", "1729", "stix", instructions, batch_size=8)
+
+    assert session.commits == [["query-a", "query-b", "query-c", "query-d"], ["query-e"], ["query-g", "query-h"]]
+    results = {result.id: result for result in instructions.convert_to_result()}
+    assert results["f"].status == ResultStatus.ERROR and "query-f" in results["f"].error
+    assert all(results[stix_id].status == ResultStatus.SUCCESS and results[stix_id].error is None
+               for stix_id in ids if stix_id != "f")
+
+
+def test_batch_queries_build_the_queries_of_a_batch(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(queries, "get_connection", lambda uri, port: FakeConnection(session))
+    instructions = create_instructions(["a", "b", "c"])
+
+    queries.delete_layers("localhost", "1729", "stix", instructions, batch_size=2,
+                          batch_queries=lambda batch: ["query-" + "+".join(batch)])
+
+    assert session.commits == [["query-a+b"], ["query-c"]]
@@ -0,0 +1,87 @@
+from stixorm.module.typedb_lib import queries
+from stixorm.module.typedb_lib.instructions import Instructions, Status, ResultStatus
+from test.unit.utils.typedb_fakes import FakeConnection, FakeSession
+
+
+def unmatched(*missing):
+    """ the answers of inserts whose match finds nothing for the given queries"""
+    return lambda kind, query: [] if query in missing else [object()]
+
+
+def create_instructions(ids):
+    instructions = Instructions()
+    for stix_id in ids:
+        instructions.insert_delete_instruction(stix_id, {"delete": "query-" + stix_id})
+    instructions.add_insertion_order(ids)
+    return instructions
+
+
+def test_batches_commit_together(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(queries, "get_connection", lambda uri, port: FakeConnection(session))
+    instructions = create_instructions(["a", "b", "c", "d", "e"])
+
+    queries.add_instructions_to_typedb("localhost", "1729", "stix", instructions, batch_size=2)
+
+    assert session.commits == [["query-a", "query-b"], ["query-c", "query-d"], ["query-e"]]
+    assert all(result.status == ResultStatus.SUCCESS for result in instructions.convert_to_result())
+
+
+def test_failed_batch_falls_back_to_single_commits(monkeypatch):
+    session = FakeSession(failing=["query-c"])
+    monkeypatch.setattr(queries, "get_connection", lambda uri, port: FakeConnection(session))
+    instructions = create_instructions(["a", "b", "c", "d", "e"])
+
+    queries.add_instructions_to_typedb("localhost", "1729", "stix", instructions, batch_size=3)
+
+    assert session.commits == [["query-a"], ["query-b"]]
+    assert instructions.instructions["a"].status == Status.SUCCESS
+    assert instructions.instructions["b"].status == Status.SUCCESS
+    assert instructions.instructions["c"].status == Status.ERROR
+    assert instructions.instructions["d"].status == Status.CREATED_QUERY
+    assert instructions.instructions["e"].status == Status.CREATED_QUERY
+
+
+def test_insert_that_matches_nothing_is_an_error(monkeypatch):
+    session = FakeSession(unmatched("query-b"))
+    monkeypatch.setattr(queries, "get_connection", lambda uri, port: FakeConnection(session))
+    instructions = create_instructions(["a", "b", "c"])
+
+    queries.add_instructions_to_typedb("localhost", "1729", "stix", instructions, batch_size=1)
+
+    assert session.commits == [["query-a"]]
+    assert instructions.instructions["b"].status == Status.ERROR
+    assert "missing from the database" in instructions.instructions["b"].error
+
+
+def create_generation_instructions(generations):
+    instructions = create_instructions([stix_id for generation in generations for stix_id in generation])
+    instructions.add_insertion_generations(generations)
+    return instructions
+
+
+def test_generations_insert_in_dependency_order(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(queries, "get_connection", lambda uri, port: FakeConnection(session))
+    instructions = create_generation_instructions([["a", "b", "c"], ["d", "e"]])
+
+    queries.add_instructions_to_typedb_by_generation("localhost", "1729", "stix", instructions,
+                                                     parallelism=3, batch_size=1)
+
+    committed = [query for commit in session.commits for query in commit]
+    assert set(committed[:3]) == {"query-a", "query-b", "query-c"}
+    assert set(committed[3:]) == {"query-d", "query-e"}
+    assert all(result.status == ResultStatus.SUCCESS for result in instructions.convert_to_result())
+
+
+def test_failed_generation_stops_later_generations(monkeypatch):
+    session = FakeSession(failing=["query-b"])
+    monkeypatch.setattr(queries, "get_connection", lambda uri, port: FakeConnection(session))
+    instructions = create_generation_instructions([["a", "b", "c"], ["d"]])
+
+    queries.add_instructions_to_typedb_by_generation("localhost", "1729", "stix", instructions,
+                                                     parallelism=2, batch_size=2)
+
+    assert instructions.instructions["b"].status == Status.ERROR
+    assert instructions.instructions["c"].status == Status.SUCCESS
+    assert instructions.instructions["d"].status == Status.CREATED_QUERY
@@ -0,0 +1,38 @@
+from stixorm.module.parsing.content import parse
+
+
+def test_registry_is_loaded_once(monkeypatch):
+    registry = parse.get_class_registry_instance()
+
+    def fail_read():
+        raise AssertionError("class_registry.json read again")
+
+    monkeypatch.setattr(parse, "read_class_registry", fail_read)
+    assert parse.get_class_registry_instance() is registry
+    assert [item.typeql for item in parse.get_content_list_for_type("identity", "class")] == \
+           ["attack-identity", "identity"]
+
+
+def test_specialisation_and_default_dispatch():
+    attack_identity = {"type": "identity", "x_mitre_attack_spec_version": "3.1.0"}
+    identity = {"type": "identity", "name": "ACME"}
+
+    assert parse.determine_content_object_from_list_by_tests(attack_identity, "class").typeql == "attack-identity"
+    assert parse.determine_content_object_from_list_by_tests(identity, "class").typeql == "identity"
+    assert parse.determine_content_object_from_list_by_tests({"type": "unknown-type"}, "class") is None
+    assert parse.get_tqlname_from_type_and_protocol("identity") == "identity"
+    assert parse.get_group_from_type("identity") == "sdo"
+
+
+def test_conditions_read_without_copying():
+    sub_technique = {"type": "attack-pattern", "x_mitre_attack_spec_version": "3.1.0",
+                     "x_mitre_is_subtechnique": True, "external_references": [{"source_name": "mitre-attack"}]}
+    step = {"type": "sequence", "step_type": "end_step"}
+    oca_process = {"type": "process", "x_unique_id": "1"}
+
+    assert parse.determine_content_object_from_list_by_tests(sub_technique, "class").typeql == "sub-technique"
+    assert parse.determine_content_object_from_list_by_tests(step, "class").typeql == "end-step"
+    assert parse.determine_content_object_from_list_by_tests(oca_process, "class").typeql == "oca-process"
+    assert parse.process_exists_condition({"a": {"b": 1}}, ("a", "b"))
+    assert not parse.process_exists_condition({"a": {"c": 1}}, ("a", "b"))
+    assert parse.process_equals_condition({"a": {"b": 1}}, ("a", "b"), 1)
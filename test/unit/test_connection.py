@@ -0,0 +1,138 @@
+import pytest
+
+from stixorm.module.typedb_lib import connection as connection_module
+from stixorm.module.typedb_lib.connection import TypeDBConnection, get_connection
+from test.unit.utils.typedb_fakes import FakeDriver
+
+
+@pytest.fixture
+def drivers(monkeypatch):
+    created = []
+
+    def core_driver(url):
+        created.append(FakeDriver(url))
+        return created[-1]
+
+    monkeypatch.setattr(connection_module.TypeDB, "core_driver", core_driver)
+    return created
+
+
+def test_driver_is_shared_and_sessions_are_reused(drivers):
+    connection = TypeDBConnection("localhost", "1729")
+
+    with connection.data_session("stix") as first:
+        pass
+    with connection.data_session("stix") as second:
+        pass
+
+    assert len(drivers) == 1
+    assert drivers[0].url == "localhost:1729"
+    assert first is second
+    assert first.is_open()
+
+
+def test_concurrent_borrowers_get_their_own_session(drivers):
+    connection = TypeDBConnection("localhost", "1729")
+
+    with connection.data_session("stix") as first:
+        with connection.data_session("stix") as second:
+            assert first is not second
+
+    assert len(drivers[0].sessions) == 2
+
+
+def test_failed_session_is_not_pooled(drivers):
+    connection = TypeDBConnection("localhost", "1729")
+
+    with pytest.raises(ValueError):
+        with connection.data_session("stix") as failed:
+            raise ValueError("query failed")
+    with connection.data_session("stix") as session:
+        pass
+
+    assert not failed.is_open()
+    assert session is not failed
+
+
+def test_abandoned_generator_does_not_leak_its_session(drivers):
+    connection = TypeDBConnection("localhost", "1729")
+
+    def stream():
+        with connection.data_session("stix") as session:
+            for position in range(3):
+                yield session, position
+
+    results = stream()
+    abandoned, _ = next(results)
+    results.close()
+    with connection.data_session("stix") as session:
+        pass
+
+    assert not abandoned.is_open()
+    assert session is not abandoned
+    assert [session.is_open() for session in drivers[0].sessions] == [False, True]
+
+
+def test_closed_driver_reconnects(drivers):
+    connection = TypeDBConnection("localhost", "1729")
+    with connection.data_session("stix") as first:
+        pass
+
+    drivers[0].close()
+    with connection.data_session("stix") as second:
+        pass
+
+    assert len(drivers) == 2
+    assert second is not first
+
+
+def test_a_failed_query_on_a_lost_server_reconnects(drivers):
+    connection = TypeDBConnection("localhost", "1729")
+
+    with pytest.raises(ValueError):
+        with connection.data_session("stix"):
+            drivers[0].down = True
+            raise ValueError("query failed")
+    with connection.data_session("stix") as session:
+        pass
+
+    assert len(drivers) == 2 and not drivers[0].is_open()
+    assert session in drivers[1].sessions
+
+
+def test_a_failed_query_on_a_healthy_server_keeps_the_driver(drivers):
+    connection = TypeDBConnection("localhost", "1729")
+
+    with pytest.raises(ValueError):
+        with connection.data_session("stix"):
+            raise ValueError("query failed")
+    with connection.data_session("stix"):
+        pass
+
+    assert len(drivers) == 1 and connection.is_healthy()
+
+
+def test_taking_a_session_retries_once_on_a_new_driver(drivers):
+    connection = TypeDBConnection("localhost", "1729")
+    connection.driver.down = True
+
+    with connection.data_session("stix") as session:
+        pass
+
+    assert len(drivers) == 2 and not drivers[0].is_open()
+    assert session in drivers[1].sessions and session.is_open()
+
+
+def test_schema_session_closes_idle_data_sessions(drivers):
+    connection = TypeDBConnection("localhost", "1729")
+    with connection.data_session("stix") as data_session:
+        pass
+
+    with connection.schema_session("stix") as schema_session:
+        assert not data_session.is_open()
+        assert schema_session.is_open()
+    assert not schema_session.is_open()
+
+
+def test_port_may_be_an_int_or_a_str():
+    assert get_connection("localhost", 1729) is get_connection("localhost", "1729")
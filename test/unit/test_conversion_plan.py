@@ -0,0 +1,25 @@
+import pytest
+
+from stixorm.module.parsing.conversion_decisions import stix_dict_to_tql, ConversionPlan
+from stixorm.module.orm.import_utilities import split_on_activity_type
+
+
+def test_objects_of_one_type_share_a_read_only_plan():
+    first = stix_dict_to_tql({"type": "identity", "name": "ACME"})
+    second = stix_dict_to_tql({"type": "identity", "name": "Initech"})
+
+    assert first[0] is second[0]
+    assert isinstance(first[0], ConversionPlan) and dict(first[0]) == dict(first[0].obj_tql)
+    assert first[1:] == second[1:]
+    assert first[1] == "identity" and first[3] == "stix21"
+    with pytest.raises(TypeError):
+        first[0]["name"] = "changed"
+
+
+def test_plan_split_matches_mapping():
+    obj_tql, tql_name, is_list, protocol = stix_dict_to_tql({"type": "identity"})
+    total_props = ["name", "created_by_ref", "description", "external_references"]
+
+    assert split_on_activity_type(total_props, obj_tql) == split_on_activity_type(total_props, dict(obj_tql))
+    with pytest.raises(KeyError):
+        split_on_activity_type(["not_a_property"], obj_tql)
@@ -0,0 +1,123 @@
+import time
+
+from stixorm.module import typedb
+from stixorm.module.authorise import import_type_factory
+from stixorm.module.orm.delete_planner import plan_deletes, build_referrers_query, referrer_queries
+from stixorm.module.typedb import TypeDBSink
+from stixorm.module.typedb_lib.instructions import ResultStatus
+
+
+def dep(stix_id, *dep_list):
+    return {"id": stix_id, "dep_list": list(dep_list), "delete": "match " + stix_id}
+
+
+def ids(plan):
+    return [dep_obj["id"] for dep_obj in plan.order]
+
+
+def test_dependents_are_deleted_before_their_dependencies():
+    dep_objs = [dep("identity--a"),
+                dep("malware--b", "identity--a", "marking-definition--m"),
+                dep("relationship--c", "malware--b", "indicator--d", "identity--a"),
+                dep("indicator--d", "identity--a")]
+
+    plan = plan_deletes(dep_objs)
+
+    order = ids(plan)
+    assert sorted(order) == ["identity--a", "indicator--d", "malware--b", "relationship--c"]
+    for dep_obj in dep_objs:
+        for reference in dep_obj["dep_list"]:
+            if reference in order:
+                assert order.index(dep_obj["id"]) < order.index(reference)
+    assert plan.blocked == {} and plan.cyclical == []
+
+
+def test_external_references_block_the_object_and_what_it_references():
+    dep_objs = [dep("identity--a"),
+                dep("malware--b", "identity--a"),
+                dep("indicator--d")]
+
+    plan = plan_deletes(dep_objs, {"malware--b": ["relationship--x", "indicator--d"]})
+
+    assert ids(plan) == ["indicator--d"]
+    assert plan.blocked == {"identity--a": ["malware--b"], "malware--b": ["relationship--x"]}
+
+
+def test_an_object_blocked_from_outside_is_never_ordered():
+    plan = plan_deletes([dep("x--1", "b--1"), dep("b--1")], {"b--1": ["x--1", "ext--9"]})
+
+    assert ids(plan) == ["x--1"]
+    assert plan.blocked == {"b--1": ["ext--9"]}
+
+
+def test_cycles_are_deleted_last():
+    plan = plan_deletes([dep("note--a", "note--b"), dep("note--b", "note--a"), dep("note--c", "note--a")])
+
+    assert ids(plan) == ["note--c", "note--a", "note--b"]
+    assert plan.cyclical == ["note--a", "note--b"]
+
+
+def test_a_large_chain_is_ordered_in_linear_time():
+    dep_objs = [dep("note--%05d" % i, "note--%05d" % (i + 1)) for i in range(20000)]
+
+    start = time.perf_counter()
+    plan = plan_deletes(reversed(dep_objs))
+
+    assert time.perf_counter() - start < 1
+    assert ids(plan) == ["note--%05d" % i for i in range(20000)]
+
+
+def test_referrer_queries_are_batched():
+    queries = list(referrer_queries(["a--%d" % i for i in range(5)], batch_size=2))
+
+    assert [key for key, _ in queries] == ["a--0", "a--2", "a--4"]
+    assert '{$id "a--0";} or {$id "a--1";};' in queries[0][1]
+    assert build_referrers_query(["a--4"]).endswith("get $id, $ref, $pointed;")
+
+
+def test_a_reference_held_by_a_sub_object_is_walked_up_to_its_owner():
+    query = build_referrers_query(["artifact--a"])
+
+    assert "not {$referrer has stix-id $referrer-id;};" in query
+    assert "$own (pointed-to: $referrer, owner: $owner) isa embedded; $owner has stix-id $ref;" in query
+
+
+def test_sink_skips_referenced_objects(monkeypatch):
+    sink = TypeDBSink.__new__(TypeDBSink)
+    sink.uri, sink.port, sink.database = "localhost", "1729", "stix"
+    sink.import_type = import_type_factory.get_all_imports()
+    sink.batch_size = 1
+
+    def match_queries(uri, port, database, queries, data_query, **args):
+        for key, query in queries:
+            if "get $a;" in query:
+                yield key, ["0x01", "0x02"] if '"malware--b"' in query else ["0x03"]
+            else:
+                yield key, [("identity--a", "malware--b"), ("identity--a", "campaign--z")]
+
+    deleted = []
+    sink_instructions = {}
+    batch_queries = []
+
+    def delete_layers(uri, port, database, instructions, **args):
+        for instruction_id in instructions.get_ordered_ids():
+            if not instructions.not_allow_insertion(instruction_id):
+                deleted.append(instruction_id)
+                sink_instructions[instruction_id] = instructions.instructions[instruction_id]
+                instructions.update_delete_instruction_as_success(instruction_id)
+        batch_queries.extend(args["batch_queries"](deleted))
+        return instructions
+
+    monkeypatch.setattr(typedb, "query_existing_ids", lambda uri, port, database, stix_ids: stix_ids)
+    monkeypatch.setattr(typedb, "match_queries", match_queries)
+    monkeypatch.setattr(typedb, "delete_layers", delete_layers)
+
+    results = {result.id: result for result in sink.delete(["identity--a", "malware--b"])}
+
+    assert deleted == ["malware--b", "cleanup"]
+    cleanup = sink_instructions["cleanup"]
+    assert len(cleanup.queries) == 1 and "{$a iid 0x01;} or {$a iid 0x02;};" in cleanup.queries[0]
+    assert batch_queries == sink_instructions["malware--b"].queries + cleanup.queries
+    assert results["malware--b"].status == ResultStatus.SUCCESS
+    assert results["identity--a"].status == ResultStatus.REFERENCED
+    assert "campaign--z" in results["identity--a"].message
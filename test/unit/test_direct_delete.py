@@ -0,0 +1,44 @@
+from stixorm.module.authorise import import_type_factory
+from stixorm.module.orm.direct_delete import build_delete_queries, get_delete_links
+from stixorm.module.typedb import TypeDBSink
+
+import_type = import_type_factory.get_all_imports()
+
+
+def test_references_and_sub_objects_are_deleted_before_the_object():
+    queries = build_delete_queries(["indicator--1"], import_type)
+
+    assert all(query.startswith('match $obj has stix-id $stix-id;\n $stix-id "indicator--1";') for query in queries)
+    assert '{$r (created:$obj) isa created-by;}' in queries[-2]
+    assert '{$r (marked:$obj) isa object-marking;}' in queries[-2]
+    assert queries[-2].endswith('delete $r isa relation;')
+    assert any('$r (kill-chain-used:$obj, kill-chain-using:$s) isa kill-chain-usage; $s isa kill-chain-phase;' in query
+               for query in queries)
+    assert queries[-1].endswith('delete $obj isa thing; $a isa attribute; $stix-id isa stix-id;')
+
+
+def test_nested_sub_objects_are_deleted_deepest_first():
+    queries = build_delete_queries(["file--1"], import_type)
+
+    nested = [i for i, query in enumerate(queries) if 'isa alt-data-streams; $s0_1 isa alternate-data-stream;' in query]
+    parent = [i for i, query in enumerate(queries) if '$r (ntfs-ext:$s1_0, alt-data-stream:$s) isa alt-data-streams;' in query]
+    assert len(nested) == 1 and len(parent) == 1 and nested[0] < parent[0]
+
+
+def test_one_set_of_queries_covers_many_objects():
+    queries = build_delete_queries(["indicator--1", "relationship--2"], import_type)
+
+    assert all('{$stix-id "indicator--1";} or {$stix-id "relationship--2";};' in query for query in queries)
+    assert get_delete_links("relationship", import_type) == get_delete_links("relationship", import_type)
+    assert not any("source" in link.owner for link in get_delete_links("relationship", import_type))
+
+
+def test_the_sink_does_not_read_the_object():
+    sink = TypeDBSink.__new__(TypeDBSink)
+    sink.import_type = import_type
+
+    layer = sink._TypeDBSink__delete_instruction("identity--1")
+
+    assert layer["id"] == "identity--1" and layer["dep_list"] == []
+    assert layer["delete"] == build_delete_queries(["identity--1"], import_type)
+    assert sink._TypeDBSink__delete_instruction("marking-definition--613f2e26-407d-48c7-9eca-b8e91df99dc9") is None
@@ -0,0 +1,84 @@
+import io
+import json
+import logging
+import pathlib
+
+from stix2.base import _STIXBase
+
+from stixorm.module.authorise import import_type_factory
+from stixorm.module.orm.import_objects import raw_stix2_to_typeql
+from stixorm.module.parsing.parse_objects import parse
+
+CORPUS = pathlib.Path(__file__).parent.parent / "data" / "stix" / "examples"
+LOGGER_NAMES = ["stixorm"]
+
+
+def load_corpus():
+    """ Load every object dict in the fixed corpus"""
+    stix_dicts = []
+    for path in sorted(CORPUS.rglob("*.json")):
+        with open(path, encoding="utf-8") as corpus_file:
+            data = json.load(corpus_file)
+        stix_dicts.extend(data.get("objects", [data]) if isinstance(data, dict) else data)
+    return stix_dicts
+
+
+def ingest(stix_dicts, import_type):
+    """ Parse and convert the objects, returning the number converted"""
+    converted = 0
+    for stix_dict in stix_dicts:
+        try:
+            raw_stix2_to_typeql(parse(stix_dict, False, import_type), import_type)
+            converted += 1
+        except Exception:
+            continue
+    return converted
+
+
+def spy_on_formatting(monkeypatch):
+    """ Count every time a STIX object is rendered as text, which is what formatting a log message of it costs"""
+    formatted = []
+    original_str, original_repr = _STIXBase.__str__, _STIXBase.__repr__
+
+    def spy_str(self):
+        formatted.append(self.id)
+        return original_str(self)
+
+    def spy_repr(self):
+        formatted.append(self.id)
+        return original_repr(self)
+
+    monkeypatch.setattr(_STIXBase, "__str__", spy_str)
+    monkeypatch.setattr(_STIXBase, "__repr__", spy_repr)
+    return formatted
+
+
+def test_disabled_logging_formats_nothing(monkeypatch):
+    """ With the stixorm loggers at WARNING, ingest never formats an object for a debug message"""
+    import_type = import_type_factory.get_all_imports()
+    stix_dicts = load_corpus()
+    formatted = spy_on_formatting(monkeypatch)
+
+    loggers = [logging.getLogger(name) for name in LOGGER_NAMES]
+    handler = logging.StreamHandler(io.StringIO())
+    previous = [(log.level, log.propagate) for log in loggers]
+    try:
+        for log in loggers:
+            log.setLevel(logging.WARNING)
+        assert ingest(stix_dicts, import_type) > 0
+        formatted_when_off = len(formatted)
+
+        for log in loggers:
+            log.setLevel(logging.DEBUG)
+            log.propagate = False
+            log.addHandler(handler)
+        ingest(stix_dicts, import_type)
+    finally:
+        for log, (level, propagate) in zip(loggers, previous):
+            log.removeHandler(handler)
+            log.setLevel(level)
+            log.propagate = propagate
+
+    assert formatted_when_off == 0
+    # the spy does see the objects the debug records format, once debug logging is on
+    assert len(formatted) > 0
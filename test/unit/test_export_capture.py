@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from stixorm.module.orm import export_object
+from stixorm.module.orm.export_capture import ExportCapture, MemoryCapture, DirectoryCapture
+
+
+def fake_pipeline(monkeypatch):
+    res = [{"T_name": "identity", "type": "entity"}]
+    stix_dict = {"type": "identity", "id": "identity--023d105b-752e-4e3c-941c-7d3f3cb15e9e"}
+    monkeypatch.setattr(export_object, "convert_ans_to_res", lambda answer_iterator, r_tx, import_type: res)
+    monkeypatch.setattr(export_object, "convert_res_to_stix", lambda res, import_type: stix_dict)
+    return res, stix_dict
+
+
+def test_export_returns_the_dict_without_capturing(monkeypatch, tmp_path):
+    res, stix_dict = fake_pipeline(monkeypatch)
+    monkeypatch.chdir(tmp_path)
+
+    result = export_object.convert_ans_to_stix("match", iter([]), None, None)
+
+    assert result is stix_dict
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_memory_capture_keeps_the_latest_stages(monkeypatch):
+    res, stix_dict = fake_pipeline(monkeypatch)
+    capture = MemoryCapture(max_entries=3)
+
+    for _ in range(2):
+        export_object.convert_ans_to_stix("match", iter([]), None, None, capture=capture)
+
+    assert len(capture.entries) == 3
+    assert capture.latest("res") == res
+    assert capture.latest("stix") == stix_dict
+    assert capture.latest("stix") is not stix_dict
+
+
+def test_directory_capture_writes_one_file_per_stage(monkeypatch, tmp_path):
+    res, stix_dict = fake_pipeline(monkeypatch)
+    capture = DirectoryCapture(tmp_path / "captures")
+
+    export_object.convert_ans_to_stix("match", iter([]), None, None, capture=capture)
+    export_object.convert_ans_to_stix("match", iter([]), None, None, capture=capture)
+
+    paths = sorted((tmp_path / "captures").iterdir())
+    assert [path.name for path in paths] == ["000000-res.json", "000001-stix.json", "000002-res.json", "000003-stix.json"]
+    assert json.loads(paths[1].read_text()) == stix_dict
+
+
+def test_a_capture_must_implement_capture():
+    with pytest.raises(TypeError):
+        ExportCapture()
@@ -0,0 +1,189 @@
+from stixorm.module.orm.export_utilities import StixIdLookup, process_entity
+from test.unit.utils.typedb_fakes import FakeSession
+
+
+class FakeValue:
+
+    def __init__(self, value):
+        self.value = value
+
+    def get_value(self):
+        return self.value
+
+
+class FakeLabel:
+
+    def __init__(self, scope, name):
+        self.scope = scope
+        self.name = name
+
+    def scoped_name(self):
+        return self.scope + ":" + self.name
+
+
+class FakeRole:
+
+    def __init__(self, scope, name, depth):
+        self.label = FakeLabel(scope, name)
+        self.depth = depth
+        self.supertype_calls = 0
+
+    def get_label(self):
+        return self.label
+
+    def is_root(self):
+        return self.depth == 0
+
+    def get_supertypes(self, r_tx):
+        self.supertype_calls += 1
+        return iter(range(self.depth))
+
+
+class FakeThing:
+
+    def __init__(self, iid, label, stix_id=None, entity=True):
+        self.iid = iid
+        self.label = label
+        self.stix_id = stix_id
+        self.entity = entity
+        self.calls = 0
+
+    def get_iid(self):
+        return self.iid
+
+    def get_type(self):
+        return self
+
+    def get_label(self):
+        return FakeLabel(None, self.label)
+
+    def is_entity(self):
+        return self.entity
+
+    def get_has(self, r_tx, attribute_type=None):
+        self.calls += 1
+        return [FakeValue(self.stix_id)] if self.stix_id is not None else []
+
+    def get_relations(self, r_tx):
+        self.calls += 1
+        return iter([])
+
+    def get_players(self, r_tx):
+        self.calls += 1
+        return {}
+
+
+class FakeAnswer(dict):
+
+    def get(self, variable):
+        return self[variable]
+
+
+def create_transaction(answers):
+    """ a read transaction answering each prefetch query with the named answers"""
+    return FakeSession(lambda kind, query: answers.get(query_name(query), [])).transaction()
+
+
+def names(queries):
+    return [query_name(query) for kind, query in queries if kind == "get"]
+
+
+def query_name(query):
+    tail = query.rsplit("\n", 1)[-1]
+    if "not { $p has stix-id" in query:
+        return {"get $p, $a;": "sub_has", "get $p, $s;": "sub_relations",
+                "get $s, $role, $q;": "sub_players", "get $q, $id;": "sub_ids"}[tail]
+    if "$r ($o: $x)" in query:
+        return {"get $r, $role, $p;": "players", "get $p, $id;": "ids"}[tail]
+    return {"get $a;": "has", "get $role, $p;": "own_players", "get $p, $id;": "own_ids"}[tail]
+
+
+indicator = FakeThing("0x10", "indicator")
+identity = FakeThing("0x01", "identity", "identity--023d105b-752e-4e3c-941c-7d3f3cb15e9e")
+reference = FakeThing("0x02", "external-reference")
+created_by = FakeThing("0x20", "created-by", entity=False)
+references = FakeThing("0x21", "external-references", entity=False)
+created, creator = FakeRole("created-by", "created", 2), FakeRole("created-by", "creator", 2)
+owner, pointed_to = FakeRole("embedded", "owner", 1), FakeRole("embedded", "pointed-to", 1)
+referencing, referenced = FakeRole("external-references", "referencing", 1), FakeRole("external-references", "referenced", 1)
+root = FakeRole("relation", "role", 0)
+
+
+def indicator_answers():
+    return {
+        "has": [FakeAnswer(a=FakeValue("malicious-activity"))],
+        # a variable role matches every supertype of the role that is played
+        "players": [FakeAnswer(r=created_by, role=role, p=indicator) for role in (created, owner, root)] +
+                   [FakeAnswer(r=created_by, role=role, p=identity) for role in (creator, pointed_to, root)] +
+                   [FakeAnswer(r=references, role=referencing, p=indicator),
+                    FakeAnswer(r=references, role=referenced, p=reference)],
+        "ids": [FakeAnswer(p=identity, id=FakeValue(identity.stix_id))],
+        "sub_has": [FakeAnswer(p=reference, a=FakeValue("capec"))],
+        "sub_relations": [FakeAnswer(p=reference, s=references)],
+    }
+
+
+def test_an_object_is_read_with_one_set_of_pipelined_queries():
+    r_tx = create_transaction(indicator_answers())
+    stix_ids = StixIdLookup(r_tx)
+
+    relations = stix_ids.prefetch(indicator, (created, referencing), False)
+
+    assert len(r_tx.session.queries("get")) == 7
+    assert names(r_tx.session.read)[0] == "has"
+    assert all("{$o type created-by:created;} or {$o type external-references:referencing;};" in query
+               for query in r_tx.session.queries("get")[1:])
+    assert relations == [created_by, references]
+    assert [value.get_value() for value in stix_ids.get_has(indicator)] == ["malicious-activity"]
+
+    players = {role.get_label().name: things for role, things in stix_ids.get_players(created_by).items()}
+    assert players == {"created": [indicator], "creator": [identity]}
+    assert process_entity(identity, r_tx, stix_ids)["stix_id"] == identity.stix_id
+    assert "stix_id" not in process_entity(reference, r_tx, stix_ids)
+    assert [value.get_value() for value in stix_ids.get_has(reference)] == ["capec"]
+    assert stix_ids.get_relations(reference) == [references]
+
+    assert all(thing.calls == 0 for thing in (indicator, identity, reference, created_by, references))
+    assert r_tx.session.resolved == []
+    # the depth of each role type is read once per export, however many objects play it
+    assert created.supertype_calls == 1 and root.supertype_calls == 0
+
+
+def test_a_type_without_owned_roles_only_reads_its_attributes():
+    r_tx = create_transaction({})
+
+    assert StixIdLookup(r_tx).prefetch(FakeThing("0x30", "tlp-white"), (), False) == []
+    assert names(r_tx.session.read) == ["has"]
+
+
+def test_relation_prefetch_also_reads_its_own_players():
+    relationship = FakeThing("0x40", "relationship", entity=False)
+    source, target = FakeRole("relationship", "source", 1), FakeRole("relationship", "target", 1)
+    r_tx = create_transaction({"own_players": [FakeAnswer(role=source, p=identity), FakeAnswer(role=target, p=indicator)],
+                                "own_ids": [FakeAnswer(p=identity, id=FakeValue(identity.stix_id))]})
+    stix_ids = StixIdLookup(r_tx)
+
+    stix_ids.prefetch(relationship, (), True)
+
+    assert len(r_tx.session.queries("get")) == 3
+    assert all("iid 0x40" in query for query in r_tx.session.queries("get"))
+    assert {role.get_label().name: things for role, things in stix_ids.get_players(relationship).items()} == {
+        "source": [identity], "target": [indicator]}
+    assert stix_ids.get(identity) == identity.stix_id
+    assert relationship.calls == 0 and identity.calls == 0
+
+
+def test_lookup_falls_back_once_and_resolves_the_type_once():
+    with_id = FakeThing("0x01", "identity", "identity--023d105b-752e-4e3c-941c-7d3f3cb15e9e")
+    without_id = FakeThing("0x02", "kill-chain-phase")
+    relation = FakeThing("0x50", "kill-chain-phases", entity=False)
+    r_tx = create_transaction({})
+    stix_ids = StixIdLookup(r_tx)
+
+    for _ in range(2):
+        assert process_entity(with_id, r_tx, stix_ids)["stix_id"] == with_id.stix_id
+        assert "stix_id" not in process_entity(without_id, r_tx, stix_ids)
+        assert stix_ids.get_players(relation) == {}
+
+    assert with_id.calls == 1 and without_id.calls == 1 and relation.calls == 1
+    assert r_tx.session.resolved == [("get_attribute_type", "stix-id")]
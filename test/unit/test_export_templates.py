@@ -0,0 +1,76 @@
+from stixorm.module.authorise import import_type_factory
+from stixorm.module.orm.export_templates import ExportTemplates, get_link_roles
+
+import_type = import_type_factory.get_all_imports()
+
+
+class FakeLabel:
+
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeRoleType:
+
+    def __init__(self, name):
+        self.name = name
+
+    def get_label(self):
+        return FakeLabel(self.name)
+
+
+class FakeType:
+
+    def __init__(self, label, roles):
+        self.label = label
+        self.roles = [FakeRoleType(role) for role in roles]
+        self.plays_calls = 0
+
+    def get_label(self):
+        return FakeLabel(self.label)
+
+    def get_plays(self, r_tx):
+        self.plays_calls += 1
+        return iter(self.roles)
+
+
+class FakeThing:
+
+    def __init__(self, thing_type):
+        self.thing_type = thing_type
+        self.requested = []
+
+    def get_type(self):
+        return self.thing_type
+
+    def get_relations(self, r_tx, role_types=None):
+        self.requested.append([role_type.name for role_type in role_types])
+        return iter([])
+
+
+def test_link_roles_come_from_the_definitions():
+    roles = get_link_roles(import_type)
+
+    assert {"creator", "marking", "referred", "indicating", "indicated", "sighting-of"} <= roles
+    assert not {"created", "marked", "object", "referenced", "container", "contained"} & roles
+
+
+def test_only_owned_relations_are_requested_and_templates_are_shared():
+    identity = FakeType("identity", ["created", "creator", "marked", "marking", "referenced", "referred",
+                                     "object", "indicated", "used"])
+    templates = ExportTemplates(None, import_type)
+    first, second = FakeThing(identity), FakeThing(identity)
+
+    templates.get_relations(first)
+    templates.get_relations(second)
+
+    assert first.requested == [["created", "marked", "referenced", "object"]]
+    assert second.requested == first.requested
+    assert identity.plays_calls == 1
+
+
+def test_type_without_owned_roles_asks_for_nothing():
+    marking_only = FakeThing(FakeType("tlp-white", ["marking", "creator"]))
+
+    assert list(ExportTemplates(None, import_type).get_relations(marking_only)) == []
+    assert marking_only.requested == []
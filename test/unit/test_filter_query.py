@@ -0,0 +1,110 @@
+import datetime
+import pathlib
+import re
+
+from stix2 import Filter
+
+from stixorm.module.authorise import import_type_factory
+from stixorm.module import typedb
+from stixorm.module.typedb import TypeDBSource
+from stixorm.module.orm.filter_query import build_filter_query, build_ids_query, millisecond_bounds
+from stixorm.module.typedb_lib.factories.auth_factory import get_auth_factory_instance
+
+import_type = import_type_factory.get_all_imports()
+connection = {"uri": "localhost", "port": "1729", "database": "stix", "user": None, "password": None}
+
+
+def test_common_properties_are_pushed_down():
+    query = build_filter_query([Filter("type", "in", ["indicator", "malware"]),
+                                Filter("id", "=", "indicator--8e2e2d2b-17d4-4cbf-938f-98ee46b3cd3f"),
+                                Filter("labels", "=", "malicious-activity")], import_type)
+
+    assert query.startswith("match $obj has stix-id $id;")
+    assert '{$obj has stix-type "indicator";} or {$obj has stix-type "malware";};' in query
+    assert '$id "indicator--8e2e2d2b-17d4-4cbf-938f-98ee46b3cd3f";' in query
+    assert '$obj has labels "malicious-activity";' in query
+    assert query.endswith("get $id;")
+
+
+def test_references_use_the_embedded_relation_definitions():
+    query = build_filter_query([Filter("created_by_ref", "=", "identity--023d105b-752e-4e3c-941c-7d3f3cb15e9e"),
+                                Filter("external_references.external_id", "=", "T1234"),
+                                Filter("source_ref", "=", "indicator--8e2e2d2b-17d4-4cbf-938f-98ee46b3cd3f")],
+                               import_type)
+
+    assert '$ref0 has stix-id "identity--023d105b-752e-4e3c-941c-7d3f3cb15e9e";' in query
+    assert "(created:$obj, creator:$ref0) isa created-by;" in query
+    assert '$sub1 has external-id "T1234";' in query
+    assert "(referenced:$obj, referencing:$sub1) isa external-references;" in query
+    assert "$obj (source:$ref2) isa stix-core-relationship;" in query
+
+
+def test_timestamp_ranges_are_widened_to_milliseconds():
+    query = build_filter_query([Filter("created", ">", "2016-04-06T20:03:48.0005Z"),
+                                Filter("modified", "=", datetime.datetime(2016, 4, 6, 20, 3, 48))], import_type)
+
+    assert "$created0 >= 2016-04-06T20:03:48.000;" in query
+    assert "$created0 <=" not in query
+    assert "$modified1 >= 2016-04-06T20:03:48.000;" in query
+    assert "$modified1 <= 2016-04-06T20:03:48.000;" in query
+    assert millisecond_bounds(datetime.datetime(2016, 4, 6, 20, 3, 48, 999500)) == \
+        ("2016-04-06T20:03:48.999", "2016-04-06T20:03:49.000")
+
+
+def test_other_filters_are_left_to_the_client():
+    query = build_filter_query([Filter("type", "!=", "indicator"),
+                                Filter("name", "=", "ACME"),
+                                Filter("labels", "contains", "mal")], import_type)
+
+    assert query == "match $obj has stix-id $id;\nget $id;"
+
+
+def test_source_query_applies_every_filter(monkeypatch):
+    stored = {
+        "identity--023d105b-752e-4e3c-941c-7d3f3cb15e9e": {
+            "type": "identity", "spec_version": "2.1", "id": "identity--023d105b-752e-4e3c-941c-7d3f3cb15e9e",
+            "created": "2016-04-06T20:03:00.000Z", "modified": "2016-04-06T20:03:00.000Z", "name": "ACME"},
+        "identity--311b2d2d-f010-4473-83ec-1edf84858f4c": {
+            "type": "identity", "spec_version": "2.1", "id": "identity--311b2d2d-f010-4473-83ec-1edf84858f4c",
+            "created": "2015-12-21T19:59:11.000Z", "modified": "2015-12-21T19:59:11.000Z", "name": "Cole"},
+    }
+    seen = []
+
+    def fake_stream_ids(uri, port, database, query):
+        seen.append(query)
+        yield from stored
+
+    def fake_match_queries(uri, port, database, queries, data_query, batch_size, **data_query_args):
+        for stix_id, query in queries:
+            yield stix_id, dict(stored[stix_id])
+
+    monkeypatch.setattr(typedb, "stream_ids", fake_stream_ids)
+    monkeypatch.setattr(typedb, "match_queries", fake_match_queries)
+    source = TypeDBSource(connection)
+    source.filters.add(Filter("type", "=", "identity"))
+
+    results = source.query([Filter("name", "=", "Cole")])
+
+    assert seen == []
+    assert [obj.name for obj in results] == ["Cole"]
+    assert '$obj has stix-type "identity";' in seen[0]
+    assert [obj.name for obj in source.all_versions("identity--023d105b-752e-4e3c-941c-7d3f3cb15e9e")] == ["ACME"]
+
+
+def test_every_protocol_matches_valid_schema_types(caplog):
+    auth = get_auth_factory_instance().get_auth_for_import(import_type)
+    protocols = {record["protocol"] for group in ("sdo", "sro", "sco", "meta")
+                 for record in auth["conv"][group] if "protocol" in record}
+    schema_types = set()
+    for schema_path in pathlib.Path(typedb.__file__).parent.joinpath("definitions").rglob("*.tql"):
+        schema_types.update(re.findall(r"^\s*([\w-]+)\s+sub\s", schema_path.read_text(), re.M))
+
+    assert {"stix21", "attack", "os-threat"} <= protocols
+    for protocol in sorted(protocols):
+        labels = re.findall(r"\{\$obj isa! ([^;]*);\}", build_ids_query(import_type, None, protocol, []))
+        assert len(labels) > 0
+        for label in labels:
+            assert re.fullmatch(r"[a-zA-Z_][a-zA-Z0-9_-]*", label), protocol + ": " + label
+            assert label in schema_types, protocol + ": " + label
+    # the attack mappings list a log-source object that the schema does not define
+    assert '"log-source", it is not defined in the schema' in caplog.text
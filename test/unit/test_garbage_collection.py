@@ -0,0 +1,63 @@
+from stixorm.module.typedb_lib import garbage_collection
+from stixorm.module.typedb_lib.garbage_collection import OrphanAttributeCollector, build_orphan_cleanup_queries
+from test.unit.utils.typedb_fakes import FakeConnection, FakeSession
+
+
+class FakeIid:
+
+    def __init__(self, iid):
+        self.iid = iid
+
+    def get_iid(self):
+        return self.iid
+
+
+class FakeDatabase:
+    """ The orphan attributes of a database, an orphan is gone once a committed delete names its iid"""
+
+    def __init__(self, orphans):
+        self.session = FakeSession(self.answers)
+        self.orphans = orphans
+
+    def remaining(self):
+        deleted = "".join(query for commit in self.session.commits for query in commit)
+        return [iid for iid in self.orphans if "iid " + iid + ";" not in deleted]
+
+    def answers(self, kind, query):
+        limit = int(query.rsplit("limit ", 1)[1].rstrip(";"))
+        return [{"a": FakeIid(iid)} for iid in self.remaining()[:limit]]
+
+
+def test_cleanup_queries_are_batched_by_iid():
+    queries = build_orphan_cleanup_queries(["0x%02d" % i for i in range(5)], batch_size=2)
+
+    assert len(queries) == 3
+    assert "{$a iid 0x00;} or {$a iid 0x01;};" in queries[0]
+    assert "$a iid 0x04;" in queries[2] and " or " not in queries[2]
+    assert all(query.endswith("not { $b isa thing; $b has $a; };\ndelete $a isa attribute;") for query in queries)
+
+
+def test_orphans_are_swept_a_batch_at_a_time(monkeypatch):
+    database = FakeDatabase(["0x%02d" % i for i in range(5)])
+    monkeypatch.setattr(garbage_collection, "get_connection", lambda uri, port: FakeConnection(database.session))
+    collector = OrphanAttributeCollector({"uri": "localhost", "port": "1729", "database": "stix"}, batch_size=2)
+
+    assert collector.run_once() == 5
+    assert len(database.session.commits) == 3 and database.remaining() == []
+    assert collector.run_once() == 0
+
+
+def test_collector_thread_stops(monkeypatch):
+    database = FakeDatabase(["0x01"])
+    monkeypatch.setattr(garbage_collection, "get_connection", lambda uri, port: FakeConnection(database.session))
+    collector = OrphanAttributeCollector({"uri": "localhost", "port": "1729", "database": "stix"}, interval=0.01)
+
+    collector.start()
+    for _ in range(500):
+        if database.remaining() == []:
+            break
+        collector._stopped.wait(0.01)
+    collector.stop()
+
+    assert database.remaining() == []
+    assert collector._thread is None
@@ -0,0 +1,69 @@
+from stixorm.module import typedb
+from stixorm.module.typedb import TypeDBSource
+from stixorm.module.typedb_lib import queries
+from test.unit.utils.typedb_fakes import FakeConnection, FakeSession
+
+connection = {"uri": "localhost", "port": "1729", "database": "stix", "user": None, "password": None}
+stored = {
+    "identity--023d105b-752e-4e3c-941c-7d3f3cb15e9e": {
+        "type": "identity", "spec_version": "2.1", "id": "identity--023d105b-752e-4e3c-941c-7d3f3cb15e9e",
+        "created": "2016-04-06T20:03:00.000Z", "modified": "2016-04-06T20:03:00.000Z", "name": "ACME"},
+    "identity--311b2d2d-f010-4473-83ec-1edf84858f4c": {
+        "type": "identity", "spec_version": "2.1", "id": "identity--311b2d2d-f010-4473-83ec-1edf84858f4c",
+        "created": "2015-12-21T19:59:11.000Z", "modified": "2015-12-21T19:59:11.000Z", "name": "Cole"},
+    "indicator--8e2e2d2b-17d4-4cbf-938f-98ee46b3cd3f": {
+        "type": "indicator", "spec_version": "2.1", "id": "indicator--8e2e2d2b-17d4-4cbf-938f-98ee46b3cd3f",
+        "created": "2016-04-06T20:03:48.000Z", "modified": "2016-04-06T20:03:48.000Z",
+        "pattern": "[ file:hashes.'SHA-256' = 'aec070645fe53ee3b3763059376134f058cc337247c978add178b6ccdfb0019f' ]",
+        "pattern_type": "stix", "valid_from": "2016-01-01T00:00:00Z"},
+}
+
+
+def create_connection():
+    # each get answers with its own query, for fake_convert to find the stix-ids in
+    return FakeConnection(FakeSession(lambda kind, query: [query]))
+
+
+def fake_convert(query, answer_iterator, r_tx, import_type, capture=None):
+    r_tx.session.sent.append(("convert", query))
+    answer = next(answer_iterator)
+    for stix_id, stix_dict in stored.items():
+        if stix_id in answer:
+            return dict(stix_dict)
+    return {}
+
+
+def test_get_many_uses_one_transaction_and_pipelines(monkeypatch):
+    fake = create_connection()
+    monkeypatch.setattr(queries, "get_connection", lambda uri, port: fake)
+    monkeypatch.setattr(typedb, "convert_ans_to_stix", fake_convert)
+    ids = ["indicator--8e2e2d2b-17d4-4cbf-938f-98ee46b3cd3f",
+           "identity--023d105b-752e-4e3c-941c-7d3f3cb15e9e",
+           "identity--311b2d2d-f010-4473-83ec-1edf84858f4c",
+           "identity--023d105b-752e-4e3c-941c-7d3f3cb15e9e"]
+
+    objects = list(TypeDBSource(connection).get_many(ids, batch_size=2))
+
+    assert [obj.id for obj in objects] == [ids[1], ids[2], ids[0]]
+    assert objects[2].type == "indicator"
+    assert fake.borrowed == 1 and fake.session.transactions == 1
+    assert [step for step, query in fake.session.sent] == ["get", "get", "convert", "convert", "get", "convert"]
+
+
+def test_get_many_skips_missing_objects(monkeypatch):
+    fake = create_connection()
+    monkeypatch.setattr(queries, "get_connection", lambda uri, port: fake)
+    monkeypatch.setattr(typedb, "convert_ans_to_stix", fake_convert)
+
+    objects = list(TypeDBSource(connection).get_many(["identity--023d105b-752e-4e3c-941c-7d3f3cb15e9e",
+                                                      "identity--5a7b9a5b-0e3f-4a23-a7f4-b1a5aca8e7a6"]))
+
+    assert [obj.name for obj in objects] == ["ACME"]
+
+
+def test_get_many_of_nothing_opens_no_session(monkeypatch):
+    fake = create_connection()
+    monkeypatch.setattr(queries, "get_connection", lambda uri, port: fake)
+
+    assert list(TypeDBSource(connection).get_many([])) == []
+    assert fake.borrowed == 0
@@ -0,0 +1,50 @@
+from stixorm.module.typedb_lib import queries
+from stixorm.module.typedb_lib.known_ids import KnownIds, get_known_ids
+from test.unit.utils.typedb_fakes import FakeConnection, FakeSession
+
+
+def test_unknown_skips_known_ids():
+    known_ids = KnownIds()
+    known_ids.add(["a", "b"])
+
+    assert known_ids.unknown(["a", "c", "b", "d"]) == ["c", "d"]
+
+
+def test_least_recently_used_ids_are_dropped():
+    known_ids = KnownIds(max_size=2)
+    known_ids.add(["a", "b"])
+    known_ids.unknown(["a"])
+    known_ids.add(["c"])
+
+    assert "a" in known_ids
+    assert "b" not in known_ids
+    assert len(known_ids) == 2
+
+
+def test_port_may_be_an_int_or_a_str():
+    assert get_known_ids("localhost", 1729, "stix") is get_known_ids("localhost", "1729", "stix")
+
+
+def test_discard_forgets_deleted_ids():
+    known_ids = KnownIds()
+    known_ids.add(["a", "b"])
+    known_ids.discard(["a"])
+
+    assert known_ids.unknown(["a", "b"]) == ["a"]
+
+
+def holding(*stix_ids):
+    """ the answers of a database holding the given stix-ids"""
+    return lambda kind, query: ["answer"] if query.split('"')[1] in stix_ids else []
+
+
+def test_existing_ids_use_one_query_per_id(monkeypatch):
+    session = FakeSession(holding("b", "d"))
+    monkeypatch.setattr(queries, "get_connection", lambda uri, port: FakeConnection(session))
+
+    existing = queries.query_existing_ids("localhost", "1729", "stix", ["a", "b", "c", "d", "e"], batch_size=3)
+
+    assert existing == ["b", "d"]
+    assert session.transactions == 2
+    assert len(session.queries("get")) == 5
+    assert all(" or " not in query for query in session.queries("get"))
@@ -0,0 +1,112 @@
+import stix2
+
+from stixorm.module import typedb
+from stixorm.module.typedb import TypeDBSource
+from stixorm.module.typedb_lib.object_cache import ObjectCache, attach_object_cache, invalidate_objects
+
+connection = {"uri": "localhost", "port": "1729", "database": "cache-test", "user": None, "password": None}
+
+
+def identity(number):
+    return stix2.v21.Identity(id="identity--00000000-0000-4000-8000-%012d" % number,
+                              created="2016-04-06T20:03:00.000Z", modified="2016-04-06T20:03:00.000Z",
+                              name="Identity %d" % number)
+
+
+def test_least_recently_used_objects_are_evicted():
+    cache = ObjectCache(max_entries=2)
+    first, second, third = identity(1), identity(2), identity(3)
+
+    cache.put(first.id, first, cache.version())
+    cache.put(second.id, second, cache.version())
+    assert cache.get(first.id) is first
+    cache.put(third.id, third, cache.version())
+
+    assert first.id in cache and third.id in cache and second.id not in cache
+    assert cache.get(second.id) is None
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.evictions, stats.entries) == (1, 1, 1, 2)
+    assert stats.hit_rate == 0.5
+
+
+def test_size_is_bounded_in_bytes():
+    obj = identity(1)
+    size = len(obj.serialize())
+    cache = ObjectCache(max_bytes=size * 2)
+
+    for number in range(1, 5):
+        obj = identity(number)
+        cache.put(obj.id, obj, cache.version())
+
+    assert len(cache) == 2
+    assert cache.stats().size_bytes == size * 2
+
+
+def test_objects_read_before_an_invalidation_are_not_cached():
+    cache = ObjectCache()
+    obj = identity(1)
+    version = cache.version()
+
+    cache.discard([obj.id])
+    cache.put(obj.id, obj, version)
+
+    assert obj.id not in cache
+
+
+def test_writes_invalidate_attached_caches():
+    cache = ObjectCache()
+    other = ObjectCache()
+    attach_object_cache("localhost", "1729", "cache-test", cache)
+    attach_object_cache("localhost", "1729", "another-database", other)
+    first, second = identity(1), identity(2)
+    for target in (cache, other):
+        target.put(first.id, first, target.version())
+        target.put(second.id, second, target.version())
+
+    invalidate_objects("localhost", 1729, "cache-test", [first.id])
+    assert first.id not in cache and second.id in cache
+    invalidate_objects("localhost", "1729", "cache-test")
+    assert len(cache) == 0
+    assert len(other) == 2
+
+
+def test_source_answers_repeated_gets_from_the_cache(monkeypatch):
+    stored = identity(1)
+    reads = []
+
+    def match_query(uri, port, database, query, data_query, **data_query_args):
+        reads.append(query)
+        return dict(stored)
+
+    monkeypatch.setattr(typedb, "match_query", match_query)
+    source = TypeDBSource(connection, object_cache=ObjectCache())
+
+    assert source.get(stored.id).name == "Identity 1"
+    assert source.get(stored.id).name == "Identity 1"
+    assert len(reads) == 1
+
+    invalidate_objects("localhost", "1729", "cache-test", [stored.id])
+    source.get(stored.id)
+    assert len(reads) == 2
+    assert source.object_cache.stats().hits == 1
+
+
+def test_get_many_only_reads_the_missing_objects(monkeypatch):
+    cached, missing = identity(1), identity(2)
+    read_ids = []
+
+    def match_queries(uri, port, database, queries, data_query, batch_size, **data_query_args):
+        for stix_id, query in queries:
+            read_ids.append(stix_id)
+            yield stix_id, dict(missing)
+
+    monkeypatch.setattr(typedb, "match_queries", match_queries)
+    cache = ObjectCache()
+    cache.put(cached.id, cached, cache.version())
+    source = TypeDBSource(connection, object_cache=cache)
+
+    objects = list(source.get_many([cached.id, missing.id]))
+
+    assert [obj.id for obj in objects] == [cached.id, missing.id]
+    assert read_ids == [missing.id]
+    assert missing.id in cache
@@ -0,0 +1,33 @@
+import logging
+
+from stixorm.module.typedb_lib import queries
+from test.unit.utils.typedb_fakes import FakeSession
+
+
+class UnreadConceptMap:
+
+    def concepts(self):
+        raise AssertionError("answer read only for logging")
+
+
+def test_insert_layer_does_not_read_answers_when_debug_is_off(caplog):
+    caplog.set_level(logging.INFO, logger=queries.logger.name)
+    answers = [UnreadConceptMap(), UnreadConceptMap()]
+
+    queries.insert_layer(FakeSession(lambda kind, query: answers).transaction(), "insert $x isa thing;")
+
+
+def test_query_id_collects_ids_without_logging_concepts(caplog):
+    caplog.set_level(logging.WARNING, logger=queries.logger.name)
+
+    class Answer(UnreadConceptMap):
+        def __init__(self, value):
+            self.value = value
+
+        def get(self, name):
+            return self
+
+        def get_value(self):
+            return self.value
+
+    assert queries.query_id("match", iter([Answer("a"), Answer("b")]), None) == ["a", "b"]
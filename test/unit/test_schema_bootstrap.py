@@ -0,0 +1,69 @@
+from stixorm.module import typedb
+from stixorm.module.authorise import import_type_factory
+from stixorm.module.initialise import schema_fingerprints
+from stixorm.module.typedb import TypeDBSink
+
+connection = {"uri": "localhost", "port": "1729", "database": "stix", "user": None, "password": None}
+
+
+def create_sink(monkeypatch, clear, created, stored_fingerprints, import_type=None):
+    loads = []
+    monkeypatch.setattr(typedb, "setup_database", lambda stix_connection, clear: created)
+    monkeypatch.setattr(typedb, "get_schema_fingerprints", lambda stix_connection: stored_fingerprints)
+    monkeypatch.setattr(typedb, "load_schemas",
+                        lambda stix_connection, schema_paths, fingerprints: loads.append((schema_paths, fingerprints)))
+    TypeDBSink(connection, clear, import_type)
+    return loads
+
+
+def names(schema_paths):
+    return [path.rsplit("/", 1)[-1] for path in schema_paths]
+
+
+def test_fingerprints_follow_each_schema_file(tmp_path):
+    first, second = tmp_path / "first.tql", tmp_path / "second.tql"
+    first.write_text("define name sub attribute, value string;")
+    second.write_text("define thing-name sub attribute, value string;")
+
+    fingerprints = schema_fingerprints([str(first), str(second)])
+
+    assert list(fingerprints) == ["first.tql", "second.tql"]
+    assert schema_fingerprints([str(first)]) == {"first.tql": fingerprints["first.tql"]}
+    second.write_text("define thing-name sub attribute, value long;")
+    changed = schema_fingerprints([str(first), str(second)])
+    assert changed["first.tql"] == fingerprints["first.tql"] and changed["second.tql"] != fingerprints["second.tql"]
+
+
+def test_a_new_database_loads_every_enabled_schema_at_once(monkeypatch):
+    loads = create_sink(monkeypatch, True, True, None, import_type_factory.get_all_imports())
+
+    assert len(loads) == 1
+    schema_paths, fingerprints = loads[0]
+    assert names(schema_paths) == [
+        "cti-schema-v2.tql", "cti-rules.tql", "cti-attack.tql", "cti-os-threat.tql",
+        "cti-oca.tql", "cti-mbc.tql", "cti-attack-flow.tql"]
+    assert fingerprints == schema_fingerprints(schema_paths)
+
+
+def test_an_existing_database_without_fingerprints_keeps_its_schema(monkeypatch):
+    assert create_sink(monkeypatch, False, False, None) == []
+
+
+def test_only_the_missing_or_changed_files_are_loaded(monkeypatch):
+    all_imports = import_type_factory.get_all_imports()
+    stored = create_sink(monkeypatch, True, True, None, all_imports)[0][1]
+
+    # a sink enabling a subset of the loaded files has nothing to do
+    assert create_sink(monkeypatch, False, False, stored) == []
+    assert create_sink(monkeypatch, False, False, dict(stored), all_imports) == []
+
+    base_only = {"cti-schema-v2.tql": stored["cti-schema-v2.tql"], "cti-rules.tql": stored["cti-rules.tql"]}
+    loads = create_sink(monkeypatch, False, False, base_only, all_imports)
+    assert names(loads[0][0]) == ["cti-attack.tql", "cti-os-threat.tql", "cti-oca.tql", "cti-mbc.tql",
+                                  "cti-attack-flow.tql"]
+    assert loads[0][1] == stored
+
+    changed = dict(stored, **{"cti-oca.tql": "0" * 64, "old-extension.tql": "1" * 64})
+    loads = create_sink(monkeypatch, False, False, changed, all_imports)
+    assert names(loads[0][0]) == ["cti-oca.tql"]
+    assert loads[0][1] == dict(stored, **{"old-extension.tql": "1" * 64})
@@ -0,0 +1,70 @@
+import re
+
+from stixorm.module import typedb
+from stixorm.module.authorise import import_type_factory
+from stixorm.module.typedb import TypeDBSink, TLP_MARKING_IDS
+
+stored = sorted(["indicator--%02d" % i for i in range(7)] + list(TLP_MARKING_IDS))
+
+
+def create_sink():
+    sink = TypeDBSink.__new__(TypeDBSink)
+    sink.uri, sink.port, sink.database = "localhost", "1729", "stix"
+    sink.import_type = import_type_factory.get_all_imports()
+    return sink
+
+
+def fake_server(monkeypatch):
+    queries = []
+
+    def stream_ids(uri, port, database, query):
+        queries.append(query)
+        excluded = re.findall(r'not \{ \$id "([^"]+)"; \};', query)
+        after = re.search(r'\$id > "([^"]+)";', query)
+        offset = re.search(r'offset (\d+);', query)
+        limit = re.search(r'limit (\d+);', query)
+        ids = [stix_id for stix_id in stored if stix_id not in excluded]
+        if after:
+            ids = [stix_id for stix_id in ids if stix_id > after.group(1)]
+        ids = ids[int(offset.group(1)) if offset else 0:]
+        yield from ids[:int(limit.group(1))] if limit else ids
+
+    monkeypatch.setattr(typedb, "stream_ids", stream_ids)
+    return queries
+
+
+def test_ids_are_paged_without_the_markings(monkeypatch):
+    queries = fake_server(monkeypatch)
+
+    ids = list(create_sink().iter_stix_ids(page_size=3))
+
+    assert ids == ["indicator--%02d" % i for i in range(7)]
+    assert len(queries) == 3
+    assert all("sort $id; limit 3;" in query for query in queries)
+    assert '$id > "indicator--02";' in queries[1]
+
+
+def test_offset_and_limit_are_sent_to_the_server(monkeypatch):
+    queries = fake_server(monkeypatch)
+
+    ids = list(create_sink().iter_stix_ids(offset=2, limit=4, page_size=3))
+
+    assert ids == ["indicator--02", "indicator--03", "indicator--04", "indicator--05"]
+    assert "offset 2; limit 3;" in queries[0]
+    assert "offset" not in queries[1] and "limit 1;" in queries[1]
+    assert create_sink().get_stix_ids() == ["indicator--%02d" % i for i in range(7)]
+
+
+def test_type_filters_and_count(monkeypatch):
+    queries = fake_server(monkeypatch)
+    counted = []
+    monkeypatch.setattr(typedb, "count_query", lambda uri, port, database, query: counted.append(query) or 7)
+    sink = create_sink()
+
+    list(sink.iter_stix_ids(stix_types=["indicator"], protocol="attack"))
+
+    assert '$obj has stix-type "indicator";' in queries[0]
+    assert "{$obj isa! technique;}" in queries[0]
+    assert sink.count_stix_ids(stix_types=["indicator"]) == 7
+    assert counted[0].endswith("get $id; count;")
+    assert "sort" not in counted[0]
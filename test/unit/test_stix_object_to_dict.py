@@ -0,0 +1,31 @@
+import json
+
+from stixorm.module.authorise import import_type_factory
+from stixorm.module.orm.import_objects import stix_object_to_dict, raw_stix2_to_typeql
+from stixorm.module.parsing.parse_objects import parse
+
+
+def test_canonical_dict_has_the_serialised_keys():
+    import_type = import_type_factory.get_all_imports()
+    indicator = parse({
+        "type": "indicator",
+        "spec_version": "2.1",
+        "id": "indicator--8e2e2d2b-17d4-4cbf-938f-98ee46b3cd3f",
+        "created": "2016-04-06T20:03:48.000Z",
+        "modified": "2016-04-06T20:03:48.000Z",
+        "indicator_types": ["malicious-activity"],
+        "pattern": "[ file:hashes.'SHA-256' = 'ef537f25c895bfa782526529a9b63d97aa631564d5d789c2b765448c8635fb6c' ]",
+        "pattern_type": "stix",
+        "valid_from": "2016-01-01T00:00:00Z"
+    }, False, import_type)
+
+    stix_dict = stix_object_to_dict(indicator, direct=True)
+
+    # the direct path reads these python-stix2 internals, so a stix2 release that changes them must fail here
+    assert isinstance(indicator._inner, dict)
+    assert "revoked" in indicator._defaulted_optional_properties
+    assert "revoked" in indicator
+    assert stix_object_to_dict(indicator) == json.loads(indicator.serialize())
+    assert set(stix_dict) == set(stix_object_to_dict(indicator))
+    assert stix_dict["pattern_type"] == "stix"
+    assert raw_stix2_to_typeql(indicator, import_type, direct=True) == raw_stix2_to_typeql(indicator, import_type)
@@ -0,0 +1,83 @@
+import json
+import pathlib
+import re
+
+import pytest
+
+from stixorm.module.authorise import import_type_factory
+from stixorm.module.orm.import_objects import raw_stix2_to_typeql
+from stixorm.module.parsing.parse_objects import parse
+from stixorm.module.parsing.trusted_objects import trusted_dict_to_stix, get_trusted_plan
+
+data_path = pathlib.Path(__file__).parent.parent / "data"
+import_type = import_type_factory.get_all_imports()
+timestamp = re.compile(r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(\.\d+)?Z?")
+
+
+def load_objects(path):
+    try:
+        with open(path, encoding="utf-8") as data_file:
+            data = json.load(data_file)
+    except ValueError:
+        return []
+    objects = data.get("objects", [data]) if isinstance(data, dict) else data
+    if not isinstance(objects, list):
+        return []
+    return [obj for obj in objects if isinstance(obj, dict) and "id" in obj]
+
+
+def to_typeql(stix_obj):
+    dep_match, dep_insert, indep_ql, core_ql, dep_obj = raw_stix2_to_typeql(stix_obj, import_type)
+    # defaulted timestamps are taken from the clock, so only their position has to match
+    return timestamp.sub("TS", json.dumps([dep_match, dep_insert, indep_ql, core_ql, dep_obj], default=str))
+
+
+@pytest.mark.parametrize("path", sorted(data_path.rglob("*.json")), ids=lambda path: str(path.relative_to(data_path)))
+def test_trusted_ingest_gives_the_same_typeql(path):
+    for stix_dict in load_objects(path):
+        try:
+            expected = to_typeql(parse(stix_dict, False, import_type))
+        except Exception:
+            # the trusted path does not validate, so it is only compared on valid objects
+            continue
+        assert to_typeql(trusted_dict_to_stix(stix_dict, import_type)) == expected, stix_dict["id"]
+
+
+def test_trusted_object_keeps_class_and_defaults():
+    stix_dict = {
+        "type": "attack-pattern",
+        "spec_version": "2.1",
+        "id": "attack-pattern--0c7b5b88-8ff7-4a4d-aa9d-feb398cd0061",
+        "created": "2016-05-12T08:17:27.000Z",
+        "modified": "2016-05-12T08:17:27.000Z",
+        "name": "Spear Phishing",
+        "kill_chain_phases": [{"kill_chain_name": "lockheed-martin-cyber-kill-chain", "phase_name": "delivery"}]
+    }
+
+    parsed = parse(stix_dict, False, import_type)
+    trusted = trusted_dict_to_stix(stix_dict, import_type)
+
+    assert type(trusted) is type(parsed)
+    assert get_trusted_plan(type(parsed)) is not None
+    assert dict(trusted) == dict(parsed)
+    assert list(trusted) == list(parsed)
+    assert trusted.serialize() == parsed.serialize()
+
+
+def test_untrusted_content_falls_back_to_the_parser():
+    stix_dict = {
+        "type": "attack-pattern",
+        "spec_version": "2.1",
+        "id": "attack-pattern--0c7b5b88-8ff7-4a4d-aa9d-feb398cd0061",
+        "created": "2016-05-12T08:17:27.000Z",
+        "modified": "2016-05-12T08:17:27.000Z",
+        "name": "Spear Phishing",
+        "x_unknown": "not in the class"
+    }
+
+    with pytest.raises(Exception) as parse_error:
+        parse(stix_dict, False, import_type)
+    with pytest.raises(Exception) as trusted_error:
+        trusted_dict_to_stix(stix_dict, import_type)
+
+    assert type(trusted_error.value) is type(parse_error.value)
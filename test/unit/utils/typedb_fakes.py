@@ -0,0 +1,163 @@
+from contextlib import contextmanager
+
+
+class FakePromise:
+    """ The promise of a delete, define or concept lookup, it fails or takes effect when resolved"""
+
+    def __init__(self, transaction, kind, query, value=None):
+        self.transaction = transaction
+        self.kind = kind
+        self.query = query
+        self.value = value
+
+    def resolve(self):
+        self.transaction.session.resolved.append((self.kind, self.query))
+        if self.query in self.transaction.session.failing:
+            raise Exception("Failed to " + self.kind + " " + self.query)
+        if self.kind in ("delete", "define"):
+            self.transaction.written.append(self.query)
+        return self.value
+
+
+class FakeTransaction:
+    """ A transaction of a FakeSession, it is its own query and concept manager
+
+    Every query is recorded on the session as it is sent. The answers of a get or insert are read from the
+    session's answers function, and are only produced, or fail, when the caller starts reading them.
+    """
+
+    def __init__(self, session, transaction_type=None):
+        self.session = session
+        self.transaction_type = transaction_type
+        self.written = []
+        self.query = self
+        self.concepts = self
+
+    def get(self, query):
+        return self.__answers("get", query)
+
+    def insert(self, query):
+        return self.__answers("insert", query)
+
+    def delete(self, query):
+        self.session.sent.append(("delete", query))
+        return FakePromise(self, "delete", query)
+
+    def define(self, query):
+        self.session.sent.append(("define", query))
+        return FakePromise(self, "define", query)
+
+    def get_attribute_type(self, label):
+        self.session.sent.append(("get_attribute_type", label))
+        return FakePromise(self, "get_attribute_type", label, label)
+
+    def commit(self):
+        self.session.commits.append(list(self.written))
+
+    def __answers(self, kind, query):
+        self.session.sent.append((kind, query))
+
+        def stream():
+            self.session.read.append((kind, query))
+            if query in self.session.failing:
+                raise Exception("Failed to " + kind + " " + query)
+            if kind == "insert":
+                self.written.append(query)
+            yield from self.session.answers(kind, query)
+        return stream()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+def default_answers(kind, query):
+    # a match-insert whose match finds something inserts one answer, a get finds nothing
+    return [object()] if kind == "insert" else []
+
+
+class FakeSession:
+    """ A TypeDB session recording what its transactions send, read and commit
+
+    Args:
+        answers (): the answers to each query, a function of the query kind ("get", "insert") and the query
+        failing (): the queries that fail when read or resolved
+        database (): the database name
+        session_type (): the session type
+    """
+
+    def __init__(self, answers=default_answers, failing=(), database="stix", session_type=None):
+        self.answers = answers
+        self.failing = set(failing)
+        self.database = database
+        self.session_type = session_type
+        self.open = True
+        self.sent = []
+        self.read = []
+        self.resolved = []
+        self.commits = []
+        self.transactions = 0
+
+    def transaction(self, transaction_type=None):
+        self.transactions += 1
+        return FakeTransaction(self, transaction_type)
+
+    def queries(self, kind):
+        """ the queries of one kind sent so far, in order"""
+        return [query for sent_kind, query in self.sent if sent_kind == kind]
+
+    def is_open(self):
+        return self.open
+
+    def close(self):
+        self.open = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+
+class FakeConnection:
+    """ A TypeDBConnection that lends out the same data session every time"""
+
+    def __init__(self, session=None):
+        self.session = session if session is not None else FakeSession()
+        self.borrowed = 0
+
+    @contextmanager
+    def data_session(self, database):
+        self.borrowed += 1
+        yield self.session
+
+
+class FakeDriver:
+    """ A TypeDB driver opening FakeSessions, it can be taken down as if its server went away"""
+
+    def __init__(self, url):
+        self.url = url
+        self.open = True
+        self.down = False
+        self.sessions = []
+        self.databases = self
+
+    def all(self):
+        if self.down:
+            raise ConnectionError("server unavailable")
+        return []
+
+    def session(self, database, session_type):
+        if self.down:
+            raise ConnectionError("server unavailable")
+        self.sessions.append(FakeSession(database=database, session_type=session_type))
+        return self.sessions[-1]
+
+    def is_open(self):
+        return self.open
+
+    def close(self):
+        self.open = False